@@ -1,26 +1,77 @@
+import logging
+
+from langchain_core.runnables import RunnableConfig
+
 from src.components.document_loaders import DocumentManager
+from src.components.embeddings import CachedEmbeddings, make_embedding
+from src.components.ingestion import IngestPipeline, IngestStats
+from src.components.lexical import get_lexical_index
+from src.components.manifest import IngestManifest, manifest_path
 from src.components.retrievers import make_retriever
+from src.components.vectorstores import LocalVectorStore
+from src.configs import Configuration
 
+logger = logging.getLogger(__name__)
 
-def add_docs_to_store(data_dir: str) -> None:
+
+def add_docs_to_store(
+    data_dir: str, config: RunnableConfig | None = None
+) -> IngestStats:
     """
     Add documents from the specified path to the vector store
 
+    Only chapters whose content changed since the last run are chunked, embedded
+    and upserted. Vectors of changed or removed chapters are deleted.
+
     Args:
         data_dir (str): Path to the documents directory
+        config (RunnableConfig | None): Overrides of the default configuration
+
+    Returns:
+        IngestStats: Counts of the chapters and chunks ingested and deleted
     """
+    configuration = Configuration.from_runnable_config(config)
+
     # Initialize document manager
-    doc_manager = DocumentManager()
+    doc_manager = DocumentManager(config)
+    manifest = IngestManifest(manifest_path(configuration))
+
+    # Stream new and changed chapters into the vector store
+    embedding_model = make_embedding(configuration)
+    with make_retriever(config) as retriever:
+        vectorstore = retriever.vectorstore
+        pipeline = IngestPipeline(
+            doc_manager,
+            embedding_model,
+            vectorstore,
+            manifest,
+            batch_size=configuration.ingest_batch_size,
+            queue_size=configuration.ingest_queue_size,
+            lexical_index=(
+                get_lexical_index(configuration)
+                if configuration.hybrid_search
+                else None
+            ),
+        )
+        stats = pipeline.run(data_dir)
 
-    # Load and chunk documents
-    docs = doc_manager.load_documents(data_dir)
-    chunked_docs = doc_manager.split_documents(docs)
+        # New rows are inserted into an existing index as they are added
+        if (
+            configuration.local_ann_index
+            and isinstance(vectorstore, LocalVectorStore)
+            and vectorstore.ann_index is None
+        ):
+            vectorstore.build_ann_index()
 
-    # Add documents to vector store
-    with make_retriever() as retriever:
-        retriever.add_documents(chunked_docs)
+    if isinstance(embedding_model, CachedEmbeddings):
+        logger.info("Embedding cache: %s", embedding_model.cache.stats())
+    return stats
 
 
 if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
     data_dir = "data"
     add_docs_to_store(data_dir)
@@ -1,6 +1,10 @@
 import streamlit as st
 from dotenv import find_dotenv, load_dotenv
 
+from src.components.instrumentation import start_metrics_server
+from src.components.rerankers import load_cross_encoder
+from src.configs import Configuration
+from src.utils import warm_up_models
 from ui.components import display_conversation, render_header, render_sidebar
 from ui.components.chat import handle_ai_response, handle_user_input, init_chat_state
 from ui.utils import load_css
@@ -8,6 +12,18 @@ from ui.utils import load_css
 load_dotenv(find_dotenv(raise_error_if_not_found=True))
 
 
+@st.cache_resource
+def warm_up() -> None:
+    """Load the configured models once per server process."""
+    configuration = Configuration.from_runnable_config()
+    warm_up_models(configuration)
+    # A cold cross-encoder would overrun the rerank latency budget
+    if configuration.rerank:
+        load_cross_encoder(configuration.rerank_model, configuration.rerank_max_length)
+    if configuration.metrics_port:
+        start_metrics_server(configuration.metrics_port)
+
+
 def main() -> None:
     # Set page config
     title = "Novel RAG Chatbot"
@@ -22,6 +38,8 @@ def main() -> None:
     css = load_css("ui/assets/css/styles.css")
     st.markdown(f"<style>{css}</style>", unsafe_allow_html=True)
 
+    warm_up()
+
     # Render components
     render_header(title)
     render_sidebar()
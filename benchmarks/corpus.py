@@ -0,0 +1,59 @@
+import json
+import random
+from pathlib import Path
+
+from benchmarks.fakes import WORDS
+
+
+def novel_title(novel: int) -> str:
+    return f"Truyện Thử Nghiệm {novel + 1}"
+
+
+def write_corpus(
+    data_dir: Path,
+    n_novels: int = 2,
+    n_chapters: int = 50,
+    chapter_words: int = 1500,
+    seed: int = 0,
+) -> None:
+    """Write a deterministic synthetic corpus in the scraper's layout."""
+    rng = random.Random(seed)
+    for novel in range(n_novels):
+        novel_dir = data_dir / f"truyen-thu-nghiem-{novel + 1}"
+        (novel_dir / "chapters").mkdir(parents=True, exist_ok=True)
+        metadata = {
+            "Tên truyện": novel_title(novel),
+            "Tác giả": "Benchmark",
+            "Thể loại": ["Tiên Hiệp"],
+            "Giới thiệu": " ".join(rng.choices(WORDS, k=60)),
+        }
+        with open(novel_dir / "metadata.json", "w", encoding="utf-8") as f:
+            json.dump(metadata, f, ensure_ascii=False, indent=4)
+
+        for chapter in range(1, n_chapters + 1):
+            sentences = []
+            for _ in range(chapter_words // 15):
+                sentences.append(" ".join(rng.choices(WORDS, k=15)).capitalize())
+            text = ". ".join(sentences) + "."
+            (novel_dir / "chapters" / f"{chapter}.txt").write_text(
+                text, encoding="utf-8"
+            )
+
+
+def make_queries(
+    n_queries: int, n_novels: int, n_chapters: int, seed: int = 0
+) -> list[str]:
+    """Deterministic questions, some scoped to a novel and chapter range."""
+    rng = random.Random(seed)
+    queries = []
+    for i in range(n_queries):
+        words = " ".join(rng.choices(WORDS, k=6))
+        if i % 2:
+            novel = rng.randrange(n_novels)
+            chapter = rng.randint(1, n_chapters)
+            queries.append(
+                f"Trong {novel_title(novel)} chương {chapter}, {words} là gì?"
+            )
+        else:
+            queries.append(f"{words.capitalize()} là ai?")
+    return queries
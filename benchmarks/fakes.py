@@ -0,0 +1,214 @@
+import asyncio
+import hashlib
+import random
+import re
+import time
+from collections.abc import AsyncIterator, Iterator
+from typing import Any, Literal
+
+import numpy as np
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForLLMRun,
+    CallbackManagerForLLMRun,
+)
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models import BaseChatModel
+from langchain_core.language_models.chat_models import (
+    agenerate_from_stream,
+    generate_from_stream,
+)
+from langchain_core.messages import AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+from langchain_core.runnables import Runnable, RunnableLambda
+
+from src.utils import (
+    chat_models,
+    count_message_tokens,
+    embedding_models,
+    get_token_counter,
+    model_key,
+)
+
+FAKE_CHAT_MODEL = "fake/chat"
+FAKE_EMBEDDING_MODEL = "fake/embedding"
+
+WORDS = (
+    "anh em nhà họ tiêu viêm luyện đan sư đấu khí thành thiên hạ kiếm vương "
+    "long sơn tông môn trưởng lão sư phụ đệ tử bí cảnh linh thảo hỏa diễm"
+).split()
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+def _seed(text: str) -> int:
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest())
+
+
+class FakeChatModel(BaseChatModel):
+    """Chat model answering deterministic filler text at a simulated speed.
+
+    The first token arrives `latency` seconds after the call and the others at
+    `tokens_per_second`. Structured output calls (the query router) answer
+    `route` after the time it would take to generate `router_tokens`.
+    """
+
+    latency: float = 0.2
+    tokens_per_second: float = 50.0
+    response_tokens: int = 64
+    router_tokens: int = 24
+    route: Literal["general", "retrieve", "more-info"] = "retrieve"
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def _tokens(self, messages: list[BaseMessage]) -> list[str]:
+        rng = random.Random(_seed(str(messages[-1].content)))
+        return [
+            (" " if i else "") + rng.choice(WORDS) for i in range(self.response_tokens)
+        ]
+
+    def _chunk(
+        self, messages: list[BaseMessage], tokens: list[str], i: int
+    ) -> ChatGenerationChunk:
+        message = AIMessageChunk(content=tokens[i])
+        if i == len(tokens) - 1:
+            input_tokens = count_message_tokens(
+                messages, get_token_counter(FAKE_CHAT_MODEL)
+            )
+            message.usage_metadata = {
+                "input_tokens": input_tokens,
+                "output_tokens": len(tokens),
+                "total_tokens": input_tokens + len(tokens),
+            }
+        return ChatGenerationChunk(message=message)
+
+    def _stream(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: CallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        tokens = self._tokens(messages)
+        time.sleep(self.latency)
+        for i in range(len(tokens)):
+            if i:
+                time.sleep(1 / self.tokens_per_second)
+            chunk = self._chunk(messages, tokens, i)
+            if run_manager is not None:
+                run_manager.on_llm_new_token(tokens[i], chunk=chunk)
+            yield chunk
+
+    async def _astream(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: AsyncCallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        tokens = self._tokens(messages)
+        await asyncio.sleep(self.latency)
+        for i in range(len(tokens)):
+            if i:
+                await asyncio.sleep(1 / self.tokens_per_second)
+            chunk = self._chunk(messages, tokens, i)
+            if run_manager is not None:
+                await run_manager.on_llm_new_token(tokens[i], chunk=chunk)
+            yield chunk
+
+    def _generate(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: CallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        return generate_from_stream(self._stream(messages, stop, run_manager))
+
+    async def _agenerate(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: AsyncCallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        return await agenerate_from_stream(self._astream(messages, stop, run_manager))
+
+    def _route(self) -> dict[str, str]:
+        return {"logic": "Benchmark route.", "type": self.route}
+
+    def _router_seconds(self) -> float:
+        return self.latency + self.router_tokens / self.tokens_per_second
+
+    def with_structured_output(
+        self, schema: Any, **kwargs: Any
+    ) -> Runnable[Any, dict[str, str]]:
+        def route(_: Any) -> dict[str, str]:
+            time.sleep(self._router_seconds())
+            return self._route()
+
+        async def aroute(_: Any) -> dict[str, str]:
+            await asyncio.sleep(self._router_seconds())
+            return self._route()
+
+        return RunnableLambda(route, afunc=aroute, name="FakeRouter")
+
+
+class FakeEmbeddings(Embeddings):
+    """Deterministic embeddings hashing the words of a text into a unit vector,
+    so texts sharing words are similar. Each call takes `latency` seconds plus
+    the time to embed its texts at `texts_per_second`.
+    """
+
+    def __init__(
+        self,
+        dimension: int = 384,
+        latency: float = 0.0,
+        texts_per_second: float | None = None,
+    ) -> None:
+        self.dimension = dimension
+        self.latency = latency
+        self.texts_per_second = texts_per_second
+
+    def _delay(self, n_texts: int) -> float:
+        if self.texts_per_second is None:
+            return self.latency
+        return self.latency + n_texts / self.texts_per_second
+
+    def _embed(self, text: str) -> list[float]:
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        for word in _TOKEN.findall(text.lower()):
+            seed = _seed(word)
+            vector[seed % self.dimension] += 1.0 if seed >> 63 else -1.0
+        norm = float(np.linalg.norm(vector))
+        if norm == 0.0:
+            vector[0], norm = 1.0, 1.0
+        return (vector / norm).tolist()  # type: ignore[no-any-return]
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        time.sleep(self._delay(len(texts)))
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        time.sleep(self._delay(1))
+        return self._embed(text)
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        await asyncio.sleep(self._delay(len(texts)))
+        return [self._embed(text) for text in texts]
+
+    async def aembed_query(self, text: str) -> list[float]:
+        await asyncio.sleep(self._delay(1))
+        return self._embed(text)
+
+
+def register_fakes(chat_model: FakeChatModel, embeddings: FakeEmbeddings) -> None:
+    """Serve the fakes as `fake/chat` and `fake/embedding` from the model
+    registry, replacing any registered earlier.
+    """
+    key = model_key(FAKE_CHAT_MODEL, {})
+    chat_models.unload(key)
+    chat_models.get_or_create(key, lambda: chat_model)
+    key = model_key(FAKE_EMBEDDING_MODEL, {})
+    embedding_models.unload(key)
+    embedding_models.get_or_create(key, lambda: embeddings)
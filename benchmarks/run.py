@@ -0,0 +1,303 @@
+"""Offline benchmark of ingestion and the RAG graph.
+
+Runs `add_docs_to_store` and the compiled graph against fake models with
+simulated latency and a local vector store, on a synthetic corpus, and writes
+the results as JSON:
+
+    python -m benchmarks.run --output results.json
+    python -m benchmarks.run --baseline results.json
+
+Every run is deterministic apart from timing, so results of two commits can
+be compared with `--baseline`.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+from langchain_core.messages import HumanMessage
+from langchain_core.runnables import RunnableConfig
+
+from add_docs import add_docs_to_store
+from benchmarks.corpus import make_queries, write_corpus
+from benchmarks.fakes import (
+    FAKE_CHAT_MODEL,
+    FAKE_EMBEDDING_MODEL,
+    FakeChatModel,
+    FakeEmbeddings,
+    register_fakes,
+)
+from src.graph.graph import graph
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class QueryTimings:
+    """Measurements of one graph run."""
+
+    total: float = 0.0
+    ttft: float | None = None
+    prompt_tokens: int | None = None
+    output_tokens: int | None = None
+    nodes: dict[str, float] = field(default_factory=dict)
+
+
+def summarize(values: list[float]) -> dict[str, float]:
+    """Count, mean and percentiles of a sample."""
+    if not values:
+        return {"count": 0}
+    sample = np.asarray(values, dtype=np.float64)
+    return {
+        "count": len(values),
+        "mean": round(float(sample.mean()), 3),
+        "p50": round(float(np.percentile(sample, 50)), 3),
+        "p90": round(float(np.percentile(sample, 90)), 3),
+        "p99": round(float(np.percentile(sample, 99)), 3),
+        "max": round(float(sample.max()), 3),
+    }
+
+
+async def time_query(query: str, config: RunnableConfig) -> QueryTimings:
+    """Run the graph on a query, timing its nodes and the response stream."""
+    timings = QueryTimings()
+    starts: dict[str, float] = {}
+    start = time.perf_counter()
+    async for event in graph.astream_events(
+        {"messages": [HumanMessage(query, id=str(uuid.uuid4()))]},
+        config,
+        version="v2",
+    ):
+        now = time.perf_counter()
+        kind = event["event"]
+        # Node runs are the direct children of the graph run
+        is_node = len(event["parent_ids"]) == 1 and event["name"] != "__start__"
+        if kind in ("on_chain_start", "on_chain_end") and is_node:
+            if kind == "on_chain_start":
+                starts[event["run_id"]] = now
+            elif event["run_id"] in starts:
+                name = event["name"]
+                elapsed = now - starts.pop(event["run_id"])
+                timings.nodes[name] = timings.nodes.get(name, 0.0) + elapsed
+        elif event["name"] == "respond":
+            if kind == "on_chat_model_stream" and timings.ttft is None:
+                timings.ttft = now - start
+            elif kind == "on_chat_model_end":
+                usage = getattr(event["data"]["output"], "usage_metadata", None)
+                if usage:
+                    timings.prompt_tokens = usage["input_tokens"]
+                    timings.output_tokens = usage["output_tokens"]
+    timings.total = time.perf_counter() - start
+    return timings
+
+
+async def run_queries(
+    queries: list[str], config: RunnableConfig, warmup: int
+) -> list[QueryTimings]:
+    for query in queries[:warmup]:
+        await time_query(query, config)
+    return [await time_query(query, config) for query in queries[warmup:]]
+
+
+def query_report(results: list[QueryTimings]) -> dict[str, Any]:
+    node_names = sorted({name for result in results for name in result.nodes})
+    return {
+        "total_ms": summarize([r.total * 1000 for r in results]),
+        "ttft_ms": summarize([r.ttft * 1000 for r in results if r.ttft is not None]),
+        "prompt_tokens": summarize(
+            [r.prompt_tokens for r in results if r.prompt_tokens is not None]
+        ),
+        "output_tokens": summarize(
+            [r.output_tokens for r in results if r.output_tokens is not None]
+        ),
+        "nodes_ms": {
+            name: summarize([r.nodes[name] * 1000 for r in results if name in r.nodes])
+            for name in node_names
+        },
+    }
+
+
+def _git_commit() -> str | None:
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return result.stdout.strip()
+
+
+def _parse_override(value: str) -> tuple[str, Any]:
+    key, _, raw = value.partition("=")
+    try:
+        return key, json.loads(raw)
+    except json.JSONDecodeError:
+        return key, raw
+
+
+def run_benchmark(args: argparse.Namespace) -> dict[str, Any]:
+    chat_model = FakeChatModel(
+        latency=args.chat_latency,
+        tokens_per_second=args.tokens_per_second,
+        response_tokens=args.response_tokens,
+        route=args.route,
+    )
+    embeddings = FakeEmbeddings(
+        dimension=args.dimension,
+        latency=args.embedding_latency,
+        texts_per_second=args.texts_per_second,
+    )
+    register_fakes(chat_model, embeddings)
+
+    with tempfile.TemporaryDirectory(prefix="rag-bench-") as tmp:
+        work_dir = Path(tmp)
+        data_dir = work_dir / "data"
+        write_corpus(data_dir, args.novels, args.chapters, args.chapter_words)
+        configurable: dict[str, Any] = {
+            "response_model": FAKE_CHAT_MODEL,
+            "query_model": FAKE_CHAT_MODEL,
+            "embedding_model": FAKE_EMBEDDING_MODEL,
+            "retriever_provider": "local",
+            "splitter_type": "delimiter",
+            "local_store_dir": str(work_dir / "vectorstore"),
+            "lexical_index_dir": str(work_dir / "lexical_index"),
+            "ingest_manifest_path": str(work_dir / "ingest_manifest.json"),
+            "embedding_cache_path": str(work_dir / "embeddings.sqlite"),
+        }
+        configurable.update(dict(_parse_override(o) for o in args.set))
+        config: RunnableConfig = {"configurable": configurable}
+
+        start = time.perf_counter()
+        stats = add_docs_to_store(str(data_dir), config)
+        ingest_seconds = time.perf_counter() - start
+        logger.info("Ingested %d chunks in %.2fs", stats.chunks, ingest_seconds)
+
+        queries = make_queries(args.queries + args.warmup, args.novels, args.chapters)
+        results = asyncio.run(run_queries(queries, config, args.warmup))
+
+    return {
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "settings": {
+            key: value
+            for key, value in vars(args).items()
+            if key not in ("output", "baseline")
+        },
+        "configurable": configurable
+        | {key: "<tmp>" for key in configurable if key.endswith(("_dir", "_path"))},
+        "ingest": {
+            "chapters": stats.chapters,
+            "chunks": stats.chunks,
+            "seconds": round(ingest_seconds, 3),
+            "chunks_per_sec": round(stats.chunks / ingest_seconds, 3),
+        },
+        "query": query_report(results),
+    }
+
+
+def _flatten(report: dict[str, Any], prefix: str = "") -> dict[str, float]:
+    flat = {}
+    for key, value in report.items():
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{prefix}{key}."))
+        elif isinstance(value, int | float) and not isinstance(value, bool):
+            flat[f"{prefix}{key}"] = float(value)
+    return flat
+
+
+def compare(baseline: dict[str, Any], report: dict[str, Any]) -> list[str]:
+    """Describe the change of each timing and throughput against a baseline."""
+    old = _flatten({k: baseline.get(k, {}) for k in ("ingest", "query")})
+    new = _flatten({k: report[k] for k in ("ingest", "query")})
+    lines = []
+    for key in sorted(old.keys() & new.keys()):
+        if not key.endswith(("p50", "p90", "chunks_per_sec")):
+            continue
+        if old[key]:
+            change = (new[key] - old[key]) / old[key] * 100
+            lines.append(f"{key}: {old[key]:.2f} -> {new[key]:.2f} ({change:+.1f}%)")
+    return lines
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--output", type=str, help="Write the JSON results here.")
+    parser.add_argument(
+        "--baseline", type=str, help="JSON results to compare this run against."
+    )
+    parser.add_argument("--novels", type=int, default=2)
+    parser.add_argument("--chapters", type=int, default=50)
+    parser.add_argument("--chapter-words", type=int, default=1500)
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument(
+        "--chat-latency",
+        type=float,
+        default=0.2,
+        help="Seconds before the first token of a chat model call.",
+    )
+    parser.add_argument("--tokens-per-second", type=float, default=50.0)
+    parser.add_argument("--response-tokens", type=int, default=64)
+    parser.add_argument(
+        "--route", choices=["retrieve", "general", "more-info"], default="retrieve"
+    )
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument(
+        "--embedding-latency",
+        type=float,
+        default=0.01,
+        help="Seconds per embedding call.",
+    )
+    parser.add_argument(
+        "--texts-per-second",
+        type=float,
+        default=2000.0,
+        help="Embedding throughput on top of the per-call latency.",
+    )
+    parser.add_argument(
+        "--set",
+        action="append",
+        default=[],
+        metavar="KEY=VALUE",
+        help="Override a configuration field, e.g. --set hybrid_search=true.",
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    report = run_benchmark(args)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        for line in compare(baseline, report):
+            print(line, file=sys.stderr)
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        Path(args.output).write_text(output + "\n", encoding="utf-8")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+    main()
@@ -1,13 +1,28 @@
 import argparse
+import asyncio
+import hashlib
 import json
 import logging
+import os
+import random
+import threading
 import time
+import warnings
+from collections.abc import Iterator
 from dataclasses import dataclass
 from pathlib import Path
+from typing import Any
+from urllib.parse import urlsplit
 
+import httpx
 import requests  # type: ignore
 from bs4 import BeautifulSoup, Tag
 
+from src.components.packfile import PackWriter
+
+# Status codes worth retrying: rate limited or a transient server error
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
 
 @dataclass
 class NovelMetadata:
@@ -28,12 +43,236 @@ class NovelMetadata:
         }
 
 
+@dataclass
+class Page:
+    """A fetched page, or `not_modified` when the saved copy is still current."""
+
+    text: str | None
+    etag: str | None = None
+    last_modified: str | None = None
+    not_modified: bool = False
+
+    @classmethod
+    def from_response(cls, status_code: int, text: str, headers: Any) -> "Page":
+        if status_code == 304:
+            return cls(None, not_modified=True)
+        return cls(text, headers.get("ETag"), headers.get("Last-Modified"))
+
+
+def conditional_headers(validators: dict[str, Any] | None) -> dict[str, str]:
+    """Request headers revalidating a page saved with the given validators."""
+    headers = {}
+    if validators and validators.get("etag"):
+        headers["If-None-Match"] = validators["etag"]
+    if validators and validators.get("last_modified"):
+        headers["If-Modified-Since"] = validators["last_modified"]
+    return headers
+
+
+def write_atomic(path: Path, data: str | bytes) -> None:
+    """Write a file through a temporary file, so it is never seen half-written."""
+    tmp_path = path.with_name(path.name + ".tmp")
+    if isinstance(data, bytes):
+        tmp_path.write_bytes(data)
+    else:
+        tmp_path.write_text(data, encoding="utf-8")
+    os.replace(tmp_path, path)
+
+
+class ChapterPack(PackWriter):
+    """Packed chapter corpus of a novel, read by `src.components.corpus`.
+
+    Chapters are written from several threads. The index is renamed into place
+    every `save_every` chapters and by `save_index`; chapters appended since
+    the last save are lost if the run is interrupted, and fetched again on
+    resume.
+    """
+
+    def __init__(self, novel_dir: Path, save_every: int = 64) -> None:
+        super().__init__(novel_dir)
+        self.save_every = save_every
+        self._unsaved = 0
+        self._lock = threading.Lock()
+
+    def write(self, chapter: int, content: str) -> None:
+        with self._lock:
+            self.append([(chapter, content)])
+            self._unsaved += 1
+            if self._unsaved >= self.save_every:
+                self._save_index()
+
+    def save_index(self) -> None:
+        with self._lock:
+            self._save_index()
+
+    def _save_index(self) -> None:
+        super().save_index()
+        self._unsaved = 0
+
+
+class CrawlJournal:
+    """Persisted crawl state of a novel, in `journal.jsonl` in its directory.
+
+    Each line is an event: either `{"metadata": {...}}` with the validators of
+    the novel page, or `{"chapter": n, "status": ..., ...}` where status is
+    `pending`, `completed` (with the content hash and validators of the page)
+    or `failed` (with the error). The latest event of a chapter gives its
+    status, its latest `completed` event the saved copy's validators. Events
+    are appended and flushed one by one, so an interrupted run loses at most
+    a truncated last line, which is ignored on load.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.metadata: dict[str, Any] = {}
+        self.chapters: dict[int, dict[str, Any]] = {}
+        self.completed: dict[int, dict[str, Any]] = {}
+        if path.exists():
+            with open(path, encoding="utf-8") as fp:
+                for line in fp:
+                    try:
+                        self._apply(json.loads(line))
+                    except (json.JSONDecodeError, KeyError, ValueError):
+                        continue
+        self._fp = open(path, "a", encoding="utf-8")
+
+    def _apply(self, event: dict[str, Any]) -> None:
+        if "metadata" in event:
+            self.metadata = dict(event["metadata"])
+        else:
+            self.chapters[int(event["chapter"])] = event
+            if event["status"] == "completed":
+                self.completed[int(event["chapter"])] = event
+
+    def _append(self, event: dict[str, Any]) -> None:
+        self._apply(event)
+        self._fp.write(json.dumps(event, ensure_ascii=False) + "\n")
+        self._fp.flush()
+
+    def status(self, chapter: int) -> str | None:
+        entry = self.chapters.get(chapter)
+        return entry["status"] if entry else None
+
+    def validators(self, chapter: int) -> dict[str, Any] | None:
+        return self.completed.get(chapter)
+
+    def record_metadata(self, page: Page) -> None:
+        self._append(
+            {"metadata": {"etag": page.etag, "last_modified": page.last_modified}}
+        )
+
+    def record_pending(self, chapters: list[int]) -> None:
+        for chapter in chapters:
+            if self.status(chapter) != "pending":
+                self._append({"chapter": chapter, "status": "pending"})
+
+    def record_completed(self, chapter: int, content: str, page: Page) -> None:
+        self._append(
+            {
+                "chapter": chapter,
+                "status": "completed",
+                "content_hash": hashlib.sha256(content.encode("utf-8")).hexdigest(),
+                "etag": page.etag,
+                "last_modified": page.last_modified,
+                "time": time.time(),
+            }
+        )
+
+    def record_unchanged(self, chapter: int) -> None:
+        self._append({**self.completed[chapter], "time": time.time()})
+
+    def record_failed(self, chapter: int, error: str) -> None:
+        self._append(
+            {
+                "chapter": chapter,
+                "status": "failed",
+                "error": error,
+                "time": time.time(),
+            }
+        )
+
+    def compact(self) -> None:
+        """Rewrite the journal with only the latest events of each chapter."""
+        self._fp.close()
+        events = [{"metadata": self.metadata}] if self.metadata else []
+        for chapter in sorted(self.chapters):
+            latest = self.chapters[chapter]
+            completed = self.completed.get(chapter)
+            if completed is not None and completed is not latest:
+                events.append(completed)
+            events.append(latest)
+        write_atomic(
+            self.path,
+            "".join(json.dumps(e, ensure_ascii=False) + "\n" for e in events),
+        )
+        self._fp = open(self.path, "a", encoding="utf-8")
+
+    def close(self) -> None:
+        self._fp.close()
+
+
+class TokenBucket:
+    """Async token bucket allowing `rate` acquisitions per second on average,
+    with bursts of up to `capacity`.
+    """
+
+    def __init__(self, rate: float, capacity: float = 1.0) -> None:
+        assert rate > 0, "Rate must be positive"
+        assert capacity >= 1, "Capacity must be at least 1"
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        # Waiters queue on the lock, so tokens are handed out in arrival order
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.capacity, self._tokens + (now - self._updated) * self.rate
+                )
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class HostRateLimiter:
+    """One token bucket per host, so each site is rate limited independently."""
+
+    def __init__(self, rate: float, burst: float = 1.0) -> None:
+        self.rate = rate
+        self.burst = burst
+        self._buckets: dict[str, TokenBucket] = {}
+
+    async def acquire(self, url: str) -> None:
+        host = urlsplit(url).netloc
+        if host not in self._buckets:
+            self._buckets[host] = TokenBucket(self.rate, self.burst)
+        await self._buckets[host].acquire()
+
+
 class NovelScraper:
     def __init__(
-        self, novel_url: str, save_dir: str = "data", delay: float = 1.0
+        self,
+        novel_url: str,
+        save_dir: str = "data",
+        delay: float = 1.0,
+        concurrency: int = 8,
+        rate: float = 2.0,
+        burst: float = 1.0,
+        max_retries: int = 3,
+        backoff: float = 1.0,
+        resume: bool = False,
+        packed: bool = False,
     ) -> None:
         assert novel_url, "Novel URL cannot be empty"
         assert delay >= 0, "Delay must be non-negative"
+        assert concurrency > 0, "Concurrency must be positive"
+        assert max_retries >= 0, "Max retries must be non-negative"
 
         # Set up logging
         self._setup_logging()
@@ -42,8 +281,21 @@ class NovelScraper:
         self.save_dir = Path(save_dir)
         self.delay = delay
 
+        # Async scraping
+        self.concurrency = concurrency
+        self.rate = rate
+        self.burst = burst
+        self.max_retries = max_retries
+        self.backoff = backoff
+
+        # Skip chapters (and metadata) already saved by a previous run
+        self.resume = resume
+
         # Initialize directory structure
         self._setup_directories()
+        self.journal = CrawlJournal(self.novel_dir / "journal.jsonl")
+        # Save chapters into a single pack file instead of one file each
+        self.pack = ChapterPack(self.novel_dir) if packed else None
 
         # Save novel metadata
         self.save_metadata()
@@ -55,6 +307,8 @@ class NovelScraper:
             format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
         )
         self.logger = logging.getLogger(__name__)
+        # httpx logs every request at INFO
+        logging.getLogger("httpx").setLevel(logging.WARNING)
 
     def _setup_directories(self) -> None:
         """Create necessary directories for saving content."""
@@ -67,17 +321,28 @@ class NovelScraper:
         except Exception as e:
             raise ValueError(f"Failed to create directories: {str(e)}")
 
-    def get_page_content(self, url: str) -> str | None:
-        """Fetch the HTML content of a webpage."""
+    def get_page(
+        self, url: str, validators: dict[str, Any] | None = None
+    ) -> Page | None:
+        """Fetch a webpage, conditionally when validators of a saved copy are given."""
         try:
             time.sleep(self.delay)  # Rate limiting
-            response = requests.get(url, timeout=10)
+            response = requests.get(
+                url, headers=conditional_headers(validators), timeout=10
+            )
             response.raise_for_status()
-            return str(response.text)
+            return Page.from_response(
+                response.status_code, str(response.text), response.headers
+            )
         except requests.exceptions.RequestException as e:
             self.logger.error(f"Error fetching {url}: {str(e)}")
             return None
 
+    def get_page_content(self, url: str) -> str | None:
+        """Fetch the HTML content of a webpage."""
+        page = self.get_page(url)
+        return page.text if page is not None else None
+
     def _parse_metadata(self, soup: BeautifulSoup) -> NovelMetadata:
         """Parse novel metadata from BeautifulSoup object."""
         try:
@@ -109,19 +374,33 @@ class NovelScraper:
             raise ValueError(f"Failed to parse metadata: {str(e)}")
 
     def save_metadata(self) -> None:
-        """Fetch and save novel metadata to a JSON file."""
-        html = self.get_page_content(self.novel_url)
-        if html is None:
+        """Fetch and save novel metadata to a JSON file.
+
+        A saved copy is revalidated with a conditional request, and reused
+        as is when resuming.
+        """
+        metadata_path = self.novel_dir / "metadata.json"
+        validators = self.journal.metadata if metadata_path.exists() else None
+        if validators is not None and self.resume:
+            return
+
+        page = self.get_page(self.novel_url, validators)
+        if page is None:
             raise ValueError(f"Failed to fetch content from {self.novel_url}")
+        if page.not_modified or page.text is None:
+            return
 
-        soup = BeautifulSoup(html, "html.parser")
+        soup = BeautifulSoup(page.text, "html.parser")
         metadata = self._parse_metadata(soup)
 
         try:
-            with open(self.novel_dir / "metadata.json", "w", encoding="utf-8") as fp:
-                json.dump(metadata.to_dict(), fp, ensure_ascii=False, indent=4)
+            write_atomic(
+                metadata_path,
+                json.dumps(metadata.to_dict(), ensure_ascii=False, indent=4),
+            )
         except OSError as e:
             raise ValueError(f"Failed to save metadata: {str(e)}")
+        self.journal.record_metadata(page)
 
     def _parse_content(self, soup: BeautifulSoup) -> str | None:
         """Parse content from HTML based on CSS selectors."""
@@ -133,33 +412,294 @@ class NovelScraper:
         except AttributeError:
             return None
 
-    def scrape_chapter(self, chapter: int, is_save: bool = True) -> str | None:
-        """Scrape content from a specific chapter and optionally save to a file."""
-        chapter_url = self.novel_url + f"chuong-{chapter}"
-        html = self.get_page_content(chapter_url)
-        if html is None:
+    def _chapter_path(self, chapter: int) -> Path:
+        return self.chapter_dir / f"{chapter}.txt"
+
+    def _has_chapter(self, chapter: int) -> bool:
+        if self.pack is not None:
+            return chapter in self.pack
+        return self._chapter_path(chapter).exists()
+
+    def _read_chapter(self, chapter: int) -> str:
+        if self.pack is not None:
+            return self.pack.read(chapter)
+        with open(self._chapter_path(chapter), encoding="utf-8") as fp:
+            return fp.read()
+
+    def _write_chapter(self, chapter: int, content: str) -> None:
+        if self.pack is not None:
+            self.pack.write(chapter, content)
+        else:
+            write_atomic(self._chapter_path(chapter), content)
+
+    def _chapter_validators(self, chapter: int) -> dict[str, Any] | None:
+        if not self._has_chapter(chapter):
             return None
+        return self.journal.validators(chapter)
 
-        soup = BeautifulSoup(html, "html.parser")
-        content = self._parse_content(soup)
-        if content is None:
+    def _process_chapter(self, chapter: int, page: Page, is_save: bool) -> str | None:
+        """Parse a fetched chapter and save it, or read the saved copy back."""
+        if page.not_modified:
+            return self._read_chapter(chapter)
+        if page.text is None:
             return None
 
-        if is_save:
-            chapter_path = self.chapter_dir / f"{chapter}.txt"
-            with open(chapter_path, "w", encoding="utf-8") as fp:
-                fp.write(content)
+        soup = BeautifulSoup(page.text, "html.parser")
+        content = self._parse_content(soup)
+        if content is not None and is_save:
+            self._write_chapter(chapter, content)
+        return content
+
+    def _record_chapter(
+        self, chapter: int, page: Page | None, content: str | None
+    ) -> None:
+        if page is None:
+            self.journal.record_failed(chapter, "fetch failed")
+        elif content is None:
+            self.journal.record_failed(chapter, "chapter content not found")
+        elif page.not_modified:
+            self.journal.record_unchanged(chapter)
+        else:
+            self.journal.record_completed(chapter, content, page)
 
+    def scrape_chapter(self, chapter: int, is_save: bool = True) -> str | None:
+        """Scrape content from a specific chapter and optionally save to a file."""
+        chapter_url = self.novel_url + f"chuong-{chapter}"
+        page = self.get_page(chapter_url, self._chapter_validators(chapter))
+        content = (
+            self._process_chapter(chapter, page, is_save) if page is not None else None
+        )
+        self._record_chapter(chapter, page, content)
         return content
 
+    def _chapters_to_fetch(self, start: int, end: int) -> list[int]:
+        """Chapters of the range to fetch: all of them, or when resuming, those
+        not completed and saved by an earlier run.
+        """
+        chapters = list(range(start, end + 1))
+        if self.resume:
+            chapters = [
+                chapter
+                for chapter in chapters
+                if self.journal.status(chapter) != "completed"
+                or not self._has_chapter(chapter)
+            ]
+        self.journal.record_pending(chapters)
+        return chapters
+
+    def _finish(self, failed: list[int]) -> list[int]:
+        if self.pack is not None:
+            self.pack.save_index()
+        self.journal.compact()
+        failed.sort()
+        if failed:
+            self.logger.error(f"Failed to scrape {len(failed)} chapters: {failed}")
+        return failed
+
+    def iter_chapters(self, start: int, end: int) -> Iterator[tuple[int, str]]:
+        """Yield the saved chapters of a range, reading one at a time."""
+        for chapter in range(start, end + 1):
+            if self._has_chapter(chapter):
+                yield chapter, self._read_chapter(chapter)
+
+    def _scrape(
+        self,
+        chapters: list[int],
+        is_save: bool,
+        results: dict[int, str | None] | None = None,
+    ) -> list[int]:
+        """Scrape chapters one at a time, keeping their contents in `results`
+        when given. Returns the chapters that failed.
+        """
+        failed = []
+        for chapter in chapters:
+            content = self.scrape_chapter(chapter, is_save)
+            if content is None:
+                failed.append(chapter)
+            if results is not None:
+                results[chapter] = content
+        return self._finish(failed)
+
+    def scrape_chapters(self, start: int, end: int, is_save: bool = True) -> list[int]:
+        """Scrape a range of chapters and optionally save them to files.
+
+        Chapters are written as they are fetched rather than kept in memory;
+        read them back with `iter_chapters`. Returns the chapters that failed.
+        """
+        return self._scrape(self._chapters_to_fetch(start, end), is_save)
+
     def scrape_multiple_chapters(
         self, start: int, end: int, is_save: bool = True
     ) -> list[str | None]:
-        """Scrape multiple chapters and optionally save to files."""
+        """Scrape multiple chapters and optionally save to files.
+
+        Deprecated: holds every chapter in memory, use `scrape_chapters`.
+        """
+        warnings.warn(
+            "scrape_multiple_chapters is deprecated, use scrape_chapters",
+            DeprecationWarning,
+            stacklevel=2,
+        )
+        results: dict[int, str | None] = {}
+        self._scrape(self._chapters_to_fetch(start, end), is_save, results)
+        return self._collect(start, end, results)
+
+    def _collect(
+        self, start: int, end: int, results: dict[int, str | None]
+    ) -> list[str | None]:
+        """Contents of a range of chapters, reading those skipped on resume."""
         return [
-            self.scrape_chapter(chapter, is_save) for chapter in range(start, end + 1)
+            results[chapter] if chapter in results else self._read_chapter(chapter)
+            for chapter in range(start, end + 1)
         ]
 
+    def _retry_delay(self, attempt: int, response: httpx.Response | None) -> float:
+        """Exponential backoff with jitter, deferring to a Retry-After header."""
+        if response is not None:
+            retry_after = response.headers.get("Retry-After", "")
+            if retry_after.isdigit():
+                return float(retry_after)
+        return self.backoff * 2.0**attempt * random.uniform(0.5, 1.5)
+
+    async def aget_page(
+        self,
+        client: httpx.AsyncClient,
+        limiter: HostRateLimiter,
+        url: str,
+        validators: dict[str, Any] | None = None,
+    ) -> Page | None:
+        """Fetch a webpage, retrying transient failures."""
+        headers = conditional_headers(validators)
+        for attempt in range(self.max_retries + 1):
+            await limiter.acquire(url)
+            response = None
+            try:
+                response = await client.get(url, headers=headers)
+                if response.status_code not in RETRY_STATUS_CODES:
+                    if response.status_code != 304:
+                        response.raise_for_status()
+                    return Page.from_response(
+                        response.status_code, response.text, response.headers
+                    )
+                error = f"HTTP {response.status_code}"
+            except httpx.TransportError as e:
+                error = str(e) or type(e).__name__
+            except httpx.HTTPStatusError as e:
+                self.logger.error(f"Error fetching {url}: {str(e)}")
+                return None
+
+            if attempt == self.max_retries:
+                break
+            delay = self._retry_delay(attempt, response)
+            self.logger.warning(
+                f"Retrying {url} in {delay:.1f}s after {error} "
+                f"(attempt {attempt + 1}/{self.max_retries})"
+            )
+            await asyncio.sleep(delay)
+
+        self.logger.error(f"Error fetching {url}: gave up after {error}")
+        return None
+
+    async def _ascrape(
+        self,
+        chapters: list[int],
+        is_save: bool,
+        results: dict[int, str | None] | None = None,
+    ) -> list[int]:
+        """Scrape chapters concurrently, keeping their contents in `results`
+        when given. Returns the chapters that failed.
+        """
+        queue: asyncio.Queue[int] = asyncio.Queue()
+        for chapter in chapters:
+            queue.put_nowait(chapter)
+        failed: list[int] = []
+        limiter = HostRateLimiter(self.rate, self.burst)
+        limits = httpx.Limits(
+            max_connections=self.concurrency,
+            max_keepalive_connections=self.concurrency,
+        )
+
+        async def worker(client: httpx.AsyncClient) -> None:
+            while not queue.empty():
+                chapter = queue.get_nowait()
+                url = self.novel_url + f"chuong-{chapter}"
+                page = await self.aget_page(
+                    client, limiter, url, self._chapter_validators(chapter)
+                )
+                # Parsing and writing are blocking work, kept off the event loop
+                content = (
+                    await asyncio.to_thread(
+                        self._process_chapter, chapter, page, is_save
+                    )
+                    if page is not None
+                    else None
+                )
+                self._record_chapter(chapter, page, content)
+                if content is None:
+                    failed.append(chapter)
+                if results is not None:
+                    results[chapter] = content
+
+        async with httpx.AsyncClient(
+            limits=limits, timeout=10, follow_redirects=True
+        ) as client:
+            n_workers = min(self.concurrency, queue.qsize())
+            await asyncio.gather(*(worker(client) for _ in range(n_workers)))
+
+        return self._finish(failed)
+
+    async def ascrape_chapters(
+        self, start: int, end: int, is_save: bool = True
+    ) -> list[int]:
+        """Scrape a range of chapters concurrently over pooled connections.
+
+        At most `concurrency` requests are in flight and each host is limited
+        to `rate` requests per second. Each chapter is written as soon as it
+        has been fetched. Returns the chapters that failed.
+        """
+        return await self._ascrape(self._chapters_to_fetch(start, end), is_save)
+
+    def scrape_chapters_async(
+        self, start: int, end: int, is_save: bool = True
+    ) -> list[int]:
+        """Synchronous entry point of `ascrape_chapters`."""
+        return asyncio.run(self.ascrape_chapters(start, end, is_save))
+
+    async def ascrape_multiple_chapters(
+        self, start: int, end: int, is_save: bool = True
+    ) -> list[str | None]:
+        """Scrape multiple chapters concurrently, returning their contents.
+
+        Deprecated: holds every chapter in memory, use `ascrape_chapters`.
+        """
+        warnings.warn(
+            "ascrape_multiple_chapters is deprecated, use ascrape_chapters",
+            DeprecationWarning,
+            stacklevel=2,
+        )
+        return await self._ascrape_contents(start, end, is_save)
+
+    async def _ascrape_contents(
+        self, start: int, end: int, is_save: bool
+    ) -> list[str | None]:
+        results: dict[int, str | None] = {}
+        await self._ascrape(self._chapters_to_fetch(start, end), is_save, results)
+        return self._collect(start, end, results)
+
+    def scrape_multiple_chapters_async(
+        self, start: int, end: int, is_save: bool = True
+    ) -> list[str | None]:
+        """Synchronous entry point of `ascrape_multiple_chapters`.
+
+        Deprecated: holds every chapter in memory, use `scrape_chapters_async`.
+        """
+        warnings.warn(
+            "scrape_multiple_chapters_async is deprecated, use scrape_chapters_async",
+            DeprecationWarning,
+            stacklevel=2,
+        )
+        return asyncio.run(self._ascrape_contents(start, end, is_save))
+
 
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="Scrape novel content from a website.")
@@ -176,10 +716,63 @@ def parse_args() -> argparse.Namespace:
         "--start", type=int, default=1, help="Starting chapter to scrape."
     )
     parser.add_argument("--end", type=int, default=1, help="Ending chapter to scrape.")
+    parser.add_argument(
+        "--async",
+        dest="use_async",
+        action="store_true",
+        help="Scrape chapters concurrently instead of one at a time.",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=8,
+        help="Maximum number of concurrent requests (with --async).",
+    )
+    parser.add_argument(
+        "--rate",
+        type=float,
+        default=2.0,
+        help="Maximum requests per second to a host (with --async).",
+    )
+    parser.add_argument(
+        "--burst",
+        type=float,
+        default=1.0,
+        help="Requests allowed at once before the rate limit applies (with --async).",
+    )
+    parser.add_argument(
+        "--max-retries",
+        type=int,
+        default=3,
+        help="Retries of a request failing with 429 or 5xx (with --async).",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Only fetch chapters not completed by an earlier run, per the journal.",
+    )
+    parser.add_argument(
+        "--packed",
+        action="store_true",
+        help="Save chapters into a single pack file with an offset index.",
+    )
     return parser.parse_args()
 
 
 if __name__ == "__main__":
     args = parse_args()
-    scraper = NovelScraper(args.novel_url, args.save_dir, args.delay)
-    scraper.scrape_multiple_chapters(start=args.start, end=args.end, is_save=True)
+    scraper = NovelScraper(
+        args.novel_url,
+        args.save_dir,
+        args.delay,
+        concurrency=args.concurrency,
+        rate=args.rate,
+        burst=args.burst,
+        max_retries=args.max_retries,
+        resume=args.resume,
+        packed=args.packed,
+    )
+    if args.use_async:
+        scraper.scrape_chapters_async(args.start, args.end, is_save=True)
+    else:
+        scraper.scrape_chapters(start=args.start, end=args.end, is_save=True)
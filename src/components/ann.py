@@ -0,0 +1,277 @@
+import argparse
+import json
+import os
+import time
+from array import array
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+from numpy.typing import NDArray
+
+# Number of rows assigned to centroids per matrix product
+_BLOCK_ROWS = 65536
+
+
+def normalize(vectors: NDArray[np.float32]) -> NDArray[np.float32]:
+    """Scale vectors to unit L2 norm, leaving zero vectors untouched."""
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return np.asarray(vectors / norms, dtype=np.float32)
+
+
+def _assign(vectors: NDArray[Any], centroids: NDArray[np.float32]) -> NDArray[np.int32]:
+    labels = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), _BLOCK_ROWS):
+        block = np.asarray(vectors[start : start + _BLOCK_ROWS], dtype=np.float32)
+        labels[start : start + len(block)] = (block @ centroids.T).argmax(axis=1)
+    return labels
+
+
+def spherical_kmeans(
+    vectors: NDArray[Any], n_clusters: int, n_iter: int = 20, seed: int = 0
+) -> NDArray[np.float32]:
+    """Cluster L2-normalized vectors by cosine similarity, returning the centroids."""
+    rng = np.random.default_rng(seed)
+    vectors = np.asarray(vectors, dtype=np.float32)
+    centroids: NDArray[np.float32] = vectors[
+        rng.choice(len(vectors), n_clusters, replace=False)
+    ].copy()
+
+    for _ in range(n_iter):
+        labels = _assign(vectors, centroids)
+        counts = np.bincount(labels, minlength=n_clusters)
+        order = np.argsort(labels, kind="stable")
+        starts = np.searchsorted(labels[order], np.arange(n_clusters))
+
+        present = counts > 0
+        sums = np.zeros_like(centroids)
+        sums[present] = np.add.reduceat(vectors[order], starts[present], axis=0)
+        # Re-seed empty clusters with random points so every list stays useful
+        n_empty = int((~present).sum())
+        if n_empty:
+            sums[~present] = vectors[rng.choice(len(vectors), n_empty)]
+        centroids = normalize(sums)
+
+    return centroids
+
+
+def _log_path(path: Path) -> Path:
+    return path.with_name(path.stem + ".labels")
+
+
+class IVFIndex:
+    """Inverted-file (IVF) approximate nearest-neighbour index.
+
+    Rows of a vector matrix are bucketed by their nearest k-means centroid. A
+    query scores the centroids, then only the rows in the `nprobe` closest
+    buckets. Raising `nprobe` trades latency for recall; `nprobe == nlist` is
+    exact search. The index stores row numbers only, the vectors stay in the
+    caller's matrix.
+
+    The lists of the rows indexed when the index was built or loaded are kept
+    sorted in one array; rows added afterwards are appended to a buffer per
+    list. On disk the centroids and the labels of the built rows go in an npz
+    file, and the labels of added rows are appended to a `.labels` file next
+    to it, so saving after `add` only writes the new labels.
+    """
+
+    def __init__(
+        self, centroids: NDArray[np.float32], labels: NDArray[np.int32]
+    ) -> None:
+        self.centroids = centroids
+        self._base_labels = np.asarray(labels, dtype=np.int32)
+        self._rows = np.argsort(self._base_labels, kind="stable").astype(np.int64)
+        counts = np.bincount(self._base_labels, minlength=self.nlist)
+        self._offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        # Rows and labels added after the ones above
+        self._added_rows = [array("q") for _ in range(self.nlist)]
+        self._added_labels = array("i")
+        self._indexed = len(self._base_labels)
+        # Rows whose labels are in the npz file, and in it or its label log
+        self._saved_base = 0
+        self._saved = 0
+
+    @property
+    def nlist(self) -> int:
+        return len(self.centroids)
+
+    @property
+    def indexed(self) -> int:
+        """Number of leading matrix rows covered by the index."""
+        return self._indexed
+
+    @property
+    def labels(self) -> NDArray[np.int32]:
+        """The list of each indexed row."""
+        added = np.frombuffer(self._added_labels, dtype=np.int32)
+        return np.concatenate([self._base_labels, added])
+
+    @classmethod
+    def build(
+        cls,
+        vectors: NDArray[Any],
+        nlist: int | None = None,
+        n_iter: int = 20,
+        sample_size: int | None = None,
+        seed: int = 0,
+    ) -> "IVFIndex":
+        """Train centroids on a sample of `vectors` and index every row."""
+        n_rows = len(vectors)
+        if n_rows == 0:
+            raise ValueError("Cannot build an index over an empty matrix")
+        nlist = min(nlist or max(1, int(4 * np.sqrt(n_rows))), n_rows)
+        sample_size = min(sample_size or nlist * 64, n_rows)
+
+        rng = np.random.default_rng(seed)
+        sample_rows = np.sort(rng.choice(n_rows, sample_size, replace=False))
+        centroids = spherical_kmeans(vectors[sample_rows], nlist, n_iter, seed)
+        return cls(centroids, _assign(vectors, centroids))
+
+    def add(self, vectors: NDArray[Any]) -> None:
+        """Index rows appended to the matrix after the ones already covered."""
+        if not len(vectors):
+            return
+        labels = _assign(vectors, self.centroids)
+        rows = np.arange(self._indexed, self._indexed + len(labels), dtype=np.int64)
+        order = np.argsort(labels, kind="stable")
+        bounds = np.searchsorted(labels[order], np.arange(self.nlist + 1))
+        for label in np.flatnonzero(np.diff(bounds)).tolist():
+            self._added_rows[label].frombytes(
+                rows[order[bounds[label] : bounds[label + 1]]].tobytes()
+            )
+        self._added_labels.frombytes(labels.astype(np.int32).tobytes())
+        self._indexed += len(labels)
+
+    def candidates(self, query: NDArray[np.float32], nprobe: int) -> NDArray[np.int64]:
+        """Return the sorted rows of the `nprobe` lists closest to the query."""
+        nprobe = max(1, min(nprobe, self.nlist))
+        scores = self.centroids @ query
+        probes = np.argpartition(-scores, nprobe - 1)[:nprobe]
+        rows = np.concatenate(
+            [self._rows[self._offsets[p] : self._offsets[p + 1]] for p in probes]
+            + [np.frombuffer(self._added_rows[p], dtype=np.int64) for p in probes]
+        )
+        # Sorted rows turn the gather from the memory-mapped matrix into a scan
+        return np.sort(rows)
+
+    def save(self, path: str | Path) -> None:
+        """Write the index, only appending the labels added since the last save."""
+        path = Path(path)
+        log_path = _log_path(path)
+        base = len(self._base_labels)
+        if self._saved < base or not path.exists():
+            tmp_path = path.with_name(path.name + ".tmp")
+            with open(tmp_path, "wb") as f:
+                np.savez(f, centroids=self.centroids, labels=self.labels)
+            os.replace(tmp_path, path)
+            log_path.unlink(missing_ok=True)
+            self._saved_base = self._saved = self._indexed
+            return
+
+        with open(log_path, "ab") as f:
+            # Drop labels left past the saved ones by an interrupted save
+            f.truncate((self._saved - self._saved_base) * 4)
+            f.write(self._added_labels[self._saved - base :].tobytes())
+        self._saved = self._indexed
+
+    @classmethod
+    def load(cls, path: str | Path, max_rows: int | None = None) -> "IVFIndex":
+        """Read an index, ignoring labels logged past `max_rows` rows."""
+        path = Path(path)
+        with np.load(path) as data:
+            centroids, labels = data["centroids"], data["labels"]
+        added = np.empty(0, dtype=np.int32)
+        if _log_path(path).exists():
+            added = np.fromfile(_log_path(path), dtype=np.int32)
+        if max_rows is not None:
+            added = added[: max(0, max_rows - len(labels))]
+        index = cls(centroids, np.concatenate([labels, added]))
+        index._saved_base = len(labels)
+        index._saved = index.indexed
+        return index
+
+
+def recall_report(
+    store: Any,
+    queries: NDArray[np.float32],
+    k: int = 10,
+    nprobes: tuple[int, ...] = (1, 2, 4, 8, 16, 32, 64),
+) -> list[dict[str, float]]:
+    """Measure recall@k and latency of IVF search against exact search.
+
+    Args:
+        store: A `LocalVectorStore` with an IVF index
+        queries: Query embeddings, one per row
+        k: Number of neighbours compared per query
+        nprobes: Values of `nprobe` to evaluate
+    """
+
+    def timed(**kwargs: Any) -> tuple[list[set[int]], NDArray[np.float64]]:
+        results, latencies = [], []
+        for query in queries:
+            start = time.perf_counter()
+            rows, _ = store.search_rows(query, k, **kwargs)
+            latencies.append(time.perf_counter() - start)
+            results.append(set(rows.tolist()))
+        return results, np.asarray(latencies, dtype=np.float64) * 1000.0
+
+    exact, exact_ms = timed(exact=True)
+    report = [
+        {
+            "nprobe": 0.0,
+            "recall": 1.0,
+            "mean_ms": float(exact_ms.mean()),
+            "p95_ms": float(np.percentile(exact_ms, 95)),
+        }
+    ]
+    for nprobe in nprobes:
+        approx, approx_ms = timed(nprobe=nprobe)
+        hits = sum(len(a & e) for a, e in zip(approx, exact, strict=True))
+        total = sum(len(e) for e in exact) or 1
+        report.append(
+            {
+                "nprobe": float(nprobe),
+                "recall": hits / total,
+                "mean_ms": float(approx_ms.mean()),
+                "p95_ms": float(np.percentile(approx_ms, 95)),
+            }
+        )
+    return report
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Report IVF recall and latency against exact search."
+    )
+    parser.add_argument(
+        "--store", type=str, default="vectorstore", help="Local vector store directory."
+    )
+    parser.add_argument(
+        "--queries", type=int, default=200, help="Number of sampled queries."
+    )
+    parser.add_argument("--k", type=int, default=10, help="Neighbours per query.")
+    parser.add_argument(
+        "--noise", type=float, default=0.05, help="Noise added to sampled queries."
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    from langchain_core.embeddings import FakeEmbeddings
+
+    from src.components.vectorstores import LocalVectorStore
+
+    args = parse_args()
+    store = LocalVectorStore(args.store, FakeEmbeddings(size=1))
+    if store.ann_index is None:
+        store.build_ann_index()
+
+    # Perturbed stored vectors stand in for real queries
+    rng = np.random.default_rng(0)
+    rows = rng.choice(store.count, min(args.queries, store.count), replace=False)
+    queries = np.asarray(store.vectors[np.sort(rows)], dtype=np.float32)
+    queries = normalize(queries + rng.normal(0, args.noise, queries.shape))
+
+    report = recall_report(store, queries.astype(np.float32), k=args.k)
+    print(json.dumps(report, indent=2))
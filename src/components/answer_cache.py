@@ -0,0 +1,152 @@
+import threading
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+from numpy.typing import NDArray
+
+from src.components.ann import normalize
+from src.components.instrumentation import metrics
+from src.configs import Configuration
+
+
+@dataclass
+class CachedAnswer:
+    """An answer to a standalone question, with where it came from."""
+
+    question: str
+    answer: str
+    corpus_version: int
+    namespace: tuple[str, ...]
+    document_ids: list[str] = field(default_factory=list)
+    created_at: float = field(default_factory=time.time)
+    hits: int = 0
+
+
+class SemanticAnswerCache:
+    """Size-bounded cache of answers looked up by question embedding similarity.
+
+    A question hits when the cosine similarity to a cached question reaches
+    `threshold` and the entry was answered for the same namespace (embedding and
+    response model, and the novel and chapters the question names) and corpus
+    version. The least recently used entry is evicted
+    once `max_size` answers are held.
+    """
+
+    def __init__(self, max_size: int = 512, threshold: float = 0.95) -> None:
+        assert max_size > 0, "Cache size must be positive"
+        self.max_size = max_size
+        self.threshold = threshold
+        self.hits = 0
+        self.misses = 0
+        self._vectors: NDArray[np.float32] | None = None
+        self._entries: list[CachedAnswer] = []
+        self._last_used = np.zeros(max_size, dtype=np.int64)
+        self._clock = 0
+        self._lock = threading.Lock()
+
+    def lookup(
+        self, embedding: list[float], namespace: tuple[str, ...], corpus_version: int
+    ) -> tuple[CachedAnswer, float] | None:
+        """Return the most similar valid answer and its score, if above threshold."""
+        query = normalize(np.asarray(embedding, dtype=np.float32))
+        with self._lock:
+            if self._vectors is None or not self._entries:
+                self.misses += 1
+                return None
+
+            scores = self._vectors[: len(self._entries)] @ query
+            valid = np.fromiter(
+                (
+                    entry.namespace == namespace
+                    and entry.corpus_version == corpus_version
+                    for entry in self._entries
+                ),
+                dtype=bool,
+                count=len(self._entries),
+            )
+            scores[~valid] = -np.inf
+            best = int(scores.argmax())
+            if scores[best] < self.threshold:
+                self.misses += 1
+                return None
+
+            self._clock += 1
+            self._last_used[best] = self._clock
+            entry = self._entries[best]
+            entry.hits += 1
+            self.hits += 1
+            return entry, float(scores[best])
+
+    def add(self, embedding: list[float], entry: CachedAnswer) -> None:
+        vector = normalize(np.asarray(embedding, dtype=np.float32))
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = np.zeros((self.max_size, len(vector)), np.float32)
+
+            if len(self._entries) < self.max_size:
+                slot = len(self._entries)
+                self._entries.append(entry)
+            else:
+                slot = int(self._last_used.argmin())
+                self._entries[slot] = entry
+
+            self._clock += 1
+            self._vectors[slot] = vector
+            self._last_used[slot] = self._clock
+
+    def clear(self) -> None:
+        with self._lock:
+            self._vectors = None
+            self._entries.clear()
+            self._last_used[:] = 0
+
+    def stats(self) -> dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+_answer_caches: dict[tuple[str, int, float], SemanticAnswerCache] = {}
+_answer_caches_lock = threading.Lock()
+
+
+def get_answer_cache(configuration: Configuration) -> SemanticAnswerCache:
+    """Return the process-wide answer cache for the configured embedding model,
+    size and threshold.
+
+    Each embedding model has its own cache: embeddings of different models are
+    not comparable, and may not even have the same dimension.
+    """
+    key = (
+        configuration.embedding_model,
+        configuration.answer_cache_size,
+        configuration.answer_cache_threshold,
+    )
+    with _answer_caches_lock:
+        if key not in _answer_caches:
+            _answer_caches[key] = SemanticAnswerCache(*key[1:])
+        return _answer_caches[key]
+
+
+def _answer_cache_stats() -> dict[tuple[str, ...], float]:
+    with _answer_caches_lock:
+        caches = list(_answer_caches.items())
+    return {
+        (embedding_model, str(max_size), str(threshold), stat): float(value)
+        for (embedding_model, max_size, threshold), cache in caches
+        for stat, value in cache.stats().items()
+    }
+
+
+metrics.gauge(
+    "rag_answer_cache",
+    "Size, hits, misses and hit rate of the semantic answer cache.",
+    ["embedding_model", "max_size", "threshold", "stat"],
+    _answer_cache_stats,
+)
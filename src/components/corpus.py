@@ -0,0 +1,177 @@
+import argparse
+import logging
+import mmap
+import os
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+from types import TracebackType
+
+import numpy as np
+from numpy.typing import NDArray
+
+from src.components.packfile import INDEX_NAME, PACK_NAME, PackWriter
+
+logger = logging.getLogger(__name__)
+
+
+def is_packed(novel_dir: Path) -> bool:
+    return (novel_dir / INDEX_NAME).exists()
+
+
+def packed_chapters(novel_dir: Path) -> set[int]:
+    """Chapters in a novel's pack, read from the index alone."""
+    if not is_packed(novel_dir):
+        return set()
+    index = np.fromfile(novel_dir / INDEX_NAME, dtype=np.int64).reshape(-1, 3)
+    return {int(chapter) for chapter in index[:, 0]}
+
+
+class PackedChapters:
+    """Read-only view of a packed novel corpus.
+
+    The pack is memory-mapped, so a chapter is decoded straight from the page
+    cache and looked up by binary search over the offset index. Packs are
+    append-only, so they may hold stale copies of rewritten chapters; only
+    indexed ranges are read.
+    """
+
+    def __init__(self, novel_dir: Path) -> None:
+        self.novel_dir = novel_dir
+        index = np.fromfile(novel_dir / INDEX_NAME, dtype=np.int64)
+        self._index: NDArray[np.int64] = index.reshape(-1, 3)
+        self._chapters = self._index[:, 0]
+        with open(novel_dir / PACK_NAME, "rb") as f:
+            # Empty files cannot be mapped
+            self._mmap = (
+                mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                if os.fstat(f.fileno()).st_size
+                else None
+            )
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __contains__(self, chapter: int) -> bool:
+        return self._find(chapter) is not None
+
+    def __enter__(self) -> "PackedChapters":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self.close()
+
+    def _find(self, chapter: int) -> int | None:
+        row = int(np.searchsorted(self._chapters, chapter))
+        if row < len(self._chapters) and self._chapters[row] == chapter:
+            return row
+        return None
+
+    def _read_row(self, row: int) -> str:
+        _, offset, length = (int(v) for v in self._index[row])
+        if not length:
+            return ""
+        assert self._mmap is not None
+        with memoryview(self._mmap) as view:
+            return str(view[offset : offset + length], "utf-8")
+
+    def chapters(self) -> list[int]:
+        return [int(chapter) for chapter in self._chapters]
+
+    def get(self, chapter: int) -> str:
+        """Return the text of a chapter, raising KeyError if it is not packed."""
+        row = self._find(chapter)
+        if row is None:
+            raise KeyError(chapter)
+        return self._read_row(row)
+
+    def __iter__(self) -> Iterator[tuple[int, str]]:
+        """Yield (chapter, text) pairs in chapter order."""
+        for row in range(len(self._index)):
+            yield int(self._chapters[row]), self._read_row(row)
+
+    def close(self) -> None:
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+
+def append_to_pack(novel_dir: Path, chapters: Iterable[tuple[int, str]]) -> int:
+    """Append chapters to a novel's pack, superseding packed copies of them.
+
+    The index is renamed into place last, so readers see either the previous
+    chapters or the new ones. Returns the number of chapters in the pack.
+    """
+    writer = PackWriter(novel_dir)
+    writer.append(chapters)
+    writer.save_index()
+    return len(writer)
+
+
+def iter_chapter_files(chapter_dir: Path) -> Iterator[Path]:
+    """Yield the chapter files of a directory in chapter order."""
+    if chapter_dir.exists():
+        yield from sorted(chapter_dir.glob("*.txt"), key=lambda x: int(x.stem))
+
+
+def pack_novel_dir(novel_dir: Path, remove: bool = False) -> int:
+    """Convert a novel's chapter files into its pack, where they supersede
+    packed copies of the same chapters.
+
+    Args:
+        novel_dir: Directory of the novel, holding `chapters/N.txt` files
+        remove: Delete the chapter files once packed
+
+    Returns:
+        The number of chapters in the pack
+    """
+    files = list(iter_chapter_files(novel_dir / "chapters"))
+
+    def changed() -> Iterator[tuple[int, str]]:
+        packed = PackedChapters(novel_dir) if is_packed(novel_dir) else None
+        try:
+            for fpath in files:
+                chapter, text = int(fpath.stem), fpath.read_text(encoding="utf-8")
+                if packed is not None and chapter in packed:
+                    if packed.get(chapter) == text:
+                        continue
+                yield chapter, text
+        finally:
+            if packed is not None:
+                packed.close()
+
+    n_chapters = append_to_pack(novel_dir, changed())
+    if remove:
+        for fpath in files:
+            fpath.unlink()
+    return n_chapters
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Pack the chapter files of each novel into a single file."
+    )
+    parser.add_argument(
+        "data_dir", nargs="?", default="data", help="Directory of the novels."
+    )
+    parser.add_argument(
+        "--remove", action="store_true", help="Delete chapter files once packed."
+    )
+    args = parser.parse_args()
+
+    for novel_dir in sorted(Path(args.data_dir).iterdir()):
+        if novel_dir.is_dir() and (novel_dir / "metadata.json").exists():
+            n_chapters = pack_novel_dir(novel_dir, args.remove)
+            logger.info("Packed %d chapters of %s", n_chapters, novel_dir.name)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+    main()
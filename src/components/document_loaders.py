@@ -1,16 +1,90 @@
 import json
+import multiprocessing
+import os
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import Future, ProcessPoolExecutor
 from pathlib import Path
 from typing import Any
 
 from langchain_core.documents import Document
+from langchain_core.runnables import RunnableConfig
 
+from src.components.corpus import PackedChapters, is_packed, iter_chapter_files
 from src.configs import Configuration
 from src.utils import get_literal_values
 
 
+def make_splitter(configuration: Configuration) -> Any:
+    match configuration.splitter_type:
+        case "delimiter":
+            from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+            return RecursiveCharacterTextSplitter(
+                chunk_size=configuration.chunk_size,
+                chunk_overlap=configuration.chunk_overlap,
+            )
+
+        case "semantic":
+            from semantic_text_splitter import TextSplitter
+            from tokenizers import Tokenizer  # type: ignore
+
+            tokenizer = Tokenizer.from_pretrained(configuration.semantic_tokenizer)
+            return TextSplitter.from_huggingface_tokenizer(
+                tokenizer=tokenizer,
+                capacity=configuration.chunk_size,
+                overlap=configuration.chunk_overlap,
+            )
+
+        case _:
+            raise ValueError(
+                "Unrecognized splitter_type in configuration. "
+                "Expected one of: "
+                f"{get_literal_values(configuration, 'splitter_type')}\n"
+                f"Got: {configuration.splitter_type}"
+            )
+
+
+def split_text(splitter_type: str, splitter: Any, content: str) -> list[str]:
+    match splitter_type:
+        case "delimiter":
+            return list(splitter.split_text(content))
+        case _:
+            return list(splitter.chunks(content))
+
+
+# Splitter of a split worker process, built once by `_init_split_worker`
+_worker_splitter: Any = None
+_worker_splitter_type: str = ""
+
+
+def _init_split_worker(configuration: Configuration) -> None:
+    global _worker_splitter, _worker_splitter_type
+    _worker_splitter = make_splitter(configuration)
+    _worker_splitter_type = configuration.splitter_type
+
+
+def _split_in_worker(content: str) -> list[str]:
+    return split_text(_worker_splitter_type, _worker_splitter, content)
+
+
 class DocumentManager:
-    def __init__(self) -> None:
-        self.splitter = self._make_splitter()
+    def __init__(self, config: RunnableConfig | None = None) -> None:
+        self.configuration = Configuration.from_runnable_config(config)
+        self.splitter_type = self.configuration.splitter_type
+        self.split_workers = self.configuration.split_workers or os.cpu_count() or 1
+        self._splitter: Any = None
+
+    @property
+    def splitter(self) -> Any:
+        """The splitter of the serial path, built on first use.
+
+        Split workers build their own, so ingesting with a process pool never
+        loads the tokenizer in this process.
+        """
+        if self._splitter is None:
+            self._splitter = make_splitter(self.configuration)
+        return self._splitter
 
     def _load_metadata(self, comic_dir: Path) -> dict[str, Any]:
         fpath = comic_dir / "metadata.json"
@@ -21,79 +95,123 @@ class DocumentManager:
         with open(chapter_path, encoding="utf-8") as f:
             return f.read()
 
-    def load_from_dir(self, comic_dir: Path) -> list[Document]:
-        docs = []
-
+    def _iter_chapters(
+        self, comic_dir: Path, skip: Callable[[int], bool] | None = None
+    ) -> Iterator[tuple[int, str]]:
+        """Yield (chapter, content) pairs from a novel's chapter files and pack.
+        A chapter file takes precedence over a packed copy of the chapter.
+        """
+        files = {
+            int(fpath.stem): fpath
+            for fpath in iter_chapter_files(comic_dir / "chapters")
+        }
+        packed = PackedChapters(comic_dir) if is_packed(comic_dir) else None
+        try:
+            chapters = set(files) | set(packed.chapters() if packed else [])
+            for chapter in sorted(chapters):
+                if skip is not None and skip(chapter):
+                    continue
+                if chapter in files:
+                    yield chapter, self._load_chapter_content(files[chapter])
+                elif packed is not None:
+                    yield chapter, packed.get(chapter)
+        finally:
+            if packed is not None:
+                packed.close()
+
+    def iter_from_dir(
+        self, comic_dir: Path, skip: Callable[[int], bool] | None = None
+    ) -> Iterator[Document]:
+        """Lazily yield the chapters of a novel in chapter order, leaving out
+        the chapters for which `skip` returns True without reading them.
+        """
         # Load metadata
         metadata = self._load_metadata(comic_dir)
 
         # Load chapters
-        chapter_dir = comic_dir / "chapters"
-        for fpath in sorted(chapter_dir.iterdir(), key=lambda x: int(x.stem)):
-            content = self._load_chapter_content(fpath)
-            doc = Document(
-                page_content=content, metadata={**metadata, "Chương": fpath.stem}
+        for chapter, content in self._iter_chapters(comic_dir, skip):
+            yield Document(
+                page_content=content, metadata={**metadata, "Chương": chapter}
             )
-            docs.append(doc)
 
-        return docs
+    def load_chapter(self, comic_dir: Path, chapter: int) -> Document:
+        """Load a single chapter of a novel, raising KeyError if it is missing."""
+        metadata = self._load_metadata(comic_dir)
+        fpath = comic_dir / "chapters" / f"{chapter}.txt"
+        if fpath.exists():
+            content = self._load_chapter_content(fpath)
+        elif is_packed(comic_dir):
+            with PackedChapters(comic_dir) as packed:
+                content = packed.get(chapter)
+        else:
+            raise KeyError(chapter)
+        return Document(page_content=content, metadata={**metadata, "Chương": chapter})
+
+    def load_from_dir(self, comic_dir: Path) -> list[Document]:
+        return list(self.iter_from_dir(comic_dir))
 
-    def load_documents(self, data_dir: str) -> list[Document]:
+    def iter_novel_dirs(self, data_dir: str) -> Iterator[Path]:
         data_path = Path(data_dir)
         if not data_path.exists():
             raise FileNotFoundError(f"Directory not found: {data_path}")
 
-        docs = []
-        for comic_dir in data_path.iterdir():
+        for comic_dir in sorted(data_path.iterdir()):
             if comic_dir.is_dir():
-                docs.extend(self.load_from_dir(comic_dir))
-        return docs
+                yield comic_dir
+
+    def iter_documents(self, data_dir: str) -> Iterator[Document]:
+        """Lazily yield every chapter of every novel under `data_dir`."""
+        for comic_dir in self.iter_novel_dirs(data_dir):
+            yield from self.iter_from_dir(comic_dir)
+
+    def load_documents(self, data_dir: str) -> list[Document]:
+        return list(self.iter_documents(data_dir))
+
+    def split_document(self, document: Document) -> list[Document]:
+        chunked_content = split_text(
+            self.splitter_type, self.splitter, document.page_content
+        )
+        return self._to_documents(document, chunked_content)
+
+    def iter_split(
+        self, documents: Iterable[Document]
+    ) -> Iterator[tuple[Document, list[Document]]]:
+        """Lazily split documents, yielding each one with its chunks in input order.
+
+        With more than one split worker, documents are chunked in a process pool
+        whose workers build their splitter once. At most two documents per worker
+        are in flight, so memory stays bounded.
+        """
+        if self.split_workers <= 1:
+            for doc in documents:
+                yield doc, self.split_document(doc)
+            return
+
+        # Spawn rather than fork: the tokenizer and ingestion threads are not
+        # fork-safe
+        with ProcessPoolExecutor(
+            max_workers=self.split_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_split_worker,
+            initargs=(self.configuration,),
+        ) as pool:
+            pending: deque[tuple[Document, Future[list[str]]]] = deque()
+            for doc in documents:
+                pending.append((doc, pool.submit(_split_in_worker, doc.page_content)))
+                if len(pending) >= 2 * self.split_workers:
+                    doc, future = pending.popleft()
+                    yield doc, self._to_documents(doc, future.result())
+            while pending:
+                doc, future = pending.popleft()
+                yield doc, self._to_documents(doc, future.result())
+
+    def _to_documents(self, document: Document, chunks: list[str]) -> list[Document]:
+        return [Document(chunk, metadata=document.metadata) for chunk in chunks]
+
+    def iter_chunks(self, documents: Iterable[Document]) -> Iterator[Document]:
+        """Lazily split documents, yielding chunks in document order."""
+        for _, chunks in self.iter_split(documents):
+            yield from chunks
 
     def split_documents(self, documents: list[Document]) -> list[Document]:
-        match self.splitter_type:
-            case "delimiter":
-                chunked_docs: list[Document] = self.splitter.split_documents(documents)
-                return chunked_docs
-
-            case "semantic":
-                all_chunked_docs: list[Document] = []
-                for doc in documents:
-                    metadata = doc.metadata
-                    content = doc.page_content
-                    chunked_content = self.splitter.chunks(content)
-                    chunked_docs = [
-                        Document(chunk, metadata=metadata) for chunk in chunked_content
-                    ]
-                    all_chunked_docs.extend(chunked_docs)
-                return all_chunked_docs
-
-    def _make_splitter(self) -> Any:
-        configuration = Configuration.from_runnable_config()
-        self.splitter_type = configuration.splitter_type
-        match self.splitter_type:
-            case "delimiter":
-                from langchain_text_splitters import RecursiveCharacterTextSplitter
-
-                return RecursiveCharacterTextSplitter(
-                    chunk_size=configuration.chunk_size,
-                    chunk_overlap=configuration.chunk_overlap,
-                )
-
-            case "semantic":
-                from semantic_text_splitter import TextSplitter
-                from tokenizers import Tokenizer  # type: ignore
-
-                tokenizer = Tokenizer.from_pretrained(configuration.semantic_tokenizer)
-                return TextSplitter.from_huggingface_tokenizer(
-                    tokenizer=tokenizer,
-                    capacity=configuration.chunk_size,
-                    overlap=configuration.chunk_overlap,
-                )
-
-            case _:
-                raise ValueError(
-                    "Unrecognized vectorstore_provider in configuration. "
-                    "Expected one of: "
-                    f"{get_literal_values(configuration, 'retriever_provider')}\n"
-                    f"Got: {configuration.splitter_type}"
-                )
+        return list(self.iter_chunks(documents))
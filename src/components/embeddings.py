@@ -0,0 +1,207 @@
+import hashlib
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from src.configs import Configuration
+from src.utils import get_embedding
+
+# Keys per SQL statement, kept under SQLite's bound parameter limit
+_SQL_BATCH = 400
+
+# Number of hits whose recency is buffered before it is written
+_TOUCH_BATCH = 4096
+
+# Share of `max_entries` the cache is evicted down to once it overflows
+_EVICT_TO = 0.9
+
+
+def text_hash(text: str) -> bytes:
+    return hashlib.sha256(text.encode("utf-8")).digest()
+
+
+class EmbeddingCache:
+    """Persistent SQLite cache of embeddings keyed by model and text hash.
+
+    Entries are evicted least recently used first once the cache holds more
+    than `max_entries` embeddings, down to `_EVICT_TO` of it, so the table is
+    only counted again when it overflows. Lookups only record the recency of
+    their hits in memory; it is written with the next batch of embeddings, or
+    every `_TOUCH_BATCH` hits. Hit and miss counts are kept per instance.
+    """
+
+    def __init__(self, path: str | Path, max_entries: int = 1_000_000) -> None:
+        assert max_entries > 0, "Cache size must be positive"
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._touched: dict[tuple[str, bytes], int] = {}
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "model TEXT NOT NULL, "
+            "text_hash BLOB NOT NULL, "
+            "vector BLOB NOT NULL, "
+            "last_used INTEGER NOT NULL, "
+            "PRIMARY KEY (model, text_hash)"
+            ") WITHOUT ROWID"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)"
+        )
+        self._conn.commit()
+        self._count = self._count_entries()
+
+    def _count_entries(self) -> int:
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        return int(count)
+
+    def get_many(self, model: str, hashes: list[bytes]) -> dict[bytes, list[float]]:
+        """Look up embeddings in batches, refreshing the recency of every hit."""
+        found: dict[bytes, list[float]] = {}
+        now = time.time_ns()
+        with self._lock:
+            for start in range(0, len(hashes), _SQL_BATCH):
+                batch = hashes[start : start + _SQL_BATCH]
+                placeholders = ", ".join("?" * len(batch))
+                rows = self._conn.execute(
+                    "SELECT text_hash, vector FROM embeddings "
+                    f"WHERE model = ? AND text_hash IN ({placeholders})",
+                    [model, *batch],
+                ).fetchall()
+                for key, vector in rows:
+                    found[key] = np.frombuffer(vector, dtype=np.float32).tolist()
+
+            self._touched.update(((model, key), now) for key in found)
+            if len(self._touched) >= _TOUCH_BATCH:
+                self._write_touched()
+                self._conn.commit()
+            self.hits += len(found)
+            self.misses += len(hashes) - len(found)
+        return found
+
+    def _write_touched(self) -> None:
+        self._conn.executemany(
+            "UPDATE embeddings SET last_used = ? WHERE model = ? AND text_hash = ?",
+            [(now, model, key) for (model, key), now in self._touched.items()],
+        )
+        self._touched.clear()
+
+    def put_many(self, model: str, items: dict[bytes, list[float]]) -> None:
+        """Store embeddings, then evict the least recently used overflow."""
+        now = time.time_ns()
+        with self._lock:
+            self._write_touched()
+            changes = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT INTO embeddings VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (model, text_hash) DO UPDATE SET "
+                "vector = excluded.vector, last_used = excluded.last_used",
+                [
+                    (model, key, np.asarray(vector, dtype=np.float32).tobytes(), now)
+                    for key, vector in items.items()
+                ],
+            )
+            # Upserts of existing rows count as changes too, so this may
+            # overestimate; the table is counted again before evicting
+            self._count += self._conn.total_changes - changes
+            if self._count > self.max_entries:
+                self._count = self._count_entries()
+            if self._count > self.max_entries:
+                overflow = self._count - int(self.max_entries * _EVICT_TO)
+                deleted = self._conn.execute(
+                    "DELETE FROM embeddings WHERE (model, text_hash) IN ("
+                    "SELECT model, text_hash FROM embeddings "
+                    "ORDER BY last_used LIMIT ?)",
+                    (overflow,),
+                ).rowcount
+                self._count -= deleted
+            self._conn.commit()
+
+    def stats(self) -> dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._write_touched()
+            self._conn.commit()
+            self._conn.close()
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings that serve document embeddings from an `EmbeddingCache`.
+
+    Only texts missing from the cache reach the underlying model, in a single
+    batched call. Query embeddings are not cached here.
+    """
+
+    def __init__(self, model_name: str, cache: EmbeddingCache) -> None:
+        self.model_name = model_name
+        self.cache = cache
+
+    @property
+    def underlying(self) -> Embeddings:
+        # Looked up on each use, so the model registry alone decides when a
+        # model is unloaded
+        return get_embedding(self.model_name)
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        hashes = [text_hash(text) for text in texts]
+        unique = list(dict.fromkeys(hashes))
+        vectors = self.cache.get_many(self.model_name, unique)
+
+        missing = {
+            key: text
+            for key, text in zip(hashes, texts, strict=True)
+            if key not in vectors
+        }
+        if missing:
+            embedded = self.underlying.embed_documents(list(missing.values()))
+            new_vectors = dict(zip(missing, embedded, strict=True))
+            self.cache.put_many(self.model_name, new_vectors)
+            vectors.update(new_vectors)
+
+        return [vectors[key] for key in hashes]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.underlying.embed_query(text)
+
+
+# One cache, and so one SQLite connection, per cache file
+_embedding_caches: dict[Path, EmbeddingCache] = {}
+_embedding_caches_lock = threading.Lock()
+
+
+def get_embedding_cache(configuration: Configuration) -> EmbeddingCache:
+    """Return the shared cache stored at the configured path."""
+    path = Path(configuration.embedding_cache_path).resolve()
+    with _embedding_caches_lock:
+        cache = _embedding_caches.get(path)
+        if cache is None:
+            cache = EmbeddingCache(path, configuration.embedding_cache_size)
+            _embedding_caches[path] = cache
+        cache.max_entries = configuration.embedding_cache_size
+        return cache
+
+
+def make_embedding(configuration: Configuration) -> Embeddings:
+    """Return the shared embedding model, behind the on-disk cache if enabled."""
+    name = configuration.embedding_model
+    if not configuration.embedding_cache:
+        return get_embedding(name)
+    return CachedEmbeddings(name, get_embedding_cache(configuration))
@@ -0,0 +1,279 @@
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass, field
+from functools import partial
+from typing import Any
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+from src.components.document_loaders import DocumentManager
+from src.components.journal import chapter_sources
+from src.components.lexical import LexicalIndex
+from src.components.manifest import (
+    IngestManifest,
+    chapter_key,
+    content_hash,
+    make_chunk_ids,
+)
+from src.components.retrievers import upsert_vectors
+from src.utils import TITLE_KEY
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+# Seconds between two manifest checkpoints during an ingest
+_CHECKPOINT_SECONDS = 10.0
+
+
+def prefetch[T](iterable: Iterable[T], maxsize: int) -> Iterator[T]:
+    """Run `iterable` in a background thread, yielding its items through a
+    bounded queue so the producer never runs more than `maxsize` items ahead.
+
+    Exceptions raised by the producer are re-raised in the consumer, and the
+    producer stops once the consumer is closed.
+    """
+    items: queue.Queue[tuple[Any, BaseException | None]] = queue.Queue(maxsize)
+    stop = threading.Event()
+
+    def put(item: Any, error: BaseException | None = None) -> bool:
+        while not stop.is_set():
+            try:
+                items.put((item, error), timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce() -> None:
+        try:
+            for item in iterable:
+                if not put(item):
+                    return
+            put(_DONE)
+        except BaseException as e:
+            put(_DONE, e)
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item, error = items.get()
+            if item is _DONE:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        stop.set()
+
+
+@dataclass
+class ChapterChunks:
+    """Chunks of one new or changed chapter, with their deterministic ids."""
+
+    key: str
+    digest: str
+    ids: list[str]
+    chunks: list[Document]
+    # Crawl journal fingerprint of the chapter, if it was scraped
+    source: str | None = None
+
+
+@dataclass
+class EmbeddedBatch:
+    """A batch of embedded chunks ready to be upserted."""
+
+    ids: list[str] = field(default_factory=list)
+    texts: list[str] = field(default_factory=list)
+    metadatas: list[dict[str, Any]] = field(default_factory=list)
+    vectors: list[list[float]] = field(default_factory=list)
+    # Chapters whose last chunk is in this batch
+    completed: list[ChapterChunks] = field(default_factory=list)
+
+
+@dataclass
+class IngestStats:
+    chapters: int = 0
+    chunks: int = 0
+    deleted: int = 0
+
+
+class IngestPipeline:
+    """Incremental ingestion with load, split, embed and upsert stages running
+    concurrently, connected by bounded queues.
+
+    Only chapters whose content hash differs from the manifest flow through
+    the pipeline; scraped chapters whose crawl journal entry is unchanged are
+    not even read. Memory stays bounded by the queue sizes and the batch size
+    rather than the size of the corpus. With a `lexical_index`, chunks are
+    indexed for BM25 search alongside the upsert.
+    """
+
+    def __init__(
+        self,
+        doc_manager: DocumentManager,
+        embedding_model: Embeddings,
+        vectorstore: VectorStore,
+        manifest: IngestManifest,
+        batch_size: int = 64,
+        queue_size: int = 4,
+        lexical_index: LexicalIndex | None = None,
+    ) -> None:
+        assert batch_size > 0, "Batch size must be positive"
+        assert queue_size > 0, "Queue size must be positive"
+        self.doc_manager = doc_manager
+        self.embedding_model = embedding_model
+        self.vectorstore = vectorstore
+        self.manifest = manifest
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.lexical_index = lexical_index
+        self._seen: set[str] = set()
+
+    def load(self, data_dir: str) -> Iterator[tuple[str, str, str | None, Document]]:
+        for novel_dir in self.doc_manager.iter_novel_dirs(data_dir):
+            sources = chapter_sources(novel_dir)
+            skip = partial(self._is_unchanged, novel_dir.name, sources)
+            for doc in self.doc_manager.iter_from_dir(novel_dir, skip):
+                chapter = doc.metadata["Chương"]
+                key = chapter_key(novel_dir.name, chapter)
+                self._seen.add(key)
+                digest = content_hash(doc)
+                if not self._is_current(key, digest):
+                    yield key, digest, sources.get(chapter), doc
+
+    def _is_unchanged(
+        self, novel_slug: str, sources: dict[int, str], chapter: int
+    ) -> bool:
+        """Whether the crawl journal shows a chapter unchanged since ingestion."""
+        key = chapter_key(novel_slug, chapter)
+        source = sources.get(chapter)
+        if source is None or not self.manifest.is_current_source(key, source):
+            return False
+        self._seen.add(key)
+        return self._is_indexed(key)
+
+    def _is_current(self, key: str, digest: str) -> bool:
+        return self.manifest.is_current(key, digest) and self._is_indexed(key)
+
+    def _is_indexed(self, key: str) -> bool:
+        # Chapters ingested before the lexical index existed are indexed again
+        ids = self.manifest.chunk_ids(key)
+        return self.lexical_index is None or not ids or ids[0] in self.lexical_index
+
+    def _delete(self, ids: list[str]) -> None:
+        self.vectorstore.delete(ids=ids)
+        if self.lexical_index is not None:
+            self.lexical_index.delete(ids)
+
+    def split(
+        self, chapters: Iterable[tuple[str, str, str | None, Document]]
+    ) -> Iterator[ChapterChunks]:
+        # Chapters come back in input order, possibly split across a process pool
+        keys: deque[tuple[str, str, str | None]] = deque()
+
+        def documents() -> Iterator[Document]:
+            for key, digest, source, doc in chapters:
+                keys.append((key, digest, source))
+                yield doc
+
+        for _, chunks in self.doc_manager.iter_split(documents()):
+            key, digest, source = keys.popleft()
+            novel_slug, chapter = key.rsplit("/", maxsplit=1)
+            ids = make_chunk_ids(novel_slug, chapter, digest, len(chunks))
+            yield ChapterChunks(key, digest, ids, chunks, source)
+
+    def embed(self, chapters: Iterable[ChapterChunks]) -> Iterator[EmbeddedBatch]:
+        batch = EmbeddedBatch()
+        for chapter in chapters:
+            for id_, chunk in zip(chapter.ids, chapter.chunks, strict=True):
+                batch.ids.append(id_)
+                batch.texts.append(chunk.page_content)
+                batch.metadatas.append(chunk.metadata)
+                if len(batch.ids) >= self.batch_size:
+                    batch.vectors = self.embedding_model.embed_documents(batch.texts)
+                    yield batch
+                    batch = EmbeddedBatch()
+            batch.completed.append(chapter)
+
+        if batch.ids or batch.completed:
+            if batch.texts:
+                batch.vectors = self.embedding_model.embed_documents(batch.texts)
+            yield batch
+
+    def upsert(self, batches: Iterable[EmbeddedBatch], stats: IngestStats) -> None:
+        last_checkpoint = time.monotonic()
+        for batch in batches:
+            if batch.ids:
+                upsert_vectors(
+                    self.vectorstore,
+                    batch.ids,
+                    batch.texts,
+                    batch.metadatas,
+                    batch.vectors,
+                )
+                if self.lexical_index is not None:
+                    self.lexical_index.add(batch.ids, batch.texts)
+                stats.chunks += len(batch.ids)
+
+            # A chapter is recorded only once all of its chunks are upserted
+            stale_ids: list[str] = []
+            for chapter in batch.completed:
+                stale_ids.extend(
+                    set(self.manifest.chunk_ids(chapter.key)) - set(chapter.ids)
+                )
+                self.manifest.update(
+                    chapter.key, chapter.digest, chapter.ids, chapter.source
+                )
+                if chapter.chunks and TITLE_KEY in chapter.chunks[0].metadata:
+                    novel_slug = chapter.key.rsplit("/", maxsplit=1)[0]
+                    title = str(chapter.chunks[0].metadata[TITLE_KEY])
+                    self.manifest.set_novel(novel_slug, title)
+            if stale_ids:
+                self._delete(stale_ids)
+                stats.deleted += len(stale_ids)
+            stats.chapters += len(batch.completed)
+            # Checkpoint without invalidating the query-side caches each batch
+            now = time.monotonic()
+            if now - last_checkpoint >= _CHECKPOINT_SECONDS:
+                self.manifest.save(bump_version=False)
+                last_checkpoint = now
+
+    def run(self, data_dir: str) -> IngestStats:
+        """Ingest new and changed chapters, then drop the ones removed from disk."""
+        stats = IngestStats()
+        self._seen.clear()
+
+        loaded = prefetch(self.load(data_dir), self.queue_size)
+        split = prefetch(self.split(loaded), self.queue_size)
+        embedded = prefetch(self.embed(split), self.queue_size)
+        try:
+            self.upsert(embedded, stats)
+        finally:
+            # Keep what was upserted before a failure, so a re-run skips it
+            self.manifest.save()
+
+        # Delete vectors of chapters no longer present on disk
+        removed_ids: list[str] = []
+        for key in set(self.manifest.chapters) - self._seen:
+            removed_ids.extend(self.manifest.remove(key))
+        if removed_ids:
+            self._delete(removed_ids)
+            stats.deleted += len(removed_ids)
+        self.manifest.prune_novels()
+        self.manifest.save()
+
+        logger.info(
+            "Ingested %d chapters: %d chunks upserted, %d deleted",
+            stats.chapters,
+            stats.chunks,
+            stats.deleted,
+        )
+        return stats
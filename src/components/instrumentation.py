@@ -0,0 +1,549 @@
+import json
+import logging
+import math
+import threading
+import time
+from collections.abc import Callable, Sequence
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.documents import Document
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import LLMResult
+from langchain_core.runnables import RunnableConfig
+
+from src.configs import Configuration
+
+logger = logging.getLogger(__name__)
+
+# Name of the custom callback events reporting cache lookups
+CACHE_EVENT = "cache_lookup"
+
+_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+_CHUNK_BUCKETS = (0, 1, 2, 4, 8, 16, 32, 64)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(
+        f'{name}="{_escape(value)}"' for name, value in zip(names, values, strict=True)
+    )
+    return "{" + pairs + "}"
+
+
+def _format_number(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Counter:
+    """Monotonic counter, one series per label value combination."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str]) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values: dict[tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = tuple(labels[name] for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self) -> list[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.labels, key)} {_format_number(value)}"
+            for key, value in values
+        ]
+
+
+class Histogram:
+    """Histogram with cumulative buckets, one series per label combination."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Sequence[str],
+        buckets: Sequence[float] = _LATENCY_BUCKETS,
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets) + (math.inf,)
+        # Per series: bucket counts, then sum and count
+        self._values: dict[tuple[str, ...], list[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(labels[name] for name in self.labels)
+        with self._lock:
+            series = self._values.setdefault(key, [0.0] * (len(self.buckets) + 2))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def samples(self) -> list[str]:
+        with self._lock:
+            values = sorted((key, list(series)) for key, series in self._values.items())
+        lines = []
+        names = self.labels + ("le",)
+        for key, series in values:
+            for bound, count in zip(self.buckets, series, strict=False):
+                labels = _format_labels(names, key + (_format_number(bound),))
+                lines.append(f"{self.name}_bucket{labels} {_format_number(count)}")
+            labels = _format_labels(self.labels, key)
+            lines.append(f"{self.name}_sum{labels} {_format_number(series[-2])}")
+            lines.append(f"{self.name}_count{labels} {_format_number(series[-1])}")
+        return lines
+
+
+class Gauge:
+    """Values read from a callback whenever the registry is rendered, keyed by
+    label values. Used to export the statistics components already keep.
+    """
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Sequence[str],
+        collect: Callable[[], dict[tuple[str, ...], float]],
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._collect = collect
+
+    def samples(self) -> list[str]:
+        return [
+            f"{self.name}{_format_labels(self.labels, key)} {_format_number(value)}"
+            for key, value in sorted(self._collect().items())
+        ]
+
+
+class MetricsRegistry:
+    """In-process metrics, rendered in the Prometheus text exposition format."""
+
+    def __init__(self) -> None:
+        self._metrics: dict[str, Counter | Histogram | Gauge] = {}
+        self._lock = threading.Lock()
+
+    def counter(
+        self, name: str, documentation: str, labels: Sequence[str] = ()
+    ) -> Counter:
+        with self._lock:
+            metric = self._metrics.setdefault(
+                name, Counter(name, documentation, labels)
+            )
+        assert isinstance(metric, Counter), f"{name} is not a counter"
+        return metric
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = _LATENCY_BUCKETS,
+    ) -> Histogram:
+        with self._lock:
+            metric = self._metrics.setdefault(
+                name, Histogram(name, documentation, labels, buckets)
+            )
+        assert isinstance(metric, Histogram), f"{name} is not a histogram"
+        return metric
+
+    def gauge(
+        self,
+        name: str,
+        documentation: str,
+        labels: Sequence[str],
+        collect: Callable[[], dict[tuple[str, ...], float]],
+    ) -> Gauge:
+        """Register a gauge whose values are collected at render time,
+        replacing any gauge registered under the same name.
+        """
+        metric = Gauge(name, documentation, labels, collect)
+        with self._lock:
+            self._metrics[name] = metric
+        return metric
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+TURNS = metrics.counter("rag_turns_total", "Graph runs by outcome.", ["status"])
+TURN_SECONDS = metrics.histogram(
+    "rag_turn_duration_seconds", "Wall time of a graph run."
+)
+NODE_SECONDS = metrics.histogram(
+    "rag_node_duration_seconds", "Wall time of a graph node.", ["node"]
+)
+MODEL_SECONDS = metrics.histogram(
+    "rag_model_call_duration_seconds", "Wall time of a chat model call.", ["model"]
+)
+MODEL_TTFT_SECONDS = metrics.histogram(
+    "rag_model_time_to_first_token_seconds",
+    "Time to the first streamed token of a chat model call.",
+    ["model"],
+)
+MODEL_TOKENS = metrics.counter(
+    "rag_model_tokens_total", "Tokens of chat model calls.", ["model", "type"]
+)
+RETRIEVED_CHUNKS = metrics.histogram(
+    "rag_retrieved_chunks", "Chunks returned by a retriever call.", (), _CHUNK_BUCKETS
+)
+CACHE_LOOKUPS = metrics.counter(
+    "rag_cache_lookups_total", "Cache lookups by cache and result.", ["cache", "result"]
+)
+
+
+@dataclass
+class Span:
+    """A timed run within a turn: a graph node, a model call or a retrieval."""
+
+    name: str
+    kind: str
+    start: float
+    end: float | None = None
+    parent: str | None = None
+    attributes: dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def duration(self) -> float:
+        return (self.end or time.perf_counter()) - self.start
+
+
+class TurnRecorder(BaseCallbackHandler):
+    """Callback handler timing one graph run, recording into `metrics`.
+
+    Spans are kept for the run's breakdown (`summary`) and, with a
+    `trace_path`, appended to it as one JSON line per run.
+    """
+
+    # Called on the thread of the run, so event order and timings are exact
+    run_inline = True
+
+    def __init__(self, trace_path: str = "", thread_id: str | None = None) -> None:
+        self.trace_path = trace_path
+        self.thread_id = thread_id
+        self.spans: list[Span] = []
+        self.cache: list[dict[str, Any]] = []
+        self._open: dict[UUID, Span] = {}
+        self._root: UUID | None = None
+        self._started_at = time.time()
+        self._lock = threading.Lock()
+
+    def _start(
+        self, run_id: UUID, parent_run_id: UUID | None, name: str, kind: str
+    ) -> Span:
+        parent = self._open.get(parent_run_id) if parent_run_id else None
+        span = Span(name, kind, time.perf_counter())
+        if parent is not None:
+            span.parent = parent.name
+        with self._lock:
+            self._open[run_id] = span
+            self.spans.append(span)
+        return span
+
+    def _end(self, run_id: UUID, error: BaseException | None = None) -> Span | None:
+        with self._lock:
+            span = self._open.pop(run_id, None)
+        if span is not None:
+            span.end = time.perf_counter()
+            if error is not None:
+                span.attributes["error"] = type(error).__name__
+        return span
+
+    # Graph and nodes
+
+    def on_chain_start(
+        self,
+        serialized: dict[str, Any] | None,
+        inputs: dict[str, Any],
+        *,
+        run_id: UUID,
+        parent_run_id: UUID | None = None,
+        metadata: dict[str, Any] | None = None,
+        **kwargs: Any,
+    ) -> None:
+        if self._root is None and parent_run_id is None:
+            self._root = run_id
+            self._start(run_id, None, kwargs.get("name") or "graph", "turn")
+        elif parent_run_id == self._root and kwargs.get("name") != "__start__":
+            # Node runs are the direct children of the graph run
+            self._start(run_id, parent_run_id, kwargs.get("name") or "node", "node")
+
+    def on_chain_end(self, outputs: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._finish_chain(run_id)
+
+    def on_chain_error(
+        self, error: BaseException, *, run_id: UUID, **kwargs: Any
+    ) -> None:
+        self._finish_chain(run_id, error)
+
+    def _finish_chain(self, run_id: UUID, error: BaseException | None = None) -> None:
+        span = self._end(run_id, error)
+        if span is None:
+            return
+        if span.kind == "node":
+            NODE_SECONDS.observe(span.duration, node=span.name)
+        elif span.kind == "turn":
+            TURNS.inc(status="error" if error else "ok")
+            TURN_SECONDS.observe(span.duration)
+            if self.trace_path:
+                self._write_trace()
+
+    # Model calls
+
+    def on_chat_model_start(
+        self,
+        serialized: dict[str, Any],
+        messages: list[list[BaseMessage]],
+        *,
+        run_id: UUID,
+        parent_run_id: UUID | None = None,
+        metadata: dict[str, Any] | None = None,
+        **kwargs: Any,
+    ) -> None:
+        span = self._start(
+            run_id, parent_run_id, kwargs.get("name") or "model", "model"
+        )
+        model = (metadata or {}).get("ls_model_name") or (serialized or {}).get(
+            "name", "unknown"
+        )
+        span.attributes["model"] = str(model)
+        node = (metadata or {}).get("langgraph_node")
+        if node:
+            span.parent = str(node)
+
+    def on_llm_new_token(self, token: str, *, run_id: UUID, **kwargs: Any) -> None:
+        span = self._open.get(run_id)
+        if span is not None and "ttft" not in span.attributes:
+            span.attributes["ttft"] = time.perf_counter() - span.start
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        self._finish_model(run_id, response)
+
+    def on_llm_error(
+        self, error: BaseException, *, run_id: UUID, **kwargs: Any
+    ) -> None:
+        self._finish_model(run_id, None, error)
+
+    def _finish_model(
+        self,
+        run_id: UUID,
+        response: LLMResult | None,
+        error: BaseException | None = None,
+    ) -> None:
+        span = self._end(run_id, error)
+        if span is None:
+            return
+        model = span.attributes["model"]
+        MODEL_SECONDS.observe(span.duration, model=model)
+        if "ttft" in span.attributes:
+            MODEL_TTFT_SECONDS.observe(span.attributes["ttft"], model=model)
+        if response is None:
+            return
+
+        prompt_tokens, completion_tokens = _token_usage(response)
+        if prompt_tokens is not None:
+            span.attributes["prompt_tokens"] = prompt_tokens
+            MODEL_TOKENS.inc(prompt_tokens, model=model, type="prompt")
+        if completion_tokens is not None:
+            span.attributes["completion_tokens"] = completion_tokens
+            MODEL_TOKENS.inc(completion_tokens, model=model, type="completion")
+
+    # Retrieval and caches
+
+    def on_retriever_start(
+        self,
+        serialized: dict[str, Any],
+        query: str,
+        *,
+        run_id: UUID,
+        parent_run_id: UUID | None = None,
+        metadata: dict[str, Any] | None = None,
+        **kwargs: Any,
+    ) -> None:
+        span = self._start(
+            run_id, parent_run_id, kwargs.get("name") or "retriever", "retriever"
+        )
+        node = (metadata or {}).get("langgraph_node")
+        if node:
+            span.parent = str(node)
+
+    def on_retriever_end(
+        self, documents: Sequence[Document], *, run_id: UUID, **kwargs: Any
+    ) -> None:
+        span = self._end(run_id)
+        if span is not None:
+            span.attributes["chunks"] = len(documents)
+            RETRIEVED_CHUNKS.observe(len(documents))
+
+    def on_retriever_error(
+        self, error: BaseException, *, run_id: UUID, **kwargs: Any
+    ) -> None:
+        self._end(run_id, error)
+
+    def on_custom_event(
+        self, name: str, data: Any, *, run_id: UUID, **kwargs: Any
+    ) -> None:
+        if name != CACHE_EVENT:
+            return
+        result = "hit" if data["hit"] else "miss"
+        CACHE_LOOKUPS.inc(cache=data["cache"], result=result)
+        with self._lock:
+            self.cache.append({"cache": data["cache"], "result": result})
+
+    # Reporting
+
+    def summary(self) -> dict[str, Any]:
+        """Breakdown of the run: total, per node and per model call, in ms."""
+        with self._lock:
+            spans = list(self.spans)
+            cache = list(self.cache)
+        turn = next((s for s in spans if s.kind == "turn"), None)
+        return {
+            "total_ms": turn.duration * 1000 if turn else 0.0,
+            "nodes": [
+                {"node": s.name, "ms": s.duration * 1000}
+                for s in spans
+                if s.kind == "node"
+            ],
+            "model_calls": [
+                {
+                    "node": s.parent,
+                    "model": s.attributes.get("model"),
+                    "ms": s.duration * 1000,
+                    "ttft_ms": (
+                        s.attributes["ttft"] * 1000 if "ttft" in s.attributes else None
+                    ),
+                    "prompt_tokens": s.attributes.get("prompt_tokens"),
+                    "completion_tokens": s.attributes.get("completion_tokens"),
+                }
+                for s in spans
+                if s.kind == "model"
+            ],
+            "retrievals": [
+                {
+                    "node": s.parent,
+                    "ms": s.duration * 1000,
+                    "chunks": s.attributes.get("chunks"),
+                }
+                for s in spans
+                if s.kind == "retriever"
+            ],
+            "cache": cache,
+        }
+
+    def _write_trace(self) -> None:
+        with self._lock:
+            spans = list(self.spans)
+        turn_start = spans[0].start if spans else 0.0
+        trace = {
+            "trace_id": str(self._root),
+            "thread_id": self.thread_id,
+            "start_time": self._started_at,
+            "spans": [
+                {
+                    "name": s.name,
+                    "kind": s.kind,
+                    "parent": s.parent,
+                    "start_ms": (s.start - turn_start) * 1000,
+                    "duration_ms": s.duration * 1000,
+                    **s.attributes,
+                }
+                for s in spans
+            ],
+        }
+        try:
+            with open(self.trace_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(trace, ensure_ascii=False) + "\n")
+        except OSError:
+            logger.exception("Failed to write trace to %s", self.trace_path)
+
+
+def _token_usage(response: LLMResult) -> tuple[int | None, int | None]:
+    """Prompt and completion tokens of a model call, where the provider reports
+    them, either as message usage metadata or in the provider's output.
+    """
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(
+                getattr(generation, "message", None), "usage_metadata", None
+            )
+            if usage:
+                return usage.get("input_tokens"), usage.get("output_tokens")
+    token_usage = (response.llm_output or {}).get("token_usage") or {}
+    return token_usage.get("prompt_tokens"), token_usage.get("completion_tokens")
+
+
+def instrument(
+    config: RunnableConfig, configuration: Configuration
+) -> tuple[RunnableConfig, TurnRecorder | None]:
+    """Attach a `TurnRecorder` to a run's config when instrumentation is on.
+
+    With instrumentation off, the config is returned as is, so runs pay
+    nothing beyond the cache lookup events, which have no handler.
+    """
+    if not configuration.instrumentation:
+        return config, None
+    thread_id = (config.get("configurable") or {}).get("thread_id")
+    recorder = TurnRecorder(configuration.trace_path, thread_id)
+    callbacks = config.get("callbacks") or []
+    assert isinstance(callbacks, list), "Only a list of callbacks can be extended"
+    return {**config, "callbacks": [*callbacks, recorder]}, recorder
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self) -> None:  # noqa: N802
+        if self.path != "/metrics":
+            self.send_error(404)
+            return
+        body = metrics.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+
+def start_metrics_server(port: int) -> ThreadingHTTPServer:
+    """Serve `metrics` at http://0.0.0.0:<port>/metrics from a daemon thread."""
+    server = ThreadingHTTPServer(("0.0.0.0", port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    logger.info("Serving metrics on port %d", server.server_port)
+    return server
@@ -0,0 +1,62 @@
+import hashlib
+import json
+from pathlib import Path
+from typing import Any
+
+from src.components.corpus import packed_chapters
+
+JOURNAL_NAME = "journal.jsonl"
+
+
+def read_completed(novel_dir: Path) -> dict[int, dict[str, Any]]:
+    """Read the latest `completed` event of each chapter from the crawl journal
+    the scraper keeps in a novel's directory. Returns {} without a journal.
+    """
+    completed: dict[int, dict[str, Any]] = {}
+    path = novel_dir / JOURNAL_NAME
+    if not path.exists():
+        return completed
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                event = json.loads(line)
+                if event.get("status") == "completed":
+                    completed[int(event["chapter"])] = event
+            except (json.JSONDecodeError, KeyError, ValueError):
+                # Truncated last line of an interrupted crawl
+                continue
+    return completed
+
+
+def chapter_sources(novel_dir: Path) -> dict[int, str]:
+    """Fingerprint each journaled chapter of a novel without reading its text.
+
+    A fingerprint combines the hash of the novel's metadata with the content
+    hash the scraper recorded for the chapter. Chapters whose file was modified
+    after the journal entry are left out, as the recorded hash may be stale.
+    Packed chapters are only written by the scraper and the converter, so
+    their entries are trusted.
+    """
+    completed = read_completed(novel_dir)
+    if not completed:
+        return {}
+    try:
+        metadata = (novel_dir / "metadata.json").read_bytes()
+    except FileNotFoundError:
+        return {}
+    metadata_hash = hashlib.sha256(metadata).hexdigest()[:16]
+
+    packed = packed_chapters(novel_dir)
+    sources = {}
+    for chapter, event in completed.items():
+        if "content_hash" not in event:
+            continue
+        try:
+            mtime = (novel_dir / "chapters" / f"{chapter}.txt").stat().st_mtime
+            if mtime > float(event.get("time", 0)):
+                continue
+        except FileNotFoundError:
+            if chapter not in packed:
+                continue
+        sources[chapter] = f"{metadata_hash}:{event['content_hash']}"
+    return sources
@@ -0,0 +1,384 @@
+import json
+import math
+import os
+import re
+import threading
+import unicodedata
+from collections import Counter
+from collections.abc import Sequence
+from dataclasses import dataclass
+from itertools import pairwise
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+from numpy.typing import NDArray
+
+from src.configs import Configuration
+
+# Punctuation ends a phrase, so no syllable bigram spans it
+_PHRASE_BREAK = re.compile(r"[^\w\s]+|_")
+_SYLLABLE = re.compile(r"\w+")
+
+# Largest term frequency stored in a posting
+_MAX_TF = np.iinfo(np.uint16).max
+
+
+def tokenize(text: str) -> list[str]:
+    """Split text into lowercase syllables and adjacent-syllable bigrams.
+
+    Vietnamese words and names are mostly written as space-separated syllables
+    ("Lâm Động", "kiếm pháp"), so bigrams joined by `_` stand in for word
+    segmentation. Text is NFC-normalized so precomposed and combining
+    diacritics produce the same terms.
+    """
+    text = unicodedata.normalize("NFC", text).lower()
+    tokens: list[str] = []
+    for phrase in _PHRASE_BREAK.split(text):
+        syllables = _SYLLABLE.findall(phrase)
+        tokens.extend(syllables)
+        tokens.extend(f"{a}_{b}" for a, b in pairwise(syllables))
+    return tokens
+
+
+def _save_array(path: Path, array: NDArray[Any]) -> None:
+    with open(path, "wb") as f:
+        np.save(f, array)
+
+
+def _load_array(path: Path) -> NDArray[Any]:
+    try:
+        return np.asarray(np.load(path, mmap_mode="r"))
+    except ValueError:
+        # Empty arrays cannot be memory-mapped
+        return np.asarray(np.load(path))
+
+
+@dataclass
+class _Segment:
+    """Immutable postings for the contiguous rows `row_start` to `row_end`."""
+
+    name: str
+    row_start: int
+    row_end: int
+    # Term to the [start, end) slice of its postings in `rows` and `tfs`
+    terms: dict[str, tuple[int, int]]
+    rows: NDArray[np.uint32]
+    tfs: NDArray[np.uint16]
+    lengths: NDArray[np.uint32]
+
+    @property
+    def postings(self) -> int:
+        return len(self.rows)
+
+
+class LexicalIndex:
+    """On-disk inverted index with BM25 scoring.
+
+    Layout of `persist_dir`:
+        index.json              committed segments, row count and live length
+        ids.json                document id of each row, null for deleted rows
+        <segment>.terms.json    term to the slice of its postings
+        <segment>.rows.npy      uint32 row of each posting, grouped by term
+        <segment>.tfs.npy       uint16 term frequency of each posting
+        <segment>.lengths.npy   uint32 token count of each row in the segment
+
+    Every `add` writes a new segment; trailing segments of similar size are
+    merged, dropping deleted rows, so the segment count stays logarithmic in
+    the number of rows. Postings are memory-mapped, so opening the index only
+    reads the term dictionaries.
+    """
+
+    def __init__(
+        self, persist_dir: str | Path, k1: float = 1.2, b: float = 0.75
+    ) -> None:
+        self.persist_dir = Path(persist_dir)
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()
+        self._load()
+
+    # Storage
+
+    def _path(self, name: str) -> Path:
+        return self.persist_dir / name
+
+    def _stamp(self) -> tuple[int, int] | None:
+        try:
+            stat = self._path("index.json").stat()
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns
+
+    def _load_segment(self, entry: dict[str, Any]) -> _Segment:
+        name = entry["name"]
+        with open(self._path(f"{name}.terms.json"), encoding="utf-8") as f:
+            terms = {term: (start, end) for term, (start, end) in json.load(f).items()}
+        return _Segment(
+            name=name,
+            row_start=int(entry["row_start"]),
+            row_end=int(entry["row_end"]),
+            terms=terms,
+            rows=_load_array(self._path(f"{name}.rows.npy")),
+            tfs=_load_array(self._path(f"{name}.tfs.npy")),
+            lengths=_load_array(self._path(f"{name}.lengths.npy")),
+        )
+
+    def _load(self) -> None:
+        self._loaded_stamp = self._stamp()
+        self.count = 0
+        self._next_segment = 0
+        self._total_length = 0
+        self._ids: list[str | None] = []
+        self._segments: list[_Segment] = []
+
+        if self._loaded_stamp is not None:
+            with open(self._path("index.json"), encoding="utf-8") as f:
+                index = json.load(f)
+            self.count = int(index["count"])
+            self._next_segment = int(index["next_segment"])
+            self._total_length = int(index["total_length"])
+            self._segments = [self._load_segment(s) for s in index["segments"]]
+            with open(self._path("ids.json"), encoding="utf-8") as f:
+                self._ids = list(json.load(f))
+
+        self._id_to_row = {id_: row for row, id_ in enumerate(self._ids) if id_}
+        self._deleted = np.fromiter(
+            (id_ is None for id_ in self._ids), dtype=bool, count=len(self._ids)
+        )
+
+    def _maybe_reload(self) -> None:
+        """Pick up writes made by other processes since the index was opened."""
+        if self._stamp() != self._loaded_stamp:
+            self._load()
+
+    def _commit(self) -> None:
+        self.persist_dir.mkdir(parents=True, exist_ok=True)
+        for name, data in (
+            ("ids.json", self._ids),
+            (
+                "index.json",
+                {
+                    "count": self.count,
+                    "next_segment": self._next_segment,
+                    "total_length": self._total_length,
+                    "segments": [
+                        {"name": s.name, "row_start": s.row_start, "row_end": s.row_end}
+                        for s in self._segments
+                    ],
+                },
+            ),
+        ):
+            # index.json is written last: readers only trust what it records
+            tmp_path = self._path(name + ".tmp")
+            tmp_path.write_text(json.dumps(data), encoding="utf-8")
+            os.replace(tmp_path, self._path(name))
+        # In-memory state is already current; only the term dictionaries are
+        # costly to reload
+        self._loaded_stamp = self._stamp()
+
+    def _write_segment(
+        self,
+        row_start: int,
+        terms: NDArray[np.int64],
+        vocabulary: list[str],
+        rows: NDArray[np.uint32],
+        tfs: NDArray[np.uint16],
+        lengths: NDArray[np.uint32],
+    ) -> _Segment:
+        """Write postings sorted by term index, rows ascending within a term."""
+        name = f"seg-{self._next_segment:06d}"
+        self._next_segment += 1
+
+        present = np.flatnonzero(np.bincount(terms, minlength=len(vocabulary)))
+        starts = np.searchsorted(terms, present, side="left")
+        ends = np.searchsorted(terms, present, side="right")
+        term_slices = {
+            vocabulary[t]: (int(s), int(e))
+            for t, s, e in zip(present, starts, ends, strict=True)
+        }
+
+        self.persist_dir.mkdir(parents=True, exist_ok=True)
+        self._path(f"{name}.terms.json").write_text(
+            json.dumps(term_slices, ensure_ascii=False), encoding="utf-8"
+        )
+        _save_array(self._path(f"{name}.rows.npy"), rows)
+        _save_array(self._path(f"{name}.tfs.npy"), tfs)
+        _save_array(self._path(f"{name}.lengths.npy"), lengths)
+        return _Segment(
+            name=name,
+            row_start=row_start,
+            row_end=row_start + len(lengths),
+            terms=term_slices,
+            rows=_load_array(self._path(f"{name}.rows.npy")),
+            tfs=_load_array(self._path(f"{name}.tfs.npy")),
+            lengths=_load_array(self._path(f"{name}.lengths.npy")),
+        )
+
+    def _merge(self, older: _Segment, newer: _Segment) -> _Segment:
+        """Merge two adjacent segments, dropping the postings of deleted rows."""
+        vocabulary = sorted(older.terms.keys() | newer.terms.keys())
+        term_index = {term: i for i, term in enumerate(vocabulary)}
+
+        terms, rows, tfs = [], [], []
+        for segment in (older, newer):
+            slices = sorted(segment.terms.items(), key=lambda item: item[1][0])
+            terms.append(
+                np.repeat(
+                    np.asarray([term_index[t] for t, _ in slices], dtype=np.int64),
+                    [end - start for _, (start, end) in slices],
+                )
+            )
+            rows.append(np.asarray(segment.rows))
+            tfs.append(np.asarray(segment.tfs))
+
+        merged_terms = np.concatenate(terms)
+        merged_rows = np.concatenate(rows)
+        merged_tfs = np.concatenate(tfs)
+        live = ~self._deleted[merged_rows]
+        # Stable: rows of the older segment stay ahead of the newer one's
+        order = np.argsort(merged_terms[live], kind="stable")
+        return self._write_segment(
+            older.row_start,
+            merged_terms[live][order],
+            vocabulary,
+            merged_rows[live][order],
+            merged_tfs[live][order],
+            np.concatenate([older.lengths, newer.lengths]),
+        )
+
+    # Writing
+
+    def add(self, ids: Sequence[str], texts: Sequence[str]) -> None:
+        """Index texts under their ids, replacing rows that share an id."""
+        if len(ids) != len(texts):
+            raise ValueError("Ids and texts must have matching lengths")
+        # Keep only the last occurrence of an id repeated within the batch
+        latest = {id_: i for i, id_ in enumerate(ids)}
+        if not latest:
+            return
+        keep = sorted(latest.values())
+        counts = [Counter(tokenize(texts[i])) for i in keep]
+
+        with self._lock:
+            self._maybe_reload()
+            self._drop_rows(list(latest))
+
+            vocabulary = sorted(set().union(*counts))
+            term_index = {term: i for i, term in enumerate(vocabulary)}
+            postings = sorted(
+                (term_index[term], self.count + offset, min(tf, _MAX_TF))
+                for offset, count in enumerate(counts)
+                for term, tf in count.items()
+            )
+            columns = np.asarray(postings, dtype=np.int64).reshape(-1, 3).T
+            lengths = np.asarray([c.total() for c in counts], dtype=np.uint32)
+
+            segment = self._write_segment(
+                self.count,
+                columns[0],
+                vocabulary,
+                columns[1].astype(np.uint32),
+                columns[2].astype(np.uint16),
+                lengths,
+            )
+            for offset, i in enumerate(keep):
+                self._id_to_row[ids[i]] = self.count + offset
+            self._ids.extend(ids[i] for i in keep)
+            self._deleted = np.concatenate([self._deleted, np.zeros(len(keep), bool)])
+            self.count += len(keep)
+            self._total_length += int(lengths.sum())
+
+            segments = [*self._segments, segment]
+            merged_away = []
+            while (
+                len(segments) >= 2
+                and segments[-2].postings <= 2 * segments[-1].postings
+            ):
+                newer = segments.pop()
+                older = segments.pop()
+                segments.append(self._merge(older, newer))
+                merged_away.extend([older, newer])
+            self._segments = segments
+            self._commit()
+
+            for old in merged_away:
+                for suffix in ("terms.json", "rows.npy", "tfs.npy", "lengths.npy"):
+                    self._path(f"{old.name}.{suffix}").unlink(missing_ok=True)
+
+    def _drop_rows(self, ids: Sequence[str]) -> bool:
+        rows = [self._id_to_row.pop(id_) for id_ in ids if id_ in self._id_to_row]
+        for row in rows:
+            self._ids[row] = None
+            self._deleted[row] = True
+            self._total_length -= int(self._row_length(row))
+        return bool(rows)
+
+    def delete(self, ids: Sequence[str]) -> None:
+        with self._lock:
+            self._maybe_reload()
+            if self._drop_rows(ids):
+                self._commit()
+
+    # Reading
+
+    def _row_length(self, row: int) -> int:
+        for segment in self._segments:
+            if segment.row_start <= row < segment.row_end:
+                return int(segment.lengths[row - segment.row_start])
+        return 0
+
+    def _document_frequency(self, term: str) -> int:
+        # Deleted rows are counted until their segment is merged
+        return sum(
+            end - start
+            for start, end in (s.terms.get(term, (0, 0)) for s in self._segments)
+        )
+
+    def __contains__(self, id_: object) -> bool:
+        with self._lock:
+            self._maybe_reload()
+            return id_ in self._id_to_row
+
+    def search(self, query: str, k: int) -> list[tuple[str, float]]:
+        """Return up to `k` ids and BM25 scores of the rows best matching a query."""
+        with self._lock:
+            self._maybe_reload()
+            live = self.count - int(self._deleted.sum())
+            terms = set(tokenize(query))
+            if not live or not terms:
+                return []
+
+            df = {term: self._document_frequency(term) for term in terms}
+            avg_length = max(self._total_length / live, 1.0)
+            scores = np.zeros(self.count, dtype=np.float32)
+            for segment in self._segments:
+                for term in terms & segment.terms.keys():
+                    start, end = segment.terms[term]
+                    rows = np.asarray(segment.rows[start:end], dtype=np.int64)
+                    tfs = np.asarray(segment.tfs[start:end], dtype=np.float32)
+                    lengths = segment.lengths[rows - segment.row_start]
+                    idf = math.log(1.0 + (live - df[term] + 0.5) / (df[term] + 0.5))
+                    norm = self.k1 * (1.0 - self.b + self.b * lengths / avg_length)
+                    scores[rows] += idf * tfs * (self.k1 + 1.0) / (tfs + norm)
+
+            scores[self._deleted] = 0.0
+            k = min(k, int((scores > 0).sum()))
+            if k <= 0:
+                return []
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top], kind="stable")]
+            return [(str(self._ids[row]), float(scores[row])) for row in top]
+
+
+_lexical_indexes: dict[str, LexicalIndex] = {}
+_lexical_indexes_lock = threading.Lock()
+
+
+def get_lexical_index(configuration: Configuration) -> LexicalIndex:
+    """Return the process-wide lexical index for the configured directory."""
+    key = configuration.lexical_index_dir
+    with _lexical_indexes_lock:
+        if key not in _lexical_indexes:
+            _lexical_indexes[key] = LexicalIndex(key)
+        return _lexical_indexes[key]
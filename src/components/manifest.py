@@ -0,0 +1,174 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Any
+
+from langchain_core.documents import Document
+
+from src.configs import Configuration
+
+
+def chapter_key(novel_slug: str, chapter: str | int) -> str:
+    return f"{novel_slug}/{chapter}"
+
+
+def content_hash(document: Document) -> str:
+    """Hash a chapter's content together with the metadata copied into its chunks."""
+    digest = hashlib.sha256(document.page_content.encode("utf-8"))
+    metadata = json.dumps(document.metadata, sort_keys=True, ensure_ascii=False)
+    digest.update(metadata.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def make_chunk_ids(
+    novel_slug: str, chapter: str | int, digest: str, n_chunks: int
+) -> list[str]:
+    """Deterministic ids for the chunks of a chapter with the given content hash."""
+    return [f"{novel_slug}:{chapter}:{i}:{digest[:16]}" for i in range(n_chunks)]
+
+
+def store_name(configuration: Configuration) -> str:
+    """Name of the configured vector store: its Pinecone index or local directory."""
+    if configuration.retriever_provider == "pinecone":
+        return os.getenv("PINECONE_INDEX_NAME", "default")
+    return configuration.local_store_dir
+
+
+def manifest_path(configuration: Configuration) -> Path:
+    """Path of the manifest of the configured store, embedding model and splitter.
+
+    Each combination indexes different vectors, so each has its own manifest,
+    named after `ingest_manifest_path` with a digest of the combination.
+    """
+    target = {
+        "retriever_provider": configuration.retriever_provider,
+        "store": store_name(configuration),
+        "embedding_model": configuration.embedding_model,
+        "splitter_type": configuration.splitter_type,
+        "chunk_size": configuration.chunk_size,
+        "chunk_overlap": configuration.chunk_overlap,
+    }
+    digest = hashlib.sha256(json.dumps(target, sort_keys=True).encode("utf-8"))
+    path = Path(configuration.ingest_manifest_path)
+    return path.with_name(f"{path.stem}.{digest.hexdigest()[:12]}{path.suffix}")
+
+
+def version_path(manifest_path: str | Path) -> Path:
+    path = Path(manifest_path)
+    return path.with_name(path.name + ".version")
+
+
+def read_corpus_version(manifest_path: str | Path) -> int:
+    """Read the corpus version cheaply, without loading the whole manifest."""
+    try:
+        return int(version_path(manifest_path).read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        return 0
+
+
+class IngestManifest:
+    """Record of the chapters ingested into the vector store.
+
+    Maps each chapter key to its content hash and the ids of its chunks, so a
+    re-run can skip unchanged chapters and delete the vectors of changed or
+    removed ones. `version` is bumped every time the indexed corpus changes and
+    mirrored to a small sidecar file read by the query-side caches. The title
+    of each ingested novel is kept by novel slug for query scoping. Scraped
+    chapters also record their crawl journal fingerprint (`source`), which lets
+    a re-run skip them without reading their text.
+    """
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        self.version = 0
+        self.chapters: dict[str, dict[str, Any]] = {}
+        self.novels: dict[str, str] = {}
+        self._dirty = False
+        # Changes saved by a checkpoint that the version does not reflect yet
+        self._unpublished = False
+        if self.path.exists():
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+            self.version = int(data.get("version", 0))
+            self.chapters = dict(data.get("chapters", {}))
+            self.novels = dict(data.get("novels", {}))
+            self._unpublished = bool(data.get("unpublished", False))
+
+    def is_current(self, key: str, digest: str) -> bool:
+        entry = self.chapters.get(key)
+        return entry is not None and entry["hash"] == digest
+
+    def is_current_source(self, key: str, source: str) -> bool:
+        entry = self.chapters.get(key)
+        return entry is not None and entry.get("source") == source
+
+    def chunk_ids(self, key: str) -> list[str]:
+        entry = self.chapters.get(key)
+        return list(entry["chunk_ids"]) if entry else []
+
+    def update(
+        self,
+        key: str,
+        digest: str,
+        chunk_ids: list[str],
+        source: str | None = None,
+    ) -> None:
+        self.chapters[key] = {"hash": digest, "chunk_ids": chunk_ids}
+        if source is not None:
+            self.chapters[key]["source"] = source
+        self._dirty = True
+
+    def set_novel(self, novel_slug: str, title: str) -> None:
+        if self.novels.get(novel_slug) != title:
+            self.novels[novel_slug] = title
+            self._dirty = True
+
+    def prune_novels(self) -> None:
+        """Forget the titles of novels without any ingested chapter."""
+        slugs = {key.rsplit("/", maxsplit=1)[0] for key in self.chapters}
+        for novel_slug in set(self.novels) - slugs:
+            del self.novels[novel_slug]
+            self._dirty = True
+
+    def remove(self, key: str) -> list[str]:
+        """Forget a chapter, returning the ids of its chunks."""
+        entry = self.chapters.pop(key, None)
+        if entry is None:
+            return []
+        self._dirty = True
+        return list(entry["chunk_ids"])
+
+    def save(self, bump_version: bool = True) -> None:
+        """Persist pending changes atomically, bumping the corpus version.
+
+        With `bump_version=False` the changes are saved as a checkpoint that
+        leaves the version, and so the query-side caches, untouched; the next
+        bumping save publishes them.
+        """
+        if not self._dirty and not (bump_version and self._unpublished):
+            return
+        if bump_version:
+            self.version += 1
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "version": self.version,
+                    "chapters": self.chapters,
+                    "novels": self.novels,
+                    "unpublished": not bump_version,
+                },
+                f,
+                ensure_ascii=False,
+            )
+        os.replace(tmp_path, self.path)
+        self._dirty = False
+        self._unpublished = not bump_version
+        if not bump_version:
+            return
+
+        version_tmp_path = self.path.with_name(self.path.name + ".version.tmp")
+        version_tmp_path.write_text(str(self.version), encoding="utf-8")
+        os.replace(version_tmp_path, version_path(self.path))
@@ -0,0 +1,64 @@
+import os
+from array import array
+from collections.abc import Iterable
+from pathlib import Path
+
+# Chapter texts of a novel, UTF-8 encoded back to back
+PACK_NAME = "chapters.pack"
+# Native int64 (chapter, offset, length) rows sorted by chapter
+INDEX_NAME = "chapters.idx"
+
+
+def read_index(novel_dir: Path) -> dict[int, tuple[int, int]]:
+    """Map each packed chapter of a novel to its (offset, length) in the pack."""
+    path = novel_dir / INDEX_NAME
+    if not path.exists():
+        return {}
+    rows = array("q")
+    rows.frombytes(path.read_bytes())
+    return {rows[i]: (rows[i + 1], rows[i + 2]) for i in range(0, len(rows), 3)}
+
+
+class PackWriter:
+    """Appends chapters to a novel's pack, superseding packed copies of them.
+
+    Only depends on the standard library, so the scraper can write packs
+    without the rest of the project installed. Appended chapters become
+    visible to readers once `save_index` renames the new index into place;
+    existing offsets stay valid, so readers see either the previous chapters
+    or the new ones.
+    """
+
+    def __init__(self, novel_dir: Path) -> None:
+        self.pack_path = novel_dir / PACK_NAME
+        self.index_path = novel_dir / INDEX_NAME
+        self.entries = read_index(novel_dir)
+
+    def __contains__(self, chapter: int) -> bool:
+        return chapter in self.entries
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def read(self, chapter: int) -> str:
+        offset, length = self.entries[chapter]
+        with open(self.pack_path, "rb") as f:
+            f.seek(offset)
+            return f.read(length).decode("utf-8")
+
+    def append(self, chapters: Iterable[tuple[int, str]]) -> None:
+        with open(self.pack_path, "ab") as f:
+            offset = f.tell()
+            for chapter, text in chapters:
+                data = text.encode("utf-8")
+                f.write(data)
+                self.entries[chapter] = (offset, len(data))
+                offset += len(data)
+
+    def save_index(self) -> None:
+        rows = array("q")
+        for chapter in sorted(self.entries):
+            rows.extend((chapter, *self.entries[chapter]))
+        tmp_path = self.index_path.with_name(self.index_path.name + ".tmp")
+        tmp_path.write_bytes(rows.tobytes())
+        os.replace(tmp_path, self.index_path)
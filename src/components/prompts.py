@@ -106,3 +106,48 @@ understand the main topics, outcomes, and any user-specific details that could g
 further assistance.
 
 Here is the summary: {summary}"""
+
+
+CONVERSATION_SUMMARY_PROMPT = """Earlier messages of this conversation have been \
+summarized as follows:
+
+{summary}"""
+
+
+# Labeled example queries scored by the local fast-path router
+ROUTER_EXAMPLES = {
+    "retrieve": [
+        "Who is the main character's master?",
+        "What happens in chapter 12?",
+        "Which sect does the protagonist join?",
+        "What technique does the main character learn first?",
+        "Who wrote this novel?",
+        "Nhân vật chính là ai?",
+        "Sư phụ của nhân vật chính là ai?",
+        "Chương 3 kể về chuyện gì?",
+        "Nhân vật chính tu luyện công pháp gì?",
+        "Tóm tắt nội dung truyện.",
+    ],
+    "general": [
+        "What's the weather like today?",
+        "Can you help me write some Python code?",
+        "What is the capital of France?",
+        "Tell me a joke.",
+        "How do I cook rice?",
+        "Hôm nay thời tiết thế nào?",
+        "Giúp tôi viết một đoạn code Python.",
+        "Thủ đô của Pháp là gì?",
+        "Kể cho tôi một câu chuyện cười.",
+    ],
+    "more-info": [
+        "Tell me about him.",
+        "What happened?",
+        "Who is she?",
+        "Why did he do that?",
+        "What about the other one?",
+        "Kể cho tôi về anh ta.",
+        "Chuyện gì đã xảy ra?",
+        "Cô ấy là ai?",
+        "Tại sao hắn lại làm vậy?",
+    ],
+}
@@ -0,0 +1,229 @@
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Any
+
+import numpy as np
+from langchain_core.documents import Document
+from numpy.typing import NDArray
+
+from src.components.instrumentation import metrics
+from src.configs import Configuration
+from src.utils import ModelRegistry
+
+logger = logging.getLogger(__name__)
+
+cross_encoders = ModelRegistry(max_size=2)
+
+
+def load_cross_encoder(model_name: str, max_length: int) -> Any:
+    """Load a sentence-transformers cross-encoder on the CPU."""
+    try:
+        from sentence_transformers import CrossEncoder
+    except ImportError:
+        raise ImportError(
+            "Reranking needs the sentence-transformers package. Install it with "
+            "`pip install sentence-transformers`, or set `rerank` to False."
+        )
+
+    return cross_encoders.get_or_create(
+        ("cross-encoder", model_name, max_length),
+        lambda: CrossEncoder(model_name, max_length=max_length, device="cpu"),
+    )
+
+
+class CrossEncoderReranker:
+    """Reorders retrieved documents by cross-encoder relevance to the query.
+
+    Candidates are sorted by length and scored in batches of similar length,
+    so little compute is spent on padding, with batches running in parallel
+    threads. When scoring does not finish within `timeout` seconds, or more
+    than `max_pending` batches are already queued, the candidates are returned
+    in their original (vector search) order. Batches of a request that timed
+    out are cancelled, or skipped if they start after its deadline.
+
+    The cross-encoder is loaded on first use and held by the reranker, so it
+    stays loaded even when evicted from the shared `cross_encoders` registry.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        batch_size: int = 16,
+        max_length: int = 512,
+        timeout: float = 0.5,
+        max_workers: int = 2,
+        max_pending: int = 16,
+    ) -> None:
+        assert batch_size > 0, "Batch size must be positive"
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self.timeout = timeout
+        self.calls = 0
+        self.timeouts = 0
+        self.overloads = 0
+        self.failures = 0
+        self._model: Any = None
+        self._lock = threading.Lock()
+        self._model_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="rerank"
+        )
+
+    @property
+    def model(self) -> Any:
+        with self._model_lock:
+            if self._model is None:
+                self._model = load_cross_encoder(self.model_name, self.max_length)
+            return self._model
+
+    def _score_batch(self, query: str, texts: list[str]) -> NDArray[np.float32]:
+        scores = self.model.predict(
+            [(query, text) for text in texts],
+            batch_size=len(texts),
+            show_progress_bar=False,
+            convert_to_numpy=True,
+        )
+        return np.asarray(scores, dtype=np.float32).reshape(-1)
+
+    def _run_batch(
+        self, query: str, texts: list[str], deadline: float | None
+    ) -> NDArray[np.float32]:
+        try:
+            if deadline is not None and time.monotonic() > deadline:
+                raise TimeoutError("Rerank request timed out before the batch ran")
+            return self._score_batch(query, texts)
+        finally:
+            self._slots.release()
+
+    def _acquire_slots(self, count: int) -> bool:
+        for acquired in range(count):
+            if not self._slots.acquire(blocking=False):
+                for _ in range(acquired):
+                    self._slots.release()
+                return False
+        return True
+
+    def score(
+        self, query: str, documents: list[Document], timeout: float | None = None
+    ) -> NDArray[np.float32] | None:
+        """Score documents against the query.
+
+        Returns None past the timeout, or when the queue has no room for the
+        request's batches.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        # Length buckets: neighbours in length order share a batch
+        order = sorted(
+            range(len(documents)), key=lambda i: len(documents[i].page_content)
+        )
+        batches = [
+            order[start : start + self.batch_size]
+            for start in range(0, len(order), self.batch_size)
+        ]
+        if not self._acquire_slots(len(batches)):
+            with self._lock:
+                self.overloads += 1
+            return None
+
+        futures: list[Future[NDArray[np.float32]]] = [
+            self._executor.submit(
+                self._run_batch,
+                query,
+                [documents[i].page_content for i in batch],
+                deadline,
+            )
+            for batch in batches
+        ]
+        _, pending = wait(futures, timeout=timeout)
+        if pending:
+            # Batches already running finish in the background
+            for future in pending:
+                if future.cancel():
+                    self._slots.release()
+            with self._lock:
+                self.timeouts += 1
+            return None
+
+        scores = np.empty(len(documents), dtype=np.float32)
+        for batch, future in zip(batches, futures, strict=True):
+            scores[batch] = future.result()
+        return scores
+
+    def rerank(
+        self, query: str, documents: list[Document], top_n: int
+    ) -> list[Document]:
+        """Return the `top_n` most relevant documents, best first."""
+        if len(documents) <= 1:
+            return documents[:top_n]
+
+        start = time.perf_counter()
+        with self._lock:
+            self.calls += 1
+        try:
+            scores = self.score(query, documents, self.timeout)
+        except Exception:
+            with self._lock:
+                self.failures += 1
+            logger.exception("Reranking failed, keeping the retrieval order")
+            return documents[:top_n]
+
+        if scores is None:
+            logger.warning(
+                "Reranking gave up after %.3fs, keeping the retrieval order",
+                time.perf_counter() - start,
+            )
+            return documents[:top_n]
+
+        ranked = np.argsort(-scores, kind="stable")[:top_n]
+        return [documents[i] for i in ranked]
+
+    def stats(self) -> dict[str, float]:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "timeouts": self.timeouts,
+                "overloads": self.overloads,
+                "failures": self.failures,
+                "timeout_rate": self.timeouts / self.calls if self.calls else 0.0,
+            }
+
+
+_rerankers: dict[tuple[str, int, int, float], CrossEncoderReranker] = {}
+_rerankers_lock = threading.Lock()
+
+
+def get_reranker(configuration: Configuration) -> CrossEncoderReranker:
+    """Return the process-wide reranker for the configured model and limits."""
+    key = (
+        configuration.rerank_model,
+        configuration.rerank_batch_size,
+        configuration.rerank_max_length,
+        configuration.rerank_timeout,
+    )
+    with _rerankers_lock:
+        if key not in _rerankers:
+            _rerankers[key] = CrossEncoderReranker(*key)
+        return _rerankers[key]
+
+
+def _reranker_stats() -> dict[tuple[str, ...], float]:
+    with _rerankers_lock:
+        rerankers = list(_rerankers.items())
+    return {
+        (key[0], stat): float(value)
+        for key, reranker in rerankers
+        for stat, value in reranker.stats().items()
+    }
+
+
+metrics.gauge(
+    "rag_reranker",
+    "Rerank calls and those falling back to the retrieval order on a timeout, "
+    "a full queue or a failure.",
+    ["model", "stat"],
+    _reranker_stats,
+)
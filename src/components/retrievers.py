@@ -1,40 +1,615 @@
-import os
-from collections.abc import Generator
-from contextlib import contextmanager
+import asyncio
+import contextvars
+import json
+import threading
+import time
+from collections.abc import AsyncGenerator, Callable, Generator, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any
 
+import numpy as np
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForRetrieverRun,
+    CallbackManagerForRetrieverRun,
+)
+from langchain_core.documents import Document
 from langchain_core.embeddings import Embeddings
 from langchain_core.runnables import RunnableConfig
-from langchain_core.vectorstores import VectorStoreRetriever
+from langchain_core.vectorstores import VectorStore, VectorStoreRetriever
 
+from src.components.embeddings import make_embedding
+from src.components.instrumentation import CACHE_EVENT, metrics
+from src.components.lexical import LexicalIndex, get_lexical_index
+from src.components.manifest import manifest_path, read_corpus_version, store_name
+from src.components.scopes import matches_filter
+from src.components.vectorstores import LocalVectorStore
 from src.configs import Configuration
 from src.utils import (
+    CHAPTER_KEY,
+    TITLE_KEY,
+    TTLCache,
     get_embedding_dimension,
     get_literal_values,
-    load_embedding,
+    normalize_query,
+)
+
+
+def _default_pinecone_client() -> Any:
+    from pinecone import Pinecone  # type: ignore
+
+    return Pinecone()
+
+
+def _default_pinecone_spec() -> Any:
+    from pinecone import ServerlessSpec
+
+    return ServerlessSpec(cloud="aws", region="us-east-1")
+
+
+# Metadata field the Pinecone vector stores keep the document text under
+PINECONE_TEXT_KEY = "text"
+
+
+def _default_pinecone_vectorstore(index: Any, embedding_model: Embeddings) -> Any:
+    from langchain_pinecone import PineconeVectorStore
+
+    return PineconeVectorStore(
+        index=index, embedding=embedding_model, text_key=PINECONE_TEXT_KEY
+    )
+
+
+class PineconePool:
+    """Long-lived Pinecone client and vector stores shared across queries.
+
+    The client (and its HTTP connection pool), the set of existing indexes,
+    embedding dimensions and vector stores are created once and reused, so a
+    query only pays the vector search round-trip. Stores are built outside the
+    lock, so a slow first build doesn't block queries on other stores. The
+    factories can be swapped for local stand-ins in tests.
+    """
+
+    def __init__(
+        self,
+        client_factory: Callable[[], Any] = _default_pinecone_client,
+        vectorstore_factory: Callable[
+            [Any, Embeddings], VectorStore
+        ] = _default_pinecone_vectorstore,
+        spec_factory: Callable[[], Any] = _default_pinecone_spec,
+    ) -> None:
+        self._client_factory = client_factory
+        self._vectorstore_factory = vectorstore_factory
+        self._spec_factory = spec_factory
+        self._client: Any = None
+        self._index_names: set[str] | None = None
+        self._dimensions: dict[str, int] = {}
+        self._vectorstores: dict[tuple[str, str], VectorStore] = {}
+        # The `pinecone.Index` each pooled store was built on
+        self._indexes: dict[tuple[str, str], Any] = {}
+        self._lock = threading.RLock()
+
+    @property
+    def client(self) -> Any:
+        with self._lock:
+            if self._client is None:
+                self._client = self._client_factory()
+            return self._client
+
+    def _embedding_dimension(self, model_name: str, embedding_model: Embeddings) -> int:
+        with self._lock:
+            dimension = self._dimensions.get(model_name)
+        if dimension is None:
+            dimension = get_embedding_dimension(embedding_model)
+            with self._lock:
+                self._dimensions[model_name] = dimension
+        return dimension
+
+    def ensure_index(
+        self, index_name: str, model_name: str, embedding_model: Embeddings
+    ) -> None:
+        """Create the index if it does not exist, listing Pinecone's indexes once."""
+        client = self.client
+        with self._lock:
+            index_names = self._index_names
+        if index_names is None:
+            index_names = set(client.list_indexes().names())
+            with self._lock:
+                self._index_names = index_names
+        if index_name in index_names:
+            return
+
+        try:
+            client.create_index(
+                name=index_name,
+                dimension=self._embedding_dimension(model_name, embedding_model),
+                spec=self._spec_factory(),
+            )
+        except Exception:
+            # Another process (or thread) may have created it in the meantime
+            if index_name not in set(client.list_indexes().names()):
+                raise
+        with self._lock:
+            index_names.add(index_name)
+
+    def get_vectorstore(
+        self, index_name: str, model_name: str, embedding_model: Embeddings
+    ) -> VectorStore:
+        """Return the pooled vector store for an index and embedding model."""
+        key = (index_name, model_name)
+        with self._lock:
+            vectorstore = self._vectorstores.get(key)
+        if vectorstore is not None:
+            return vectorstore
+
+        self.ensure_index(index_name, model_name, embedding_model)
+        index = self.client.Index(index_name)
+        vectorstore = self._vectorstore_factory(index, embedding_model)
+        with self._lock:
+            # Keep the store of whichever thread published first
+            if key not in self._vectorstores:
+                self._vectorstores[key] = vectorstore
+                self._indexes[key] = index
+            return self._vectorstores[key]
+
+    def index_of(self, vectorstore: VectorStore) -> Any | None:
+        """Return the `pinecone.Index` of a pooled store, or None if not pooled."""
+        with self._lock:
+            for key, pooled in self._vectorstores.items():
+                if pooled is vectorstore:
+                    return self._indexes[key]
+        return None
+
+    def refresh(self) -> None:
+        """Drop the client and every cached lookup so they are rebuilt on next use."""
+        with self._lock:
+            self._client = None
+            self._index_names = None
+            self._dimensions.clear()
+            self._vectorstores.clear()
+            self._indexes.clear()
+
+
+pinecone_pool = PineconePool()
+
+
+class RetrievalCache:
+    """Query-side caches of query embeddings and retrieved documents."""
+
+    def __init__(self, max_size: int = 1024, ttl: float = 3600.0) -> None:
+        self.embeddings = TTLCache[list[float]](max_size, ttl)
+        self.documents = TTLCache[list[Document]](max_size, ttl)
+
+    def clear(self) -> None:
+        self.embeddings.clear()
+        self.documents.clear()
+
+    def stats(self) -> dict[str, dict[str, float]]:
+        return {
+            "embeddings": self.embeddings.stats(),
+            "documents": self.documents.stats(),
+        }
+
+
+_retrieval_caches: dict[tuple[int, float], RetrievalCache] = {}
+_retrieval_caches_lock = threading.Lock()
+
+
+def _retrieval_cache_stats() -> dict[tuple[str, ...], float]:
+    with _retrieval_caches_lock:
+        caches = list(_retrieval_caches.items())
+    return {
+        (str(max_size), str(ttl), name, stat): float(value)
+        for (max_size, ttl), cache in caches
+        for name, stats in cache.stats().items()
+        for stat, value in stats.items()
+    }
+
+
+metrics.gauge(
+    "rag_retrieval_cache",
+    "Size, hits, misses, hit rate and latency saved in seconds of the query "
+    "embedding and retrieved documents caches.",
+    ["max_size", "ttl", "cache", "stat"],
+    _retrieval_cache_stats,
 )
 
 
+def get_retrieval_cache(configuration: Configuration) -> RetrievalCache:
+    """Return the process-wide retrieval cache for the configured size and TTL."""
+    key = (configuration.retrieval_cache_size, configuration.retrieval_cache_ttl)
+    with _retrieval_caches_lock:
+        if key not in _retrieval_caches:
+            _retrieval_caches[key] = RetrievalCache(*key)
+        return _retrieval_caches[key]
+
+
+def embed_query(configuration: Configuration, query: str) -> list[float]:
+    """Embed a query, sharing cached embeddings with the retriever and routers."""
+    embedding_model = make_embedding(configuration)
+    if not configuration.retrieval_cache:
+        return embedding_model.embed_query(query)
+
+    cache = get_retrieval_cache(configuration).embeddings
+    key = (configuration.embedding_model, normalize_query(query))
+    embedding = cache.get(key)
+    if embedding is None:
+        start = time.perf_counter()
+        embedding = embedding_model.embed_query(query)
+        cache.put(key, embedding, cost=time.perf_counter() - start)
+    return embedding
+
+
+async def aembed_query(configuration: Configuration, query: str) -> list[float]:
+    """Async variant of `embed_query`."""
+    embedding_model = make_embedding(configuration)
+    if not configuration.retrieval_cache:
+        return await embedding_model.aembed_query(query)
+
+    cache = get_retrieval_cache(configuration).embeddings
+    key = (configuration.embedding_model, normalize_query(query))
+    embedding = cache.get(key)
+    if embedding is None:
+        start = time.perf_counter()
+        embedding = await embedding_model.aembed_query(query)
+        cache.put(key, embedding, cost=time.perf_counter() - start)
+    return embedding
+
+
+class CachedVectorStoreRetriever(VectorStoreRetriever):
+    """Similarity retriever that caches query embeddings and results.
+
+    Results are keyed by the store, the normalized query, the search kwargs and
+    the corpus version written by ingestion, so re-ingesting the corpus
+    invalidates them. Query embeddings only depend on the embedding model and
+    survive re-ingestion.
+    """
+
+    cache: RetrievalCache
+    namespace: tuple[str, ...]
+    manifest_path: str
+
+    def _cached_embeddings(self) -> Embeddings | None:
+        """The query embedding model, or None when results cannot be cached."""
+        if self.search_type != "similarity":
+            return None
+        return self.vectorstore.embeddings
+
+    def _keys(
+        self, query: str, search_kwargs: dict[str, Any]
+    ) -> tuple[tuple[Any, ...], tuple[str, str]]:
+        normalized = normalize_query(query)
+        results_key = (
+            self.namespace,
+            read_corpus_version(self.manifest_path),
+            normalized,
+            json.dumps(search_kwargs, sort_keys=True, default=str),
+        )
+        return results_key, (self.namespace[-1], normalized)
+
+    def _search_by_vector(
+        self, query: str, embedding: list[float], search_kwargs: dict[str, Any]
+    ) -> list[Document]:
+        # PineconeVectorStore only implements the scored variant
+        search = getattr(
+            self.vectorstore, "similarity_search_by_vector_with_score", None
+        )
+        if search is not None:
+            return [doc for doc, _ in search(embedding, **search_kwargs)]
+        try:
+            return self.vectorstore.similarity_search_by_vector(
+                embedding, **search_kwargs
+            )
+        except NotImplementedError:
+            return self.vectorstore.similarity_search(query, **search_kwargs)
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun, **kwargs: Any
+    ) -> list[Document]:
+        embeddings = self._cached_embeddings()
+        if embeddings is None:
+            return super()._get_relevant_documents(
+                query, run_manager=run_manager, **kwargs
+            )
+
+        search_kwargs = {**self.search_kwargs, **kwargs}
+        results_key, embedding_key = self._keys(query, search_kwargs)
+        docs = self.cache.documents.get(results_key)
+        events = run_manager.get_child()
+        events.on_custom_event(
+            CACHE_EVENT,
+            {"cache": "retrieval", "hit": docs is not None},
+            run_id=run_manager.run_id,
+        )
+        if docs is not None:
+            return [doc.model_copy(deep=True) for doc in docs]
+
+        start = time.perf_counter()
+        embedding = self.cache.embeddings.get(embedding_key)
+        events.on_custom_event(
+            CACHE_EVENT,
+            {"cache": "query_embedding", "hit": embedding is not None},
+            run_id=run_manager.run_id,
+        )
+        if embedding is None:
+            embedding = embeddings.embed_query(query)
+            self.cache.embeddings.put(
+                embedding_key, embedding, cost=time.perf_counter() - start
+            )
+
+        docs = self._search_by_vector(query, embedding, search_kwargs)
+        self.cache.documents.put(
+            results_key,
+            [doc.model_copy(deep=True) for doc in docs],
+            cost=time.perf_counter() - start,
+        )
+        return docs
+
+    async def _aget_relevant_documents(
+        self,
+        query: str,
+        *,
+        run_manager: AsyncCallbackManagerForRetrieverRun,
+        **kwargs: Any,
+    ) -> list[Document]:
+        embeddings = self._cached_embeddings()
+        if embeddings is None:
+            return await super()._aget_relevant_documents(
+                query, run_manager=run_manager, **kwargs
+            )
+
+        search_kwargs = {**self.search_kwargs, **kwargs}
+        results_key, embedding_key = self._keys(query, search_kwargs)
+        docs = self.cache.documents.get(results_key)
+        events = run_manager.get_child()
+        await events.on_custom_event(
+            CACHE_EVENT,
+            {"cache": "retrieval", "hit": docs is not None},
+            run_id=run_manager.run_id,
+        )
+        if docs is not None:
+            return [doc.model_copy(deep=True) for doc in docs]
+
+        start = time.perf_counter()
+        embedding = self.cache.embeddings.get(embedding_key)
+        await events.on_custom_event(
+            CACHE_EVENT,
+            {"cache": "query_embedding", "hit": embedding is not None},
+            run_id=run_manager.run_id,
+        )
+        if embedding is None:
+            embedding = await embeddings.aembed_query(query)
+            self.cache.embeddings.put(
+                embedding_key, embedding, cost=time.perf_counter() - start
+            )
+
+        docs = await asyncio.to_thread(
+            self._search_by_vector, query, embedding, search_kwargs
+        )
+        self.cache.documents.put(
+            results_key,
+            [doc.model_copy(deep=True) for doc in docs],
+            cost=time.perf_counter() - start,
+        )
+        return docs
+
+
+def search_kwargs(configuration: Configuration) -> dict[str, Any]:
+    """Return the search kwargs, over-fetching candidates when reranking."""
+    if not configuration.rerank:
+        return configuration.search_kwargs
+    return {**configuration.search_kwargs, "k": configuration.rerank_candidates}
+
+
+def as_retriever(
+    vectorstore: VectorStore, configuration: Configuration, store_name: str
+) -> VectorStoreRetriever:
+    """Wrap a vector store in a retriever, cached unless disabled."""
+    if not configuration.retrieval_cache:
+        return vectorstore.as_retriever(search_kwargs=search_kwargs(configuration))
+
+    return CachedVectorStoreRetriever(
+        vectorstore=vectorstore,
+        search_kwargs=search_kwargs(configuration),
+        cache=get_retrieval_cache(configuration),
+        namespace=(
+            configuration.retriever_provider,
+            store_name,
+            configuration.embedding_model,
+        ),
+        manifest_path=str(manifest_path(configuration)),
+    )
+
+
 @contextmanager
 def make_pinecone_retriever(
     configuration: Configuration, embedding_model: Embeddings
 ) -> Generator[VectorStoreRetriever, None, None]:
-    from langchain_pinecone import PineconeVectorStore
-    from pinecone import Pinecone, ServerlessSpec  # type: ignore
+    index_name = store_name(configuration)
+    vectorstore = pinecone_pool.get_vectorstore(
+        index_name, configuration.embedding_model, embedding_model
+    )
+    yield as_retriever(vectorstore, configuration, index_name)
 
-    client = Pinecone()
 
-    index_name = os.getenv("PINECONE_INDEX_NAME", "default")
-    if index_name not in client.list_indexes().names():
-        client.create_index(
-            name=index_name,
-            dimension=get_embedding_dimension(embedding_model),
-            spec=ServerlessSpec(cloud="aws", region="us-east-1"),
+def upsert_vectors(
+    vectorstore: VectorStore,
+    ids: list[str],
+    texts: list[str],
+    metadatas: list[dict[str, Any]],
+    vectors: list[list[float]],
+) -> None:
+    """Write documents with precomputed embeddings, without embedding them again."""
+    if isinstance(vectorstore, LocalVectorStore):
+        vectorstore.add_vectors(
+            np.asarray(vectors, dtype=np.float32), texts, metadatas, ids
+        )
+        return
+
+    index = pinecone_pool.index_of(vectorstore)
+    if index is not None:
+        index.upsert(
+            vectors=[
+                {
+                    "id": id_,
+                    "values": vector,
+                    "metadata": metadata | {PINECONE_TEXT_KEY: text},
+                }
+                for id_, text, metadata, vector in zip(
+                    ids, texts, metadatas, vectors, strict=True
+                )
+            ]
         )
+        return
+
+    vectorstore.add_texts(texts, metadatas, ids=ids)
+
+
+def fetch_documents(vectorstore: VectorStore, ids: Sequence[str]) -> list[Document]:
+    """Fetch stored documents by id, in the order of `ids`, skipping missing ones."""
+    if not ids:
+        return []
+    if isinstance(vectorstore, LocalVectorStore):
+        return vectorstore.get_by_ids(ids)
+
+    index = pinecone_pool.index_of(vectorstore)
+    if index is not None:
+        vectors = index.fetch(ids=list(ids)).vectors
+        docs = []
+        for id_ in ids:
+            if id_ not in vectors:
+                continue
+            metadata = dict(vectors[id_].metadata or {})
+            text = str(metadata.pop(PINECONE_TEXT_KEY, ""))
+            docs.append(Document(id=id_, page_content=text, metadata=metadata))
+        return docs
+
+    return list(vectorstore.get_by_ids(ids))
+
+
+def reciprocal_rank_fusion(
+    rankings: Sequence[Sequence[Document]], k: int = 60
+) -> list[Document]:
+    """Merge ranked result lists, scoring each document by the sum of
+    `1 / (k + rank)` over the lists it appears in.
+    """
+    scores: dict[str, float] = {}
+    docs: dict[str, Document] = {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking, start=1):
+            # Stores do not all return ids with search results
+            key = doc.page_content
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+            docs.setdefault(key, doc)
+    return [docs[key] for key in sorted(scores, key=scores.__getitem__, reverse=True)]
+
 
-    vectorstore = PineconeVectorStore.from_existing_index(
-        index_name, embedding=embedding_model
+# Lexical hits fetched per result kept when the results are filtered afterwards
+_FILTERED_OVERFETCH = 5
+
+# Runs lexical searches alongside the vector query
+_lexical_executor = ThreadPoolExecutor(thread_name_prefix="lexical-search")
+
+
+class HybridRetriever(VectorStoreRetriever):
+    """Fuses vector retrieval with BM25 retrieval from a local lexical index.
+
+    The lexical search and the fetch of its documents run concurrently with the
+    vector query, and both rankings are merged with reciprocal rank fusion. A
+    `filter` search kwarg is applied to the lexical hits after fetching them.
+    """
+
+    vector_retriever: VectorStoreRetriever
+    lexical_index: LexicalIndex
+    k: int = 4
+    lexical_k: int = 20
+    rrf_k: int = 60
+
+    def _lexical_documents(
+        self, query: str, search_filter: dict[str, Any] | None
+    ) -> list[Document]:
+        if not search_filter:
+            hits = self.lexical_index.search(query, self.lexical_k)
+            return fetch_documents(self.vectorstore, [id_ for id_, _ in hits])
+
+        hits = self.lexical_index.search(query, self.lexical_k * _FILTERED_OVERFETCH)
+        docs = fetch_documents(self.vectorstore, [id_ for id_, _ in hits])
+        docs = [doc for doc in docs if matches_filter(doc.metadata, search_filter)]
+        return docs[: self.lexical_k]
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun, **kwargs: Any
+    ) -> list[Document]:
+        context = contextvars.copy_context()
+        lexical = _lexical_executor.submit(
+            context.run, self._lexical_documents, query, kwargs.get("filter")
+        )
+        vector_docs = self.vector_retriever.invoke(
+            query, config={"callbacks": run_manager.get_child()}, **kwargs
+        )
+        fused = reciprocal_rank_fusion([vector_docs, lexical.result()], self.rrf_k)
+        return fused[: self.k]
+
+    async def _aget_relevant_documents(
+        self,
+        query: str,
+        *,
+        run_manager: AsyncCallbackManagerForRetrieverRun,
+        **kwargs: Any,
+    ) -> list[Document]:
+        lexical_docs, vector_docs = await asyncio.gather(
+            asyncio.to_thread(self._lexical_documents, query, kwargs.get("filter")),
+            self.vector_retriever.ainvoke(
+                query, config={"callbacks": run_manager.get_child()}, **kwargs
+            ),
+        )
+        fused = reciprocal_rank_fusion([vector_docs, lexical_docs], self.rrf_k)
+        return fused[: self.k]
+
+
+def with_lexical_search(
+    retriever: VectorStoreRetriever, configuration: Configuration
+) -> VectorStoreRetriever:
+    """Wrap a retriever for hybrid search if enabled in the configuration."""
+    if not configuration.hybrid_search:
+        return retriever
+
+    return HybridRetriever(
+        vectorstore=retriever.vectorstore,
+        vector_retriever=retriever,
+        lexical_index=get_lexical_index(configuration),
+        k=search_kwargs(configuration).get("k", 4),
+        lexical_k=configuration.lexical_k,
+        rrf_k=configuration.rrf_k,
     )
-    yield vectorstore.as_retriever(search_kwargs=configuration.search_kwargs)
+
+
+_local_stores: dict[tuple[str, str], LocalVectorStore] = {}
+_local_stores_lock = threading.Lock()
+
+
+def get_local_vectorstore(
+    configuration: Configuration, embedding_model: Embeddings
+) -> LocalVectorStore:
+    """Return the process-wide local vector store for the configuration."""
+    key = (configuration.local_store_dir, configuration.embedding_model)
+    with _local_stores_lock:
+        if key not in _local_stores:
+            _local_stores[key] = LocalVectorStore(
+                configuration.local_store_dir,
+                embedding_model,
+                dtype=configuration.local_store_dtype,
+                partition_key=TITLE_KEY,
+                range_key=CHAPTER_KEY,
+            )
+        return _local_stores[key]
+
+
+@contextmanager
+def make_local_retriever(
+    configuration: Configuration, embedding_model: Embeddings
+) -> Generator[VectorStoreRetriever, None, None]:
+    vectorstore = get_local_vectorstore(configuration, embedding_model)
+    yield as_retriever(vectorstore, configuration, store_name(configuration))
 
 
 @contextmanager
@@ -43,11 +618,15 @@ def make_retriever(
 ) -> Generator[VectorStoreRetriever, None, None]:
     """Create a retriever for the agent, based on the current configuration."""
     configuration = Configuration.from_runnable_config(config)
-    embedding_model = load_embedding(configuration.embedding_model)
+    embedding_model = make_embedding(configuration)
     match configuration.retriever_provider:
         case "pinecone":
             with make_pinecone_retriever(configuration, embedding_model) as retriever:
-                yield retriever
+                yield with_lexical_search(retriever, configuration)
+
+        case "local":
+            with make_local_retriever(configuration, embedding_model) as retriever:
+                yield with_lexical_search(retriever, configuration)
 
         case _:
             raise ValueError(
@@ -56,3 +635,23 @@ def make_retriever(
                 f"{get_literal_values(configuration, 'retriever_provider')}\n"
                 f"Got: {configuration.vectorstore_provider}"
             )
+
+
+@asynccontextmanager
+async def amake_retriever(
+    config: RunnableConfig | None = None,
+) -> AsyncGenerator[VectorStoreRetriever, None]:
+    """Async variant of `make_retriever`.
+
+    Building or fetching the pooled retriever may load models or call the
+    vector store's control plane, so it runs off the event loop.
+    """
+    manager = make_retriever(config)
+    retriever = await asyncio.to_thread(manager.__enter__)
+    try:
+        yield retriever
+    except BaseException as e:
+        if not manager.__exit__(type(e), e, e.__traceback__):
+            raise
+    else:
+        manager.__exit__(None, None, None)
@@ -0,0 +1,118 @@
+import threading
+from collections.abc import Callable
+from typing import Literal, cast
+
+import numpy as np
+from numpy.typing import NDArray
+
+from src.components.ann import normalize
+from src.components.instrumentation import metrics
+from src.components.prompts import ROUTER_EXAMPLES
+from src.configs import Configuration
+from src.graph.state import Router
+
+RouteType = Literal["general", "retrieve", "more-info"]
+
+
+class CentroidRouter:
+    """Local query classifier scoring a query embedding against the centroid of
+    each route's labeled example queries.
+
+    A query is routed locally only when its best centroid similarity reaches
+    `min_similarity` and beats the runner-up by `min_margin`; otherwise the
+    caller should fall back to the LLM router.
+    """
+
+    def __init__(
+        self,
+        examples: dict[str, list[str]],
+        embed: Callable[[str], list[float]],
+        min_similarity: float = 0.5,
+        min_margin: float = 0.1,
+    ) -> None:
+        self.labels = list(examples)
+        self.min_similarity = min_similarity
+        self.min_margin = min_margin
+        self.calls = 0
+        self.fast_path = 0
+        self._lock = threading.Lock()
+
+        centroids = []
+        for label in self.labels:
+            vectors = np.asarray([embed(q) for q in examples[label]], np.float32)
+            centroids.append(normalize(vectors).mean(axis=0))
+        self.centroids: NDArray[np.float32] = normalize(np.asarray(centroids))
+
+    def classify(self, embedding: list[float]) -> Router | None:
+        """Route a query embedding, or return None when it is ambiguous."""
+        query = normalize(np.asarray(embedding, dtype=np.float32))
+        scores = self.centroids @ query
+        ranked = np.argsort(-scores)
+        best = float(scores[ranked[0]])
+        margin = best - float(scores[ranked[1]]) if len(ranked) > 1 else best
+
+        confident = best >= self.min_similarity and margin >= self.min_margin
+        with self._lock:
+            self.calls += 1
+            self.fast_path += int(confident)
+        if not confident:
+            return None
+
+        label = self.labels[ranked[0]]
+        return {
+            "logic": (
+                f"The inquiry closely matches known `{label}` inquiries "
+                f"(similarity {best:.2f}, margin {margin:.2f})."
+            ),
+            "type": cast(RouteType, label),
+        }
+
+    def stats(self) -> dict[str, float]:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "fast_path": self.fast_path,
+                "llm_fallbacks": self.calls - self.fast_path,
+                "avoided_share": self.fast_path / self.calls if self.calls else 0.0,
+                "min_similarity": self.min_similarity,
+                "min_margin": self.min_margin,
+            }
+
+
+_routers: dict[tuple[str, float, float], CentroidRouter] = {}
+_routers_lock = threading.Lock()
+
+
+def _router_stats() -> dict[tuple[str, ...], float]:
+    with _routers_lock:
+        routers = list(_routers.items())
+    return {
+        (model, str(min_similarity), str(min_margin), stat): float(value)
+        for (model, min_similarity, min_margin), router in routers
+        for stat, value in router.stats().items()
+        if stat in ("calls", "fast_path", "llm_fallbacks", "avoided_share")
+    }
+
+
+metrics.gauge(
+    "rag_fast_router",
+    "Queries classified by the fast router, the ones left to the LLM router and "
+    "the share of LLM router calls avoided.",
+    ["embedding_model", "min_similarity", "min_margin", "stat"],
+    _router_stats,
+)
+
+
+def get_fast_router(
+    configuration: Configuration, embed: Callable[[str], list[float]]
+) -> CentroidRouter:
+    """Return the process-wide fast router for the configured embedding model."""
+    key = (
+        configuration.embedding_model,
+        configuration.fast_router_min_similarity,
+        configuration.fast_router_min_margin,
+    )
+    with _routers_lock:
+        if key not in _routers:
+            _routers[key] = CentroidRouter(ROUTER_EXAMPLES, embed, *key[1:])
+        return _routers[key]
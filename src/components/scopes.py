@@ -0,0 +1,134 @@
+import re
+import threading
+import unicodedata
+from collections.abc import Iterable
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from src.components.manifest import IngestManifest, manifest_path, read_corpus_version
+from src.configs import Configuration
+from src.utils import CHAPTER_KEY, TITLE_KEY
+
+# Chapter references in folded text: "chuong 12", "chapter 3-5", "chuong 3 den 7"
+_CHAPTER_WORD = r"(?:chuong|chapter|chap)"
+_CHAPTER_RANGE = re.compile(
+    rf"\b{_CHAPTER_WORD}\s*(\d+)"
+    rf"(?:\s*(?:-|den|toi|to|through)\s*(?:{_CHAPTER_WORD}\s*)?(\d+))?\b"
+)
+
+
+def fold(text: str) -> str:
+    """Lowercase and strip diacritics and punctuation, so "Đấu Phá Thương
+    Khung!" and "dau pha thuong khung" compare equal.
+    """
+    text = unicodedata.normalize("NFD", text.lower().replace("đ", "d"))
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    text = re.sub(r"[–—]", "-", text)
+    return " ".join(re.sub(r"[^\w-]+", " ", text).split())
+
+
+@dataclass
+class QueryScope:
+    """The novel and chapter range a query is about, where it names them."""
+
+    novel: str | None = None
+    chapter_start: int | None = None
+    chapter_end: int | None = None
+
+    def to_filter(self) -> dict[str, Any]:
+        """Express the scope as a Pinecone-style metadata filter."""
+        search_filter: dict[str, Any] = {}
+        if self.novel is not None:
+            search_filter[TITLE_KEY] = {"$eq": self.novel}
+        chapters = {}
+        if self.chapter_start is not None:
+            chapters["$gte"] = self.chapter_start
+        if self.chapter_end is not None:
+            chapters["$lte"] = self.chapter_end
+        if chapters:
+            search_filter[CHAPTER_KEY] = chapters
+        return search_filter
+
+
+def parse_scope(query: str, titles: Iterable[str]) -> QueryScope:
+    """Find the novel (out of `titles`) and chapter range named in a query."""
+    folded = f" {fold(query)} "
+    novel = next(
+        (
+            title
+            for title in sorted(titles, key=len, reverse=True)
+            if fold(title) and f" {fold(title)} " in folded
+        ),
+        None,
+    )
+
+    match = _CHAPTER_RANGE.search(folded)
+    if match is None:
+        return QueryScope(novel)
+    start = int(match.group(1))
+    end = int(match.group(2)) if match.group(2) else start
+    return QueryScope(novel, min(start, end), max(start, end))
+
+
+def _comparable(value: Any) -> Any:
+    if isinstance(value, str) and value.strip().lstrip("-").isdigit():
+        return int(value)
+    return value
+
+
+def matches_filter(metadata: dict[str, Any], search_filter: dict[str, Any]) -> bool:
+    """Evaluate a Pinecone-style metadata filter against a document's metadata."""
+    for key, condition in search_filter.items():
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        value = _comparable(metadata.get(key))
+        for op, operand in condition.items():
+            if op == "$in":
+                matched = value in [_comparable(v) for v in operand]
+            elif value is None:
+                matched = False
+            else:
+                operand = _comparable(operand)
+                match op:
+                    case "$eq":
+                        matched = value == operand
+                    case "$ne":
+                        matched = value != operand
+                    case "$gt":
+                        matched = value > operand
+                    case "$gte":
+                        matched = value >= operand
+                    case "$lt":
+                        matched = value < operand
+                    case "$lte":
+                        matched = value <= operand
+                    case _:
+                        raise ValueError(f"Unsupported filter operator: {op}")
+            if not matched:
+                return False
+    return True
+
+
+_titles: dict[Path, tuple[int, list[str]]] = {}
+_titles_lock = threading.Lock()
+
+
+def get_novel_titles(configuration: Configuration) -> list[str]:
+    """Titles of the ingested novels, reloaded when the corpus version changes."""
+    path = manifest_path(configuration)
+    version = read_corpus_version(path)
+    with _titles_lock:
+        cached = _titles.get(path)
+        if cached is None or cached[0] != version:
+            titles = sorted(set(IngestManifest(path).novels.values()))
+            cached = _titles[path] = (version, titles)
+        return cached[1]
+
+
+def scope_filter(configuration: Configuration, query: str) -> dict[str, Any] | None:
+    """Return the metadata filter scoping retrieval for a query, if any."""
+    if not configuration.scoped_retrieval:
+        return None
+    titles = get_novel_titles(configuration)
+    return parse_scope(query, titles).to_filter() or None
@@ -0,0 +1,152 @@
+import logging
+import threading
+from collections import OrderedDict
+from collections.abc import Callable, Sequence
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+from langchain_core.messages import BaseMessage
+
+from src.utils import count_message_tokens
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ThreadSummary:
+    """Summary of a conversation thread not applied to its state yet, and the
+    messages folded into it.
+    """
+
+    summary: str = ""
+    folded_ids: set[str] = field(default_factory=set)
+
+
+def select_evicted(
+    messages: Sequence[BaseMessage],
+    token_budget: int,
+    count_tokens: Callable[[str], int],
+    keep_last: int = 2,
+) -> list[BaseMessage]:
+    """Return the oldest messages to fold into the summary so the rest fit the
+    token budget. The latest `keep_last` messages are always kept.
+    """
+    if count_message_tokens(messages, count_tokens) <= token_budget:
+        return []
+
+    kept_tokens = 0
+    split = len(messages)
+    for i in range(len(messages) - 1, -1, -1):
+        kept_tokens += count_message_tokens([messages[i]], count_tokens)
+        if kept_tokens > token_budget and len(messages) - i > keep_last:
+            break
+        split = i
+    return list(messages[:split])
+
+
+class ConversationSummarizer:
+    """Summarizes evicted messages in the background, per conversation thread.
+
+    Summaries are incremental: each job folds only newly evicted messages into
+    the thread's previous summary. Results are kept per thread until the next
+    turn takes them into the graph state, which the checkpointer persists; a
+    thread has at most one job in flight. A result lost before it is taken,
+    e.g. on restart, is only wasted work: its messages are still in the state,
+    so they are evicted and summarized again.
+    """
+
+    def __init__(self, max_threads: int = 1024, max_workers: int = 2) -> None:
+        self.max_threads = max_threads
+        self._summaries: OrderedDict[str, ThreadSummary] = OrderedDict()
+        self._jobs: dict[str, Future[None]] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="summarize"
+        )
+
+    def get(self, thread_id: str) -> ThreadSummary | None:
+        with self._lock:
+            return self._summaries.get(thread_id)
+
+    def take(self, thread_id: str) -> ThreadSummary | None:
+        """Remove and return the thread's summary, once it is in the graph state.
+
+        Nothing is taken while a job is running, as it may build on the summary.
+        """
+        with self._lock:
+            if thread_id in self._jobs:
+                return None
+            return self._summaries.pop(thread_id, None)
+
+    def is_running(self, thread_id: str) -> bool:
+        with self._lock:
+            return thread_id in self._jobs
+
+    def schedule(
+        self,
+        thread_id: str,
+        summary: str,
+        evicted: list[BaseMessage],
+        summarize: Callable[[str, list[BaseMessage]], str],
+    ) -> bool:
+        """Fold `evicted` into the thread's summary in the background.
+
+        Args:
+            thread_id: Conversation thread the messages belong to
+            summary: Summary the evicted messages follow, used when this
+                summarizer holds none for the thread yet
+            evicted: Messages to fold, oldest first
+            summarize: Called with the previous summary and the evicted messages,
+                returns the new summary
+
+        Returns:
+            Whether a job was started; False when one is already running
+        """
+        with self._lock:
+            if not evicted or thread_id in self._jobs:
+                return False
+            self._jobs[thread_id] = self._executor.submit(
+                self._run, thread_id, summary, evicted, summarize
+            )
+            return True
+
+    def _run(
+        self,
+        thread_id: str,
+        summary: str,
+        evicted: list[BaseMessage],
+        summarize: Callable[[str, list[BaseMessage]], str],
+    ) -> None:
+        try:
+            previous = self.get(thread_id) or ThreadSummary(summary)
+            # A job finished since the turn started may have folded some already
+            evicted = [m for m in evicted if m.id not in previous.folded_ids]
+            if not evicted:
+                return
+            try:
+                new_summary = summarize(previous.summary, evicted)
+            except Exception:
+                logger.exception("Failed to summarize thread %s", thread_id)
+                return
+
+            folded_ids = previous.folded_ids | {
+                m.id for m in evicted if m.id is not None
+            }
+            with self._lock:
+                self._summaries[thread_id] = ThreadSummary(new_summary, folded_ids)
+                self._summaries.move_to_end(thread_id)
+                while len(self._summaries) > self.max_threads:
+                    self._summaries.popitem(last=False)
+        finally:
+            with self._lock:
+                self._jobs.pop(thread_id, None)
+
+    def wait(self, thread_id: str, timeout: float | None = None) -> None:
+        """Block until the thread's pending job, if any, has finished."""
+        with self._lock:
+            job = self._jobs.get(thread_id)
+        if job is not None:
+            job.exception(timeout)
+
+
+conversation_summarizer = ConversationSummarizer()
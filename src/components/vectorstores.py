@@ -0,0 +1,762 @@
+import json
+import os
+import shutil
+import threading
+import uuid
+from collections.abc import Callable, Iterable, Sequence
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+from numpy.typing import NDArray
+
+from src.components.ann import IVFIndex, normalize
+
+# Number of rows scored per matrix product, bounding the temporary buffers
+_BLOCK_ROWS = 65536
+
+# Number of IVF lists probed when `nprobe` is not given in the search kwargs
+DEFAULT_NPROBE = 8
+
+# Range column value of rows without an integer value for the range key
+_NO_VALUE = np.iinfo(np.int64).min
+
+_COMPARISONS: dict[str, Callable[[Any, Any], NDArray[np.bool_]]] = {
+    "$eq": np.equal,
+    "$ne": np.not_equal,
+    "$gt": np.greater,
+    "$gte": np.greater_equal,
+    "$lt": np.less,
+    "$lte": np.less_equal,
+    "$in": np.isin,
+}
+
+
+# Files of a store besides index.json, replaced as a whole by `compact`
+_DATA_FILES = (
+    "vectors.bin",
+    "offsets.bin",
+    "documents.jsonl",
+    "ids.jsonl",
+    "deleted.bin",
+    # Written by stores before ids were appended to ids.jsonl
+    "ids.json",
+    "partitions.bin",
+    "ranges.bin",
+    "ivf.npz",
+    "ivf.labels",
+)
+_STAGING_DIR = "compacting"
+_COMPACTED_DIR = "compacted"
+_PLAN_FILE = "plan.json"
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _as_int(value: Any) -> int | None:
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str) and value.strip().lstrip("-").isdigit():
+        return int(value)
+    return None
+
+
+def _condition(value: Any) -> dict[str, Any]:
+    """Normalize a filter value to Pinecone-style `{"$op": operand}` form."""
+    return value if isinstance(value, dict) else {"$eq": value}
+
+
+class LocalVectorStore(VectorStore):
+    """In-process vector store backed by memory-mapped NumPy matrices.
+
+    Layout of `persist_dir`:
+        index.json       dimension, dtype and committed sizes of the other files
+        vectors.bin      row-major matrix of L2-normalized embeddings
+        documents.jsonl  one serialized document per row
+        offsets.bin      int64 byte offset of each row in documents.jsonl
+        ids.jsonl        document id of each row, one JSON string per line
+        deleted.bin      int64 numbers of the rows deleted since compaction
+        partitions.bin   int32 partition of each row, -1 for none
+        ranges.bin       int64 value of the range key of each row
+        ivf.npz          optional IVF index over the rows, see `IVFIndex`
+        ivf.labels       IVF lists of the rows added since the index was built
+        compacted/       a committed `compact` being moved into place
+
+    The matrix is opened read-only with `np.memmap`, so opening a store is
+    near-instant and its pages are shared between every process reading it.
+    Search is exact cosine top-k over the matrix, or approximate through the
+    IVF index once one has been built with `build_ann_index`. The `nprobe` and
+    `exact` search kwargs tune or bypass the approximate search.
+
+    Rows are partitioned by the `partition_key` metadata value (e.g. the novel)
+    and carry the integer `range_key` value (e.g. the chapter) in a column. A
+    Pinecone-style `filter` on those keys scores only the matching rows, so a
+    search scoped to one partition costs in proportion to that partition.
+    """
+
+    def __init__(
+        self,
+        persist_dir: str | Path,
+        embedding: Embeddings,
+        dtype: str = "float32",
+        partition_key: str | None = None,
+        range_key: str | None = None,
+    ) -> None:
+        self.persist_dir = Path(persist_dir)
+        self._embedding = embedding
+        self.dtype = np.dtype(dtype)
+        self.partition_key = partition_key
+        self.range_key = range_key
+        self._lock = threading.RLock()
+        self._load()
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embedding
+
+    @property
+    def vectors(self) -> NDArray[Any]:
+        """The stored embedding matrix, including deleted rows."""
+        return self._vectors
+
+    # Storage
+
+    def _path(self, name: str) -> Path:
+        return self.persist_dir / name
+
+    def _stamp(self) -> tuple[int, int] | None:
+        # index.json is replaced on every commit, so its inode changes too
+        try:
+            stat = self._path("index.json").stat()
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns
+
+    def _load(self) -> None:
+        self._finish_compaction()
+        self._loaded_stamp = self._stamp()
+        self.dim: int | None = None
+        self.count = 0
+        self._docs_size = 0
+        self._ids_size = 0
+        self._deleted_count = 0
+        self._ids: list[str | None] = []
+        self._partitions: list[str] = []
+        self._columns_on_disk = True
+        self._ids_on_disk = True
+
+        if self._loaded_stamp is not None:
+            with open(self._path("index.json"), encoding="utf-8") as f:
+                index = json.load(f)
+            self.dim = int(index["dim"])
+            self.dtype = np.dtype(index["dtype"])
+            self.count = int(index["count"])
+            self._docs_size = int(index["documents_size"])
+            self._partitions = list(index.get("partitions", []))
+            self._columns_on_disk = "partitions" in index
+            self._ids_on_disk = "ids_size" in index
+            if self._ids_on_disk:
+                self._ids_size = int(index["ids_size"])
+                self._deleted_count = int(index["deleted"])
+                self._ids = self._read_ids()
+            else:
+                with open(self._path("ids.json"), encoding="utf-8") as f:
+                    self._ids = list(json.load(f))
+
+        self._open_matrices()
+
+        self._partition_index = {name: i for i, name in enumerate(self._partitions)}
+        if self.count and not self._columns_on_disk:
+            # Stores written before the columns existed rebuild them in memory
+            docs = self._read_documents(range(self.count))
+            partition_ids, range_values = self._column_values(
+                doc.metadata for doc in docs
+            )
+            self._partition_ids: NDArray[np.int32] = np.asarray(
+                partition_ids, dtype=np.int32
+            )
+            self._range_values: NDArray[np.int64] = np.asarray(
+                range_values, dtype=np.int64
+            )
+
+        self._id_to_row = {id_: row for row, id_ in enumerate(self._ids) if id_}
+        self._deleted_rows = np.fromiter(
+            (id_ is None for id_ in self._ids), dtype=bool, count=len(self._ids)
+        )
+
+        self.ann_index: IVFIndex | None = None
+        if self._path("ivf.npz").exists():
+            ann_index = IVFIndex.load(self._path("ivf.npz"), self.count)
+            if ann_index.indexed <= self.count:
+                self.ann_index = ann_index
+
+    @property
+    def _deleted(self) -> NDArray[np.bool_]:
+        """Whether each row is deleted."""
+        return self._deleted_rows[: self.count]
+
+    def _read_ids(self) -> list[str | None]:
+        ids: list[str | None] = []
+        if self._ids_size:
+            with open(self._path("ids.jsonl"), "rb") as f:
+                ids = [json.loads(line) for line in f.read(self._ids_size).splitlines()]
+        if self._deleted_count:
+            deleted = np.fromfile(
+                self._path("deleted.bin"), dtype=np.int64, count=self._deleted_count
+            )
+            for row in deleted.tolist():
+                ids[row] = None
+        return ids
+
+    def _open_matrices(self) -> None:
+        """Map the committed rows of the row-aligned files."""
+        self._partition_rows: list[NDArray[np.int64]] | None = None
+        if self.count and self.dim:
+            self._vectors: NDArray[Any] = np.memmap(
+                self._path("vectors.bin"),
+                dtype=self.dtype,
+                mode="r",
+                shape=(self.count, self.dim),
+            )
+            self._offsets: NDArray[np.int64] = np.memmap(
+                self._path("offsets.bin"), dtype=np.int64, mode="r", shape=(self.count,)
+            )
+        else:
+            self._vectors = np.empty((0, self.dim or 0), dtype=self.dtype)
+            self._offsets = np.empty(0, dtype=np.int64)
+
+        if self.count and self._columns_on_disk:
+            self._partition_ids = np.memmap(
+                self._path("partitions.bin"),
+                dtype=np.int32,
+                mode="r",
+                shape=(self.count,),
+            )
+            self._range_values = np.memmap(
+                self._path("ranges.bin"), dtype=np.int64, mode="r", shape=(self.count,)
+            )
+        elif not self.count:
+            self._partition_ids = np.empty(0, dtype=np.int32)
+            self._range_values = np.empty(0, dtype=np.int64)
+
+    def _maybe_reload(self) -> None:
+        """Pick up writes made by other processes since the store was opened."""
+        if self._stamp() != self._loaded_stamp or self._path(_COMPACTED_DIR).exists():
+            self._load()
+
+    def _commit(self) -> None:
+        """Record the appended rows and deletes, and map the new rows.
+
+        Writers append to the data files and update the in-memory state, so a
+        commit only rewrites index.json, whatever the size of the store.
+        """
+        index = {
+            "dim": self.dim,
+            "dtype": self.dtype.name,
+            "count": self.count,
+            "documents_size": self._docs_size,
+            "partitions": self._partitions,
+            "ids_size": self._ids_size,
+            "deleted": self._deleted_count,
+        }
+        # index.json is written last: readers only trust what it records
+        _write_atomic(self._path("index.json"), json.dumps(index).encode("utf-8"))
+        self._loaded_stamp = self._stamp()
+        self._open_matrices()
+
+    def _migrate_ids(self) -> None:
+        """Move the ids of a store written before ids.jsonl to the id log."""
+        if self._ids_on_disk:
+            return
+        _write_atomic(self._path("ids.jsonl"), self._encode_ids(self._ids))
+        _write_atomic(self._path("deleted.bin"), b"")
+        self._ids_size = self._path("ids.jsonl").stat().st_size
+        self._deleted_count = 0
+        self._ids_on_disk = True
+
+    @staticmethod
+    def _encode_ids(ids: Iterable[str | None]) -> bytes:
+        return b"".join(json.dumps(id_).encode("utf-8") + b"\n" for id_ in ids)
+
+    def _mark_deleted(self, rows: Sequence[int]) -> None:
+        """Append deleted rows to deleted.bin, to be recorded by `_commit`."""
+        if not rows:
+            return
+        with open(self._path("deleted.bin"), "ab") as f:
+            f.write(np.asarray(rows, dtype=np.int64).tobytes())
+        self._deleted_count += len(rows)
+        for row in rows:
+            self._id_to_row.pop(str(self._ids[row]), None)
+            self._ids[row] = None
+            self._deleted_rows[row] = True
+
+    def _append_ids(self, ids: Sequence[str]) -> None:
+        """Append the ids of new rows to ids.jsonl, to be recorded by `_commit`."""
+        data = self._encode_ids(ids)
+        with open(self._path("ids.jsonl"), "ab") as f:
+            f.write(data)
+        self._ids_size += len(data)
+        for id_ in ids:
+            self._id_to_row[id_] = len(self._ids)
+            self._ids.append(id_)
+        count = len(self._ids)
+        if count > len(self._deleted_rows):
+            # Grown geometrically so appends stay amortized O(batch)
+            grown = np.zeros(max(count, 2 * len(self._deleted_rows)), dtype=bool)
+            grown[: len(self._deleted_rows)] = self._deleted_rows
+            self._deleted_rows = grown
+
+    def _truncate_to_committed(self) -> None:
+        """Drop bytes left past the committed sizes by an interrupted write."""
+        sizes = {
+            "vectors.bin": self.count * (self.dim or 0) * self.dtype.itemsize,
+            "offsets.bin": self.count * np.dtype(np.int64).itemsize,
+            "documents.jsonl": self._docs_size,
+            "ids.jsonl": self._ids_size,
+            "deleted.bin": self._deleted_count * np.dtype(np.int64).itemsize,
+            "partitions.bin": self.count * np.dtype(np.int32).itemsize,
+            "ranges.bin": self.count * np.dtype(np.int64).itemsize,
+        }
+        for name, size in sizes.items():
+            path = self._path(name)
+            if path.exists():
+                os.truncate(path, size)
+
+    def _column_values(
+        self, metadatas: Iterable[dict[str, Any]]
+    ) -> tuple[list[int], list[int]]:
+        """Partition ids and range values of rows, registering new partitions."""
+        partition_ids, range_values = [], []
+        for metadata in metadatas:
+            name = metadata.get(self.partition_key) if self.partition_key else None
+            if name is None:
+                partition_ids.append(-1)
+            else:
+                if str(name) not in self._partition_index:
+                    self._partition_index[str(name)] = len(self._partitions)
+                    self._partitions.append(str(name))
+                partition_ids.append(self._partition_index[str(name)])
+
+            value = _as_int(metadata.get(self.range_key)) if self.range_key else None
+            range_values.append(_NO_VALUE if value is None else value)
+        return partition_ids, range_values
+
+    # Writing
+
+    def add_vectors(
+        self,
+        vectors: NDArray[np.float32],
+        texts: Sequence[str],
+        metadatas: Sequence[dict[str, Any]],
+        ids: Sequence[str],
+    ) -> list[str]:
+        """Append precomputed embeddings, replacing rows that share an id."""
+        vectors = normalize(np.asarray(vectors, dtype=np.float32))
+        if vectors.ndim != 2 or not len(vectors) == len(texts) == len(ids):
+            raise ValueError("Vectors, texts and ids must have matching lengths")
+
+        # Keep only the last occurrence of an id repeated within the batch
+        latest = {id_: i for i, id_ in enumerate(ids)}
+        keep = sorted(latest.values())
+
+        with self._lock:
+            self._maybe_reload()
+            if self.dim is None:
+                self.dim = int(vectors.shape[1])
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(
+                    f"Embedding dimension mismatch: store has {self.dim}, "
+                    f"got {vectors.shape[1]}"
+                )
+
+            self.persist_dir.mkdir(parents=True, exist_ok=True)
+            if not self._columns_on_disk:
+                _write_atomic(
+                    self._path("partitions.bin"),
+                    np.asarray(self._partition_ids, dtype=np.int32).tobytes(),
+                )
+                _write_atomic(
+                    self._path("ranges.bin"),
+                    np.asarray(self._range_values, dtype=np.int64).tobytes(),
+                )
+                self._columns_on_disk = True
+            self._migrate_ids()
+            self._truncate_to_committed()
+
+            self._mark_deleted(
+                [self._id_to_row[id_] for id_ in latest if id_ in self._id_to_row]
+            )
+
+            lines = [
+                json.dumps(
+                    {
+                        "id": ids[i],
+                        "page_content": texts[i],
+                        "metadata": metadatas[i],
+                    },
+                    ensure_ascii=False,
+                ).encode("utf-8")
+                + b"\n"
+                for i in keep
+            ]
+            offsets = self._docs_size + np.cumsum(
+                [0] + [len(line) for line in lines[:-1]], dtype=np.int64
+            )
+
+            with open(self._path("vectors.bin"), "ab") as f:
+                f.write(vectors[keep].astype(self.dtype).tobytes())
+            with open(self._path("offsets.bin"), "ab") as f:
+                f.write(offsets.astype(np.int64).tobytes())
+            with open(self._path("documents.jsonl"), "ab") as f:
+                f.writelines(lines)
+            partition_ids, range_values = self._column_values(
+                metadatas[i] for i in keep
+            )
+            with open(self._path("partitions.bin"), "ab") as f:
+                f.write(np.asarray(partition_ids, dtype=np.int32).tobytes())
+            with open(self._path("ranges.bin"), "ab") as f:
+                f.write(np.asarray(range_values, dtype=np.int64).tobytes())
+
+            if self.ann_index is not None and self.ann_index.indexed == self.count:
+                self.ann_index.add(vectors[keep])
+                self.ann_index.save(self._path("ivf.npz"))
+
+            self._append_ids([ids[i] for i in keep])
+            self.count += len(keep)
+            self._docs_size += sum(len(line) for line in lines)
+            self._commit()
+
+        return [ids[i] for i in keep]
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: list[dict[str, Any]] | None = None,
+        *,
+        ids: list[str] | None = None,
+        **kwargs: Any,
+    ) -> list[str]:
+        texts = list(texts)
+        if not texts:
+            return []
+        vectors = np.asarray(self._embedding.embed_documents(texts), dtype=np.float32)
+        return self.add_vectors(
+            vectors,
+            texts,
+            metadatas or [{} for _ in texts],
+            ids or [str(uuid.uuid4()) for _ in texts],
+        )
+
+    def delete(self, ids: list[str] | None = None, **kwargs: Any) -> bool | None:
+        with self._lock:
+            self._maybe_reload()
+            targets = self._id_to_row if ids is None else ids
+            rows = [self._id_to_row[id_] for id_ in targets if id_ in self._id_to_row]
+            if rows:
+                self.persist_dir.mkdir(parents=True, exist_ok=True)
+                self._migrate_ids()
+                self._truncate_to_committed()
+                self._mark_deleted(rows)
+                self._commit()
+        return True
+
+    def compact(self) -> None:
+        """Rewrite the store without the rows left behind by deletes and upserts.
+
+        The compacted store is built in a staging directory, which is renamed
+        into place to commit it. Its files then replace the live ones, with
+        index.json last, so an interrupted compaction leaves either the old
+        store or one that the next `_load` finishes moving into place.
+        """
+        with self._lock:
+            self._maybe_reload()
+            live = np.flatnonzero(~self._deleted)
+            if len(live) == self.count:
+                return
+            staging = self._path(_STAGING_DIR)
+            shutil.rmtree(staging, ignore_errors=True)
+            compacted = LocalVectorStore(
+                staging,
+                self._embedding,
+                self.dtype.name,
+                self.partition_key,
+                self.range_key,
+            )
+            if len(live):
+                docs = self._read_documents(live.tolist())
+                compacted.add_vectors(
+                    np.array(self._vectors[live], dtype=np.float32),
+                    [doc.page_content for doc in docs],
+                    [doc.metadata for doc in docs],
+                    [str(doc.id) for doc in docs],
+                )
+                if self.ann_index is not None:
+                    compacted.build_ann_index(self.ann_index.nlist)
+            else:
+                staging.mkdir(parents=True)
+                compacted.dim = self.dim
+                compacted._commit()
+
+            names = [name for name in _DATA_FILES if (staging / name).exists()]
+            plan = {
+                "replace": names,
+                "remove": [name for name in _DATA_FILES if name not in names],
+            }
+            _write_atomic(staging / _PLAN_FILE, json.dumps(plan).encode("utf-8"))
+            os.replace(staging, self._path(_COMPACTED_DIR))
+            self._load()
+
+    def _finish_compaction(self) -> None:
+        """Move a committed compaction into place, resuming an interrupted one."""
+        compacted = self._path(_COMPACTED_DIR)
+        try:
+            with open(compacted / _PLAN_FILE, encoding="utf-8") as f:
+                plan = json.load(f)
+        except FileNotFoundError:
+            return
+        for name in plan["remove"]:
+            self._path(name).unlink(missing_ok=True)
+        # index.json is moved last: until then readers keep the old sizes
+        for name in [*plan["replace"], "index.json"]:
+            try:
+                os.replace(compacted / name, self._path(name))
+            except FileNotFoundError:
+                # Moved before an interruption, or by another process
+                pass
+        shutil.rmtree(compacted, ignore_errors=True)
+
+    def build_ann_index(self, nlist: int | None = None, **kwargs: Any) -> IVFIndex:
+        """Build and persist an IVF index over every stored row.
+
+        Args:
+            nlist: Number of k-means lists, defaults to about 4 * sqrt(rows)
+            **kwargs: Forwarded to `IVFIndex.build`
+        """
+        with self._lock:
+            self._maybe_reload()
+            ann_index = IVFIndex.build(self._vectors, nlist, **kwargs)
+            ann_index.save(self._path("ivf.npz"))
+            self.ann_index = ann_index
+            self._commit()
+            return ann_index
+
+    # Reading
+
+    def _read_documents(self, rows: Sequence[int]) -> list[Document]:
+        docs: list[Document] = []
+        if not rows:
+            return docs
+        with open(self._path("documents.jsonl"), "rb") as f:
+            for row in rows:
+                start = int(self._offsets[row])
+                end = (
+                    int(self._offsets[row + 1])
+                    if row + 1 < self.count
+                    else self._docs_size
+                )
+                f.seek(start)
+                data = json.loads(f.read(end - start))
+                docs.append(
+                    Document(
+                        id=data["id"],
+                        page_content=data["page_content"],
+                        metadata=data["metadata"],
+                    )
+                )
+        return docs
+
+    def get_by_ids(self, ids: Sequence[str], /) -> list[Document]:
+        with self._lock:
+            self._maybe_reload()
+            rows = [self._id_to_row[id_] for id_ in ids if id_ in self._id_to_row]
+            return self._read_documents(rows)
+
+    def _score(self, query: NDArray[np.float32]) -> NDArray[np.float32]:
+        """Score the query against every row, deleted rows scoring -inf."""
+        query = query.astype(self.dtype)
+        scores = np.empty(self.count, dtype=np.float32)
+        for start in range(0, self.count, _BLOCK_ROWS):
+            block = self._vectors[start : start + _BLOCK_ROWS]
+            scores[start : start + len(block)] = block @ query
+        scores[self._deleted] = -np.inf
+        return scores
+
+    def _top_k(
+        self, scores: NDArray[np.float32], k: int
+    ) -> tuple[NDArray[np.intp], NDArray[np.float32]]:
+        k = min(k, int(np.isfinite(scores).sum()))
+        if k <= 0:
+            return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.float32)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return top, scores[top]
+
+    def _score_rows(
+        self, query: NDArray[np.float32], rows: NDArray[np.int64]
+    ) -> NDArray[np.float32]:
+        vectors = np.asarray(self._vectors[rows])
+        return np.asarray(vectors @ query.astype(self.dtype), dtype=np.float32)
+
+    def _get_partition_rows(self) -> list[NDArray[np.int64]]:
+        """Rows of each partition, in row order, computed on first use."""
+        if self._partition_rows is None:
+            partition_ids = np.asarray(self._partition_ids)
+            order = np.argsort(partition_ids, kind="stable")
+            bounds = np.searchsorted(
+                partition_ids[order], np.arange(len(self._partitions) + 1)
+            )
+            self._partition_rows = [
+                order[bounds[i] : bounds[i + 1]].astype(np.int64)
+                for i in range(len(self._partitions))
+            ]
+        return self._partition_rows
+
+    def _filter_rows(self, filter: dict[str, Any]) -> NDArray[np.int64]:
+        """Return the live rows matching a filter on the partition and range keys."""
+        rows: NDArray[np.int64] | None = None
+        # The partition narrows the rows before the range column is read
+        for key, value in sorted(
+            filter.items(), key=lambda item: item[0] != self.partition_key
+        ):
+            condition = _condition(value)
+            if key == self.partition_key:
+                if not condition.keys() <= {"$eq", "$in"}:
+                    raise ValueError(f"Unsupported filter on {key!r}: {condition}")
+                names = condition.get("$in", []) + (
+                    [condition["$eq"]] if "$eq" in condition else []
+                )
+                partition_rows = self._get_partition_rows()
+                selected = [
+                    partition_rows[self._partition_index[str(name)]]
+                    for name in names
+                    if str(name) in self._partition_index
+                ]
+                rows = (
+                    np.sort(np.concatenate(selected))
+                    if selected
+                    else np.empty(0, dtype=np.int64)
+                )
+            elif key == self.range_key:
+                candidates = rows if rows is not None else np.arange(self.count)
+                values = np.asarray(self._range_values[candidates])
+                mask = values != _NO_VALUE
+                for op, operand in condition.items():
+                    if op not in _COMPARISONS:
+                        raise ValueError(f"Unsupported filter operator: {op}")
+                    mask &= _COMPARISONS[op](values, operand)
+                rows = candidates[mask]
+            else:
+                raise ValueError(f"Unsupported filter key: {key!r}")
+
+        if rows is None:
+            rows = np.arange(self.count)
+        return rows[~self._deleted[rows]]
+
+    def search_rows(
+        self,
+        embedding: Sequence[float] | NDArray[np.float32],
+        k: int,
+        nprobe: int | None = None,
+        exact: bool = False,
+        filter: dict[str, Any] | None = None,
+    ) -> tuple[NDArray[np.intp], NDArray[np.float32]]:
+        """Return the top-k row numbers and cosine scores for a query embedding.
+
+        A `filter` restricts the search to matching rows, which are scored
+        exhaustively.
+        """
+        query = normalize(np.asarray(embedding, dtype=np.float32))
+        with self._lock:
+            self._maybe_reload()
+            if self.count == 0:
+                return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.float32)
+            if filter:
+                rows = self._filter_rows(filter)
+                top, scores = self._top_k(self._score_rows(query, rows), k)
+                return rows[top], scores
+            if exact or self.ann_index is None:
+                return self._top_k(self._score(query), k)
+
+            # Rows appended since the index was built are scored exhaustively
+            rows = np.concatenate(
+                [
+                    self.ann_index.candidates(query, nprobe or DEFAULT_NPROBE),
+                    np.arange(self.ann_index.indexed, self.count, dtype=np.int64),
+                ]
+            )
+            rows = rows[~self._deleted[rows]]
+            top, scores = self._top_k(self._score_rows(query, rows), k)
+            return rows[top], scores
+
+    def similarity_search_by_vector_with_score(
+        self, embedding: list[float], k: int = 4, **kwargs: Any
+    ) -> list[tuple[Document, float]]:
+        with self._lock:
+            rows, scores = self.search_rows(
+                embedding,
+                k,
+                nprobe=kwargs.get("nprobe"),
+                exact=kwargs.get("exact", False),
+                filter=kwargs.get("filter"),
+            )
+            docs = self._read_documents(rows.tolist())
+        return list(zip(docs, scores.tolist(), strict=True))
+
+    def similarity_search_by_vector(
+        self, embedding: list[float], k: int = 4, **kwargs: Any
+    ) -> list[Document]:
+        return [
+            doc
+            for doc, _ in self.similarity_search_by_vector_with_score(
+                embedding, k, **kwargs
+            )
+        ]
+
+    def similarity_search_with_score(
+        self, query: str, k: int = 4, **kwargs: Any
+    ) -> list[tuple[Document, float]]:
+        embedding = self._embedding.embed_query(query)
+        return self.similarity_search_by_vector_with_score(embedding, k, **kwargs)
+
+    def similarity_search(
+        self, query: str, k: int = 4, **kwargs: Any
+    ) -> list[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, **kwargs)]
+
+    def _select_relevance_score_fn(self) -> Callable[[float], float]:
+        # Cosine similarity in [-1, 1] mapped onto [0, 1]
+        return lambda score: (score + 1.0) / 2.0
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: list[str],
+        embedding: Embeddings,
+        metadatas: list[dict[str, Any]] | None = None,
+        *,
+        ids: list[str] | None = None,
+        persist_dir: str | Path = "vectorstore",
+        dtype: str = "float32",
+        partition_key: str | None = None,
+        range_key: str | None = None,
+        **kwargs: Any,
+    ) -> "LocalVectorStore":
+        store = cls(
+            persist_dir,
+            embedding,
+            dtype=dtype,
+            partition_key=partition_key,
+            range_key=range_key,
+        )
+        store.add_texts(texts, metadatas, ids=ids)
+        return store
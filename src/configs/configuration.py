@@ -10,7 +10,6 @@ from src.components import prompts
 
 @dataclass(kw_only=True)
 class Configuration:
-
     embedding_model: Annotated[
         str, {"__template_metadata__": {"kind": "embeddings"}}
     ] = field(
@@ -23,6 +22,31 @@ class Configuration:
         },
     )
 
+    embedding_cache: bool = field(
+        default=True,
+        metadata={
+            "description": (
+                "Whether document embeddings are cached on disk, keyed by embedding "
+                "model and text hash."
+            )
+        },
+    )
+
+    embedding_cache_path: str = field(
+        default=".cache/embeddings.sqlite",
+        metadata={"description": "SQLite file holding the embedding cache."},
+    )
+
+    embedding_cache_size: int = field(
+        default=1_000_000,
+        metadata={
+            "description": (
+                "The maximum number of cached embeddings before the least recently "
+                "used ones are evicted."
+            )
+        },
+    )
+
     # Splitter
 
     splitter_type: Annotated[
@@ -52,6 +76,16 @@ class Configuration:
         },
     )
 
+    split_workers: int = field(
+        default=1,
+        metadata={
+            "description": (
+                "The number of processes used to split documents into chunks. "
+                "0 uses one process per CPU core."
+            )
+        },
+    )
+
     semantic_tokenizer: Annotated[
         str, {"__template_metadata__": {"kind": "tokenizer"}}
     ] = field(
@@ -64,17 +98,175 @@ class Configuration:
         },
     )
 
+    # Ingestion
+
+    ingest_manifest_path: str = field(
+        default="ingest_manifest.json",
+        metadata={
+            "description": (
+                "File recording the content hash and chunk ids of every ingested "
+                "chapter, used to only re-embed new or changed chapters. Each "
+                "vector store, embedding model and splitter configuration gets "
+                "its own file, named after this one."
+            )
+        },
+    )
+
+    ingest_batch_size: int = field(
+        default=64,
+        metadata={"description": "The number of chunks embedded and upserted at once."},
+    )
+
+    ingest_queue_size: int = field(
+        default=4,
+        metadata={
+            "description": (
+                "The maximum number of items buffered between two ingestion stages."
+            )
+        },
+    )
+
     # Retriever
 
     retriever_provider: Annotated[
-        Literal["pinecone"],
+        Literal["pinecone", "local"],
         {"__template_metadata__": {"kind": "retriever"}},
     ] = field(
         default="pinecone",
         metadata={
             "description": (
                 "The vector store provider to use for retrieval. "
-                "Options are 'pinecone'."
+                "Options are 'pinecone' and 'local'."
+            )
+        },
+    )
+
+    local_store_dir: str = field(
+        default="vectorstore",
+        metadata={
+            "description": "Directory holding the files of the local vector store."
+        },
+    )
+
+    local_store_dtype: Literal["float32", "float16"] = field(
+        default="float32",
+        metadata={
+            "description": (
+                "Floating point type used to store embeddings in a new local "
+                "vector store. Existing stores keep the type they were created with."
+            )
+        },
+    )
+
+    local_ann_index: bool = field(
+        default=False,
+        metadata={
+            "description": (
+                "Whether ingestion builds an IVF approximate nearest-neighbour index "
+                "over the local vector store. Search then probes `nprobe` lists, "
+                "set through `search_kwargs` (`exact=True` forces brute force)."
+            )
+        },
+    )
+
+    scoped_retrieval: bool = field(
+        default=True,
+        metadata={
+            "description": (
+                "Whether retrieval is restricted to the novel and chapter range "
+                "named in the query, when it names any. Falls back to the whole "
+                "corpus when the scoped search finds nothing."
+            )
+        },
+    )
+
+    hybrid_search: bool = field(
+        default=False,
+        metadata={
+            "description": (
+                "Whether vector search results are fused with BM25 results from a "
+                "local lexical index using reciprocal rank fusion. The index is "
+                "built from the same chunks during ingestion."
+            )
+        },
+    )
+
+    lexical_index_dir: str = field(
+        default="lexical_index",
+        metadata={"description": "Directory of the local lexical (BM25) index."},
+    )
+
+    lexical_k: int = field(
+        default=20,
+        metadata={
+            "description": "Number of lexical results fused with the vector results."
+        },
+    )
+
+    rrf_k: int = field(
+        default=60,
+        metadata={
+            "description": (
+                "Rank offset of reciprocal rank fusion. Higher values flatten the "
+                "advantage of top-ranked results."
+            )
+        },
+    )
+
+    rerank: bool = field(
+        default=False,
+        metadata={
+            "description": (
+                "Whether retrieved chunks are reranked with a CPU cross-encoder. "
+                "`rerank_candidates` chunks are retrieved and only the best "
+                "`rerank_top_n` are passed to the response model."
+            )
+        },
+    )
+
+    rerank_model: str = field(
+        default="cross-encoder/mmarco-mMiniLMv2-L12-H384-v1",
+        metadata={
+            "description": (
+                "The sentence-transformers cross-encoder used for reranking. "
+                "Must support the corpus language."
+            )
+        },
+    )
+
+    rerank_candidates: int = field(
+        default=20,
+        metadata={"description": "Number of chunks retrieved for reranking."},
+    )
+
+    rerank_top_n: int = field(
+        default=4,
+        metadata={"description": "Number of reranked chunks kept for the response."},
+    )
+
+    rerank_batch_size: int = field(
+        default=8,
+        metadata={
+            "description": (
+                "Number of query-chunk pairs scored per cross-encoder batch. "
+                "Batches group chunks of similar length and run in parallel."
+            )
+        },
+    )
+
+    rerank_max_length: int = field(
+        default=512,
+        metadata={
+            "description": "Maximum token length of a query-chunk pair when reranking."
+        },
+    )
+
+    rerank_timeout: float = field(
+        default=0.5,
+        metadata={
+            "description": (
+                "Latency budget of reranking, in seconds. Past it, the retrieval "
+                "order is kept."
             )
         },
     )
@@ -89,6 +281,176 @@ class Configuration:
         },
     )
 
+    retrieval_cache: bool = field(
+        default=True,
+        metadata={
+            "description": (
+                "Whether query embeddings and retrieved documents are cached in "
+                "memory. Cached results are dropped when ingestion bumps the "
+                "corpus version."
+            )
+        },
+    )
+
+    retrieval_cache_size: int = field(
+        default=1024,
+        metadata={"description": "The maximum number of entries per query cache."},
+    )
+
+    retrieval_cache_ttl: float = field(
+        default=3600.0,
+        metadata={"description": "Seconds before a query cache entry expires."},
+    )
+
+    answer_cache: bool = field(
+        default=False,
+        metadata={
+            "description": (
+                "Whether answers to standalone retrieval questions are cached and "
+                "reused for near-duplicate questions without calling the LLM."
+            )
+        },
+    )
+
+    answer_cache_threshold: float = field(
+        default=0.95,
+        metadata={
+            "description": (
+                "The minimum cosine similarity between two questions for a cached "
+                "answer to be reused."
+            )
+        },
+    )
+
+    answer_cache_size: int = field(
+        default=512,
+        metadata={"description": "The maximum number of cached answers."},
+    )
+
+    fast_router: bool = field(
+        default=False,
+        metadata={
+            "description": (
+                "Whether queries are first classified locally against labeled "
+                "example queries, only calling the LLM router when ambiguous. "
+                "Follow-ups in a conversation always go to the LLM router, which "
+                "sees the history."
+            )
+        },
+    )
+
+    fast_router_min_similarity: float = field(
+        default=0.5,
+        metadata={
+            "description": (
+                "The minimum cosine similarity to a route's example centroid for a "
+                "query to be routed locally."
+            )
+        },
+    )
+
+    fast_router_min_margin: float = field(
+        default=0.1,
+        metadata={
+            "description": (
+                "The minimum similarity lead over the runner-up route for a query "
+                "to be routed locally."
+            )
+        },
+    )
+
+    speculative_retrieval: bool = field(
+        default=False,
+        metadata={
+            "description": (
+                "Whether retrieval for the latest message starts while the LLM "
+                "router is running. Saves the retrieval latency of retrieval "
+                "queries, but queries routed elsewhere still pay for a query "
+                "embedding and a vector search whose result is discarded."
+            )
+        },
+    )
+
+    context_token_budget: int = field(
+        default=3000,
+        metadata={
+            "description": (
+                "Maximum number of tokens of retrieved context in the response "
+                "prompt, counted with the response model's tokenizer. Chunks that "
+                "do not fit are left out, lowest ranked first."
+            )
+        },
+    )
+
+    # Conversation
+
+    summary_token_budget: int = field(
+        default=2000,
+        metadata={
+            "description": (
+                "Token budget for the messages kept verbatim in a conversation. "
+                "Older messages are folded into the summary in the background once "
+                "the conversation exceeds it."
+            )
+        },
+    )
+
+    checkpoint_path: str = field(
+        default=".cache/checkpoints.sqlite",
+        metadata={
+            "description": (
+                "SQLite file persisting the state of each conversation thread, so "
+                "the chat UI only sends the newest message and conversations "
+                "survive restarts."
+            )
+        },
+    )
+
+    # Instrumentation
+
+    instrumentation: bool = field(
+        default=False,
+        metadata={
+            "description": (
+                "Whether to record per-node and per-model-call wall time, tokens, "
+                "retrieved chunk counts and cache hits of each turn into the "
+                "in-process metrics registry, shown in the sidebar's debug panel."
+            )
+        },
+    )
+
+    trace_path: str = field(
+        default="",
+        metadata={
+            "description": (
+                "JSON Lines file each instrumented turn appends its trace spans "
+                "to. Empty to disable tracing."
+            )
+        },
+    )
+
+    metrics_port: int = field(
+        default=0,
+        metadata={
+            "description": (
+                "Port serving the metrics registry in the Prometheus text format "
+                "at /metrics. 0 to disable the endpoint."
+            )
+        },
+    )
+
+    # Interface
+
+    stream_max_fps: float = field(
+        default=20.0,
+        metadata={
+            "description": (
+                "Maximum number of times per second the chat UI redraws a streaming "
+                "answer. Tokens arriving between two frames are drawn together."
+            )
+        },
+    )
+
     # Model
 
     query_model: Annotated[str, {"__template_metadata__": {"kind": "llm"}}] = field(
@@ -151,10 +513,18 @@ class Configuration:
         },
     )
 
+    conversation_summary_prompt: str = field(
+        default=prompts.CONVERSATION_SUMMARY_PROMPT,
+        metadata={
+            "description": (
+                "The system prompt carrying the summary of earlier messages into "
+                "routing and responses."
+            )
+        },
+    )
+
     @classmethod
-    def from_runnable_config(
-        cls: type[T], config: RunnableConfig | None = None
-    ) -> T:
+    def from_runnable_config(cls: type[T], config: RunnableConfig | None = None) -> T:
         config = ensure_config(config)
         configurable = config.get("configurable") or {}
         _fields = {f.name for f in fields(cls) if f.init}
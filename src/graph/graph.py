@@ -1,34 +1,343 @@
+import asyncio
+import contextvars
+import logging
+from collections.abc import Callable
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
 from typing import Any, Literal, cast
 
+import aiosqlite
+from langchain_core.callbacks import adispatch_custom_event, dispatch_custom_event
 from langchain_core.documents import Document
-from langchain_core.messages import BaseMessage, RemoveMessage
-from langchain_core.runnables import RunnableConfig
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import (
+    AIMessage,
+    BaseMessage,
+    RemoveMessage,
+    SystemMessage,
+)
+from langchain_core.runnables import RunnableConfig, RunnableLambda
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
 from langgraph.graph import END, START, StateGraph
+from langgraph.graph.state import CompiledStateGraph
 
-from src.components.retrievers import make_retriever
+from src.components.answer_cache import CachedAnswer, get_answer_cache
+from src.components.instrumentation import CACHE_EVENT
+from src.components.manifest import manifest_path, read_corpus_version
+from src.components.rerankers import get_reranker
+from src.components.retrievers import (
+    aembed_query,
+    amake_retriever,
+    embed_query,
+    make_retriever,
+)
+from src.components.routers import get_fast_router
+from src.components.scopes import get_novel_titles, parse_scope, scope_filter
+from src.components.summaries import conversation_summarizer, select_evicted
 from src.configs import Configuration
 from src.graph.state import Router, State
-from src.utils import format_docs, load_chat_model
+from src.utils import format_docs, get_chat_model, get_token_counter
 
+logger = logging.getLogger(__name__)
 
-def retrieve(state: State, *, config: RunnableConfig) -> dict[str, list[Document]]:
+# Runs retrievals speculatively while the LLM router is deciding
+_speculation_executor = ThreadPoolExecutor(thread_name_prefix="speculative-retrieve")
+
+type _Speculation = Future[list[Document]] | asyncio.Task[list[Document]]
+
+
+def _latest_query(state: State) -> str:
+    content = state["messages"][-1].content
+    return str(content) if content is not None else ""
+
+
+def _is_standalone(state: State) -> bool:
+    """Whether the latest message is the whole conversation so far."""
+    return len(state["messages"]) == 1 and not state.get("summary")
+
+
+def _thread_id(config: RunnableConfig) -> str | None:
+    thread_id = (config.get("configurable") or {}).get("thread_id")
+    return str(thread_id) if thread_id is not None else None
+
+
+def _system_prompt(prompt: str, state: State, configuration: Configuration) -> str:
+    """Append the summary of earlier messages, if any, to a system prompt."""
+    summary = state.get("summary")
+    if not summary:
+        return prompt
+    return (
+        prompt
+        + "\n\n"
+        + configuration.conversation_summary_prompt.format(summary=summary)
+    )
+
+
+def load_summary(state: State, *, config: RunnableConfig) -> dict[str, Any]:
+    """Move the thread's latest background summary into the conversation state."""
+    thread_id = _thread_id(config)
+    stored = conversation_summarizer.take(thread_id) if thread_id else None
+    if stored is None:
+        return {}
+
+    delete_messages = [
+        RemoveMessage(id=m.id) for m in state["messages"] if m.id in stored.folded_ids
+    ]
+    if not delete_messages and stored.summary == state.get("summary"):
+        return {}
+    return {"summary": stored.summary, "messages": delete_messages}
+
+
+async def aload_summary(state: State, *, config: RunnableConfig) -> dict[str, Any]:
+    return load_summary(state, config=config)
+
+
+def _answer_cache_namespace(
+    configuration: Configuration, query: str
+) -> tuple[str, ...]:
+    # Paraphrases about different novels or chapters embed close together
+    scope = parse_scope(query, get_novel_titles(configuration))
+    return (
+        configuration.embedding_model,
+        configuration.response_model,
+        scope.novel or "",
+        f"{scope.chapter_start}-{scope.chapter_end}",
+    )
+
+
+def _lookup_answer_cache(
+    configuration: Configuration, query: str, embedding: list[float]
+) -> GenericFakeChatModel | None:
+    match = get_answer_cache(configuration).lookup(
+        embedding,
+        _answer_cache_namespace(configuration, query),
+        read_corpus_version(manifest_path(configuration)),
+    )
+    if match is None:
+        return None
+
+    # Replay the answer through a chat model run so streaming consumers see it
+    entry, _ = match
+    return GenericFakeChatModel(messages=iter([AIMessage(entry.answer)]))
+
+
+def check_answer_cache(
+    state: State, *, config: RunnableConfig
+) -> dict[str, list[BaseMessage]]:
+    configuration = Configuration.from_runnable_config(config)
+    if not configuration.answer_cache or not _is_standalone(state):
+        return {}
+
+    query = _latest_query(state)
+    embedding = embed_query(configuration, query)
+    model = _lookup_answer_cache(configuration, query, embedding)
+    dispatch_custom_event(
+        CACHE_EVENT, {"cache": "answer", "hit": model is not None}, config=config
+    )
+    if model is None:
+        return {}
+    response = model.with_config({"run_name": "respond"}).invoke(state["messages"])
+    return {"messages": [response]}
+
+
+async def acheck_answer_cache(
+    state: State, *, config: RunnableConfig
+) -> dict[str, list[BaseMessage]]:
+    configuration = Configuration.from_runnable_config(config)
+    if not configuration.answer_cache or not _is_standalone(state):
+        return {}
+
+    query = _latest_query(state)
+    embedding = await aembed_query(configuration, query)
+    model = _lookup_answer_cache(configuration, query, embedding)
+    await adispatch_custom_event(
+        CACHE_EVENT, {"cache": "answer", "hit": model is not None}, config=config
+    )
+    if model is None:
+        return {}
+    response = await model.with_config({"run_name": "respond"}).ainvoke(
+        state["messages"]
+    )
+    return {"messages": [response]}
+
+
+def route_answer_cache(
+    state: State,
+) -> Literal["analyze_and_route_query", "summarize_conversation"]:
+    if isinstance(state["messages"][-1], AIMessage):
+        return "summarize_conversation"
+    return "analyze_and_route_query"
+
+
+def _retrieve_documents(query: str, config: RunnableConfig) -> list[Document]:
+    configuration = Configuration.from_runnable_config(config)
+    search_filter = scope_filter(configuration, query)
     with make_retriever(config) as retriever:
-        content = state["messages"][-1].content
-        query = str(content) if content is not None else ""
-        retrieved_docs = retriever.invoke(query)
-    return {"documents": retrieved_docs}
+        if search_filter:
+            documents = retriever.invoke(query, filter=search_filter)
+            # A misread scope should not leave the response without context
+            if documents:
+                return documents
+        return retriever.invoke(query)
+
+
+async def _aretrieve_documents(query: str, config: RunnableConfig) -> list[Document]:
+    configuration = Configuration.from_runnable_config(config)
+    search_filter = scope_filter(configuration, query)
+    async with amake_retriever(config) as retriever:
+        if search_filter:
+            documents = await retriever.ainvoke(query, filter=search_filter)
+            if documents:
+                return documents
+        return await retriever.ainvoke(query)
+
+
+def retrieve(state: State, *, config: RunnableConfig) -> dict[str, Any]:
+    query = _latest_query(state)
+    # Documents may already have been fetched speculatively during routing
+    if state.get("retrieved_for") == query:
+        return {}
+    return {"documents": _retrieve_documents(query, config), "retrieved_for": query}
+
+
+async def aretrieve(state: State, *, config: RunnableConfig) -> dict[str, Any]:
+    query = _latest_query(state)
+    if state.get("retrieved_for") == query:
+        return {}
+    documents = await _aretrieve_documents(query, config)
+    return {"documents": documents, "retrieved_for": query}
+
+
+def rerank(state: State, *, config: RunnableConfig) -> dict[str, Any]:
+    configuration = Configuration.from_runnable_config(config)
+    if not configuration.rerank:
+        return {}
+    documents = get_reranker(configuration).rerank(
+        _latest_query(state), state["documents"], configuration.rerank_top_n
+    )
+    return {"documents": documents}
+
+
+async def arerank(state: State, *, config: RunnableConfig) -> dict[str, Any]:
+    configuration = Configuration.from_runnable_config(config)
+    if not configuration.rerank:
+        return {}
+    # Scoring is CPU-bound and waits on its latency budget
+    documents = await asyncio.to_thread(
+        get_reranker(configuration).rerank,
+        _latest_query(state),
+        state["documents"],
+        configuration.rerank_top_n,
+    )
+    return {"documents": documents}
+
+
+def _router_messages(state: State, configuration: Configuration) -> list[BaseMessage]:
+    prompt = _system_prompt(configuration.router_system_prompt, state, configuration)
+    return [SystemMessage(prompt), *state["messages"]]
+
+
+def _routed(
+    response: Router, query: str, documents: list[Document] | None
+) -> dict[str, Any]:
+    if documents is None or response["type"] != "retrieve":
+        return {"router": response, "retrieved_for": ""}
+    return {"router": response, "documents": documents, "retrieved_for": query}
+
+
+def _drop_outcome(speculation: _Speculation) -> None:
+    if not speculation.cancelled() and speculation.exception() is not None:
+        logger.debug(
+            "Discarded speculative retrieval failed", exc_info=speculation.exception()
+        )
+
+
+def _discard(speculation: _Speculation) -> None:
+    """Drop a speculative retrieval whose documents are not needed.
+
+    A search still queued is cancelled. One already running in a thread cannot
+    be interrupted, so it finishes in the background and its outcome is
+    dropped, errors included.
+    """
+    if not speculation.cancel():
+        speculation.add_done_callback(_drop_outcome)
+
+
+def analyze_and_route_query(state: State, *, config: RunnableConfig) -> dict[str, Any]:
+    configuration = Configuration.from_runnable_config(config)
+    query = _latest_query(state)
+    # A follow-up can only be classified with its history, by the LLM router
+    if configuration.fast_router and _is_standalone(state):
+        router = get_fast_router(
+            configuration, lambda text: embed_query(configuration, text)
+        )
+        fast_route = router.classify(embed_query(configuration, query))
+        if fast_route is not None:
+            return _routed(fast_route, query, None)
+
+    # Start retrieving while the LLM router runs, since most queries need it
+    speculation = None
+    if configuration.speculative_retrieval:
+        context = contextvars.copy_context()
+        speculation = _speculation_executor.submit(
+            context.run, _retrieve_documents, query, config
+        )
+
+    model = get_chat_model(configuration.response_model)
+    messages = _router_messages(state, configuration)
+    try:
+        response = cast(Router, model.with_structured_output(Router).invoke(messages))
+    except BaseException:
+        if speculation is not None:
+            _discard(speculation)
+        raise
 
+    if speculation is None:
+        return _routed(response, query, None)
+    if response["type"] != "retrieve":
+        _discard(speculation)
+        return _routed(response, query, None)
+    return _routed(response, query, speculation.result())
 
-def analyze_and_route_query(
+
+async def aanalyze_and_route_query(
     state: State, *, config: RunnableConfig
-) -> dict[str, Router]:
+) -> dict[str, Any]:
     configuration = Configuration.from_runnable_config(config)
-    model = load_chat_model(configuration.response_model)
-    messages = [
-        {"role": "system", "content": configuration.router_system_prompt}
-    ] + state["messages"]
-    response = cast(Router, model.with_structured_output(Router).invoke(messages))
-    return {"router": response}
+    query = _latest_query(state)
+    # A follow-up can only be classified with its history, by the LLM router
+    if configuration.fast_router and _is_standalone(state):
+        # Embedding the labeled examples on first use is blocking work
+        router = await asyncio.to_thread(
+            get_fast_router,
+            configuration,
+            lambda text: embed_query(configuration, text),
+        )
+        fast_route = router.classify(await aembed_query(configuration, query))
+        if fast_route is not None:
+            return _routed(fast_route, query, None)
+
+    speculation = None
+    if configuration.speculative_retrieval:
+        speculation = asyncio.create_task(_aretrieve_documents(query, config))
+
+    model = get_chat_model(configuration.response_model)
+    messages = _router_messages(state, configuration)
+    try:
+        response = cast(
+            Router, await model.with_structured_output(Router).ainvoke(messages)
+        )
+    except BaseException:
+        if speculation is not None:
+            _discard(speculation)
+        raise
+
+    if speculation is None:
+        return _routed(response, query, None)
+    if response["type"] != "retrieve":
+        _discard(speculation)
+        return _routed(response, query, None)
+    return _routed(response, query, await speculation)
 
 
 def route_query(
@@ -46,79 +355,241 @@ def route_query(
             raise ValueError(f"Unknown router type: {_type}")
 
 
+def _more_info_messages(
+    state: State, configuration: Configuration
+) -> list[BaseMessage]:
+    prompt = configuration.more_info_system_prompt.format(
+        logic=state["router"]["logic"]
+    )
+    prompt = _system_prompt(prompt, state, configuration)
+    return [SystemMessage(prompt), *state["messages"]]
+
+
 def ask_for_more_info(
     state: State, *, config: RunnableConfig
 ) -> dict[str, list[BaseMessage]]:
     """Generate answer."""
     configuration = Configuration.from_runnable_config(config)
-    model = load_chat_model(configuration.response_model).with_config(
+    model = get_chat_model(configuration.response_model).with_config(
         config={"run_name": "respond"}
     )
-    prompt = configuration.more_info_system_prompt.format(
-        logic=state["router"]["logic"]
+    response = model.invoke(_more_info_messages(state, configuration))
+    return {"messages": [response]}
+
+
+async def aask_for_more_info(
+    state: State, *, config: RunnableConfig
+) -> dict[str, list[BaseMessage]]:
+    """Generate answer."""
+    configuration = Configuration.from_runnable_config(config)
+    model = get_chat_model(configuration.response_model).with_config(
+        config={"run_name": "respond"}
     )
-    messages = [{"role": "system", "content": prompt}] + state["messages"]
-    response = model.invoke(messages)
+    response = await model.ainvoke(_more_info_messages(state, configuration))
     return {"messages": [response]}
 
 
+def _general_messages(state: State, configuration: Configuration) -> list[BaseMessage]:
+    prompt = configuration.general_system_prompt.format(logic=state["router"]["logic"])
+    prompt = _system_prompt(prompt, state, configuration)
+    return [SystemMessage(prompt), *state["messages"]]
+
+
 def respond_to_general_query(
     state: State, *, config: RunnableConfig
 ) -> dict[str, list[BaseMessage]]:
     """Generate answer."""
     configuration = Configuration.from_runnable_config(config)
-    model = load_chat_model(configuration.response_model).with_config(
+    model = get_chat_model(configuration.response_model).with_config(
         config={"run_name": "respond"}
     )
-    prompt = configuration.general_system_prompt.format(logic=state["router"]["logic"])
-    messages = [{"role": "system", "content": prompt}] + state["messages"]
-    response = model.invoke(messages)
+    response = model.invoke(_general_messages(state, configuration))
     return {"messages": [response]}
 
 
+async def arespond_to_general_query(
+    state: State, *, config: RunnableConfig
+) -> dict[str, list[BaseMessage]]:
+    """Generate answer."""
+    configuration = Configuration.from_runnable_config(config)
+    model = get_chat_model(configuration.response_model).with_config(
+        config={"run_name": "respond"}
+    )
+    response = await model.ainvoke(_general_messages(state, configuration))
+    return {"messages": [response]}
+
+
+def _context_messages(state: State, configuration: Configuration) -> list[BaseMessage]:
+    context = format_docs(
+        state["documents"],
+        configuration.context_token_budget,
+        get_token_counter(configuration.response_model),
+    )
+    prompt = configuration.response_system_prompt.format(context=context)
+    prompt = _system_prompt(prompt, state, configuration)
+    return [SystemMessage(prompt), *state["messages"]]
+
+
+def _cache_answer(
+    state: State,
+    configuration: Configuration,
+    embedding: list[float],
+    response: BaseMessage,
+) -> None:
+    get_answer_cache(configuration).add(
+        embedding,
+        CachedAnswer(
+            question=_latest_query(state),
+            answer=str(response.content),
+            corpus_version=read_corpus_version(manifest_path(configuration)),
+            namespace=_answer_cache_namespace(configuration, _latest_query(state)),
+            document_ids=[str(doc.id) for doc in state["documents"] if doc.id],
+        ),
+    )
+
+
 def respond_with_context(
     state: State, *, config: RunnableConfig
 ) -> dict[str, list[BaseMessage]]:
     """Generate answer."""
     configuration = Configuration.from_runnable_config(config)
-    model = load_chat_model(configuration.response_model).with_config(
+    model = get_chat_model(configuration.response_model).with_config(
         {"run_name": "respond"}
     )
-    context = format_docs(state["documents"])
-    prompt = configuration.response_system_prompt.format(context=context)
-    messages = [{"role": "system", "content": prompt}] + state["messages"]
-    response = model.invoke(messages)
+    response = model.invoke(_context_messages(state, configuration))
+
+    if configuration.answer_cache and _is_standalone(state):
+        embedding = embed_query(configuration, _latest_query(state))
+        _cache_answer(state, configuration, embedding, response)
+    return {"messages": [response]}
+
+
+async def arespond_with_context(
+    state: State, *, config: RunnableConfig
+) -> dict[str, list[BaseMessage]]:
+    """Generate answer."""
+    configuration = Configuration.from_runnable_config(config)
+    model = get_chat_model(configuration.response_model).with_config(
+        {"run_name": "respond"}
+    )
+    response = await model.ainvoke(_context_messages(state, configuration))
+
+    if configuration.answer_cache and _is_standalone(state):
+        embedding = await aembed_query(configuration, _latest_query(state))
+        _cache_answer(state, configuration, embedding, response)
     return {"messages": [response]}
 
 
+def _summary_messages(
+    summary: str, evicted: list[BaseMessage], configuration: Configuration
+) -> list[BaseMessage]:
+    prompt = configuration.summary_system_prompt.format(summary=summary)
+    return [*evicted, SystemMessage(prompt)]
+
+
+def _evicted_messages(state: State, configuration: Configuration) -> list[BaseMessage]:
+    count_tokens = get_token_counter(configuration.response_model)
+    return select_evicted(
+        state["messages"], configuration.summary_token_budget, count_tokens
+    )
+
+
+def _schedule_summary(
+    thread_id: str,
+    state: State,
+    evicted: list[BaseMessage],
+    configuration: Configuration,
+) -> None:
+    model = get_chat_model(configuration.response_model)
+
+    def summarize(summary: str, messages: list[BaseMessage]) -> str:
+        response = model.invoke(_summary_messages(summary, messages, configuration))
+        return str(response.content)
+
+    conversation_summarizer.schedule(
+        thread_id, state.get("summary", ""), evicted, summarize
+    )
+
+
+def _folded(summary: BaseMessage, evicted: list[BaseMessage]) -> dict[str, Any]:
+    delete_messages = [RemoveMessage(id=m.id) for m in evicted if m.id is not None]
+    return {"summary": str(summary.content), "messages": delete_messages}
+
+
 def summarize_conversation(state: State, *, config: RunnableConfig) -> dict[str, Any]:
-    if len(state["messages"]) <= 4:
+    """Fold messages beyond the token budget into the summary.
+
+    With a thread id the summary is built in the background and applied by
+    `load_summary` on the thread's next turn; otherwise it is built inline.
+    """
+    configuration = Configuration.from_runnable_config(config)
+    evicted = _evicted_messages(state, configuration)
+    if not evicted:
         return {}
 
+    thread_id = _thread_id(config)
+    if thread_id is not None:
+        _schedule_summary(thread_id, state, evicted, configuration)
+        return {}
+
+    model = get_chat_model(configuration.response_model)
+    messages = _summary_messages(state.get("summary", ""), evicted, configuration)
+    return _folded(model.invoke(messages), evicted)
+
+
+async def asummarize_conversation(
+    state: State, *, config: RunnableConfig
+) -> dict[str, Any]:
     configuration = Configuration.from_runnable_config(config)
-    model = load_chat_model(configuration.response_model)
-    summary = state.get("summary", "")
-    prompt = configuration.summary_system_prompt.format(summary=summary)
-    summary_messages = state["messages"][:-4] + [{"role": "system", "content": prompt}]
-    delete_messages = [
-        RemoveMessage(id=m.id) for m in state["messages"][:-4] if m.id is not None
-    ]
-    response = model.invoke(summary_messages)
-    return {"summary": response.content, "messages": delete_messages}
+    evicted = _evicted_messages(state, configuration)
+    if not evicted:
+        return {}
+
+    thread_id = _thread_id(config)
+    if thread_id is not None:
+        _schedule_summary(thread_id, state, evicted, configuration)
+        return {}
+
+    model = get_chat_model(configuration.response_model)
+    messages = _summary_messages(state.get("summary", ""), evicted, configuration)
+    return _folded(await model.ainvoke(messages), evicted)
+
+
+def _node(
+    func: Callable[..., Any], afunc: Callable[..., Any]
+) -> RunnableLambda[State, Any]:
+    """Register a node with native sync and async implementations."""
+    return RunnableLambda(func, afunc=afunc, name=func.__name__)
 
 
 # Define the graph
 workflow = StateGraph(State)
-workflow.add_node(analyze_and_route_query)
-workflow.add_node(retrieve)
-workflow.add_node(ask_for_more_info)
-workflow.add_node(respond_to_general_query)
-workflow.add_node(respond_with_context)
-workflow.add_node(summarize_conversation)
-
-workflow.add_edge(START, "analyze_and_route_query")
+workflow.add_node("load_summary", _node(load_summary, aload_summary))
+workflow.add_node("check_answer_cache", _node(check_answer_cache, acheck_answer_cache))
+workflow.add_node(
+    "analyze_and_route_query",
+    _node(analyze_and_route_query, aanalyze_and_route_query),
+)
+workflow.add_node("retrieve", _node(retrieve, aretrieve))
+workflow.add_node("rerank", _node(rerank, arerank))
+workflow.add_node("ask_for_more_info", _node(ask_for_more_info, aask_for_more_info))
+workflow.add_node(
+    "respond_to_general_query",
+    _node(respond_to_general_query, arespond_to_general_query),
+)
+workflow.add_node(
+    "respond_with_context", _node(respond_with_context, arespond_with_context)
+)
+workflow.add_node(
+    "summarize_conversation", _node(summarize_conversation, asummarize_conversation)
+)
+
+workflow.add_edge(START, "load_summary")
+workflow.add_edge("load_summary", "check_answer_cache")
+workflow.add_conditional_edges("check_answer_cache", route_answer_cache)
 workflow.add_conditional_edges("analyze_and_route_query", route_query)
-workflow.add_edge("retrieve", "respond_with_context")
+workflow.add_edge("retrieve", "rerank")
+workflow.add_edge("rerank", "respond_with_context")
 workflow.add_edge("ask_for_more_info", "summarize_conversation")
 workflow.add_edge("respond_to_general_query", "summarize_conversation")
 workflow.add_edge("respond_with_context", "summarize_conversation")
@@ -126,3 +597,16 @@ workflow.add_edge("summarize_conversation", END)
 
 # Compile into a graph object
 graph = workflow.compile()
+
+
+async def acompile_checkpointed(checkpoint_path: str) -> CompiledStateGraph:
+    """Compile the graph with a SQLite checkpointer persisting the state of each
+    `thread_id` to `checkpoint_path`, so a turn only needs the newest message.
+
+    The checkpointer's connection belongs to the running event loop, and the
+    graph must be run on that loop.
+    """
+    Path(checkpoint_path).parent.mkdir(parents=True, exist_ok=True)
+    checkpointer = AsyncSqliteSaver(await aiosqlite.connect(checkpoint_path))
+    await checkpointer.setup()
+    return workflow.compile(checkpointer=checkpointer)
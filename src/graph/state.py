@@ -14,4 +14,6 @@ class Router(TypedDict):
 class State(MessagesState):
     router: Router
     documents: list[Document]
+    # Query the current `documents` were retrieved for
+    retrieved_for: str
     summary: str
@@ -1,52 +1,153 @@
-import json
+import logging
 import re
-from typing import cast
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from collections.abc import Callable, Hashable, Sequence
+from typing import Any, TypeVar, cast
 
 from langchain.chat_models import init_chat_model
 from langchain.embeddings import init_embeddings
 from langchain_core.documents import Document
 from langchain_core.embeddings import Embeddings
 from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import BaseMessage
 
 from src.configs import Configuration
 
+M = TypeVar("M")
 
-def _format_doc(document: Document) -> str:
-    filtered_data = {k: document.model_dump()[k] for k in {"metadata", "page_content"}}
-    return json.dumps(filtered_data)
+logger = logging.getLogger(__name__)
 
 
-def format_docs(documents: list[Document]) -> str:
+def _approximate_token_count(text: str) -> int:
+    return len(text) // 4 + 1
+
+
+# Chunk-level metadata; every other key describes the whole novel
+CHAPTER_KEY = "Chương"
+TITLE_KEY = "Tên truyện"
+
+
+def _format_value(value: Any) -> str:
+    if isinstance(value, list | tuple):
+        return ", ".join(str(v) for v in value)
+    return str(value)
+
+
+def _novel_header(metadata: dict[str, Any]) -> str:
+    return "\n".join(
+        f"{key}: {_format_value(value)}"
+        for key, value in metadata.items()
+        if key != CHAPTER_KEY
+    )
+
+
+def _format_chunk(document: Document) -> str:
+    chapter = document.metadata.get(CHAPTER_KEY)
+    if chapter is None:
+        return document.page_content
+    return f"[{CHAPTER_KEY} {chapter}]\n{document.page_content}"
+
+
+def format_docs(
+    documents: list[Document],
+    max_tokens: int | None = None,
+    count_tokens: Callable[[str], int] | None = None,
+) -> str:
+    """Format retrieved documents as compact context for a prompt.
+
+    Novel metadata is written once per novel as a header, followed by that
+    novel's chunks tagged with their chapter. With `max_tokens`, chunks are
+    packed in retrieval order and those that would overflow the budget,
+    counting their novel's header on first use, are left out.
+    """
     if not documents:
         return ""
-    formatted = ", ".join(_format_doc(doc) for doc in documents)
-    return formatted
+    count = count_tokens or _approximate_token_count
+
+    novels: dict[str, tuple[str, list[str]]] = {}
+    used = 0
+    for document in documents:
+        header = _novel_header(document.metadata)
+        key = str(document.metadata.get(TITLE_KEY, header))
+        chunk = _format_chunk(document)
+
+        cost = count(chunk)
+        if key not in novels:
+            cost += count(header)
+        if max_tokens is not None and used + cost > max_tokens:
+            continue
+
+        used += cost
+        novels.setdefault(key, (header, []))[1].append(chunk)
+
+    sections = []
+    for header, chunks in novels.values():
+        sections.append("\n\n".join([f"<novel>\n{header}", *chunks]) + "\n</novel>")
+    return "\n\n".join(sections)
 
 
 def get_embedding_dimension(embedding_model: Embeddings) -> int:
     return len(embedding_model.embed_query("."))
 
 
+def load_token_counter(fully_specified_name: str) -> Callable[[str], int]:
+    """Load a function counting the tokens of a text for a fully specified model.
+
+    Falls back to a character-based estimate when the model's tokenizer is not
+    available.
+    """
+    provider, model = fully_specified_name.split("/", maxsplit=1)
+    try:
+        if provider == "openai":
+            import tiktoken
+
+            try:
+                encoding = tiktoken.encoding_for_model(model)
+            except KeyError:
+                encoding = tiktoken.get_encoding("o200k_base")
+            return lambda text: len(encoding.encode(text, disallowed_special=()))
+
+        if provider == "huggingface":
+            from tokenizers import Tokenizer  # type: ignore
+
+            tokenizer = Tokenizer.from_pretrained(model)
+            return lambda text: len(
+                tokenizer.encode(text, add_special_tokens=False).ids
+            )
+    except Exception:
+        logger.warning(
+            "Could not load the tokenizer of %s, estimating token counts instead",
+            fully_specified_name,
+            exc_info=True,
+        )
+    return _approximate_token_count
+
+
 def get_literal_values(configuration: Configuration, attr: str) -> str:
     type_str = str(configuration.__annotations__[attr])
     match = re.search(r"Literal\[(.*?)\]", type_str)
     return match.group(1) if match else ""
 
 
-def load_embedding(fully_specified_name: str) -> Embeddings:
+def load_embedding(fully_specified_name: str, **kwargs: Any) -> Embeddings:
     """Load an embedding model from a fully specified name."""
     provider, model = fully_specified_name.split("/", maxsplit=1)
-    embedding = cast(Embeddings, init_embeddings(model, provider=provider))
+    embedding = cast(Embeddings, init_embeddings(model, provider=provider, **kwargs))
     return embedding
 
 
-def load_chat_model(fully_specified_name: str) -> BaseChatModel:
+def load_chat_model(fully_specified_name: str, **kwargs: Any) -> BaseChatModel:
     """Load a chat model from a fully specified name."""
     provider, model = fully_specified_name.split("/", maxsplit=1)
     if provider == "huggingface":
         return _load_huggingface_chat_model(model)
     else:
-        return init_chat_model(model, model_provider=provider)
+        return cast(
+            BaseChatModel, init_chat_model(model, model_provider=provider, **kwargs)
+        )
 
 
 def _load_huggingface_chat_model(model: str) -> BaseChatModel:
@@ -66,3 +167,206 @@ def _load_huggingface_chat_model(model: str) -> BaseChatModel:
         },
     )
     return ChatHuggingFace(llm=llm)
+
+
+class ModelRegistry:
+    """Thread-safe, size-bounded LRU registry of constructed models.
+
+    Models are keyed by a hashable key (usually the fully specified model name
+    plus any config that changes how the model is built), so each distinct model
+    is constructed once per process and shared across graph invocations. Each
+    kind of model has its own registry, so loading one kind never evicts
+    another. `close` is called on models dropped from the registry.
+    """
+
+    def __init__(
+        self, max_size: int = 8, close: Callable[[Any], None] | None = None
+    ) -> None:
+        assert max_size > 0, "Registry size must be positive"
+        self.max_size = max_size
+        self._close = close
+        self._models: OrderedDict[Hashable, Any] = OrderedDict()
+        self._lock = threading.RLock()
+        self._key_locks: dict[Hashable, threading.Lock] = {}
+
+    def get_or_create(self, key: Hashable, factory: Callable[[], M]) -> M:
+        """Return the model stored under `key`, building it with `factory` if absent."""
+        with self._lock:
+            if key in self._models:
+                self._models.move_to_end(key)
+                return cast(M, self._models[key])
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        # Build outside the registry lock so slow loads don't block other models,
+        # but only once per key even when several threads ask concurrently.
+        evicted: list[Any] = []
+        with key_lock:
+            try:
+                with self._lock:
+                    if key in self._models:
+                        self._models.move_to_end(key)
+                        return cast(M, self._models[key])
+
+                model = factory()
+
+                with self._lock:
+                    self._models[key] = model
+                    self._models.move_to_end(key)
+                    while len(self._models) > self.max_size:
+                        evicted.append(self._models.popitem(last=False)[1])
+            finally:
+                with self._lock:
+                    if self._key_locks.get(key) is key_lock:
+                        del self._key_locks[key]
+        self._close_all(evicted)
+        return model
+
+    def _close_all(self, models: list[Any]) -> None:
+        if self._close is not None:
+            for model in models:
+                self._close(model)
+
+    def unload(self, key: Hashable) -> bool:
+        """Drop a model from the registry. Returns whether it was loaded."""
+        with self._lock:
+            if key not in self._models:
+                return False
+            model = self._models.pop(key)
+        self._close_all([model])
+        return True
+
+    def clear(self) -> None:
+        """Drop every model from the registry."""
+        with self._lock:
+            models = list(self._models.values())
+            self._models.clear()
+        self._close_all(models)
+
+    def keys(self) -> list[Hashable]:
+        """Return the loaded keys, least recently used first."""
+        with self._lock:
+            return list(self._models)
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._models
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._models)
+
+
+chat_models = ModelRegistry(max_size=4)
+embedding_models = ModelRegistry(max_size=4)
+token_counters = ModelRegistry(max_size=16)
+
+
+def model_key(fully_specified_name: str, kwargs: dict[str, Any]) -> Hashable:
+    """Key a model by its name and the keyword arguments it is built with."""
+    return (fully_specified_name, repr(sorted(kwargs.items())))
+
+
+def get_embedding(fully_specified_name: str, **kwargs: Any) -> Embeddings:
+    """Return a shared embedding model, loading it on first use."""
+    return embedding_models.get_or_create(
+        model_key(fully_specified_name, kwargs),
+        lambda: load_embedding(fully_specified_name, **kwargs),
+    )
+
+
+def get_chat_model(fully_specified_name: str, **kwargs: Any) -> BaseChatModel:
+    """Return a shared chat model, loading it on first use."""
+    return chat_models.get_or_create(
+        model_key(fully_specified_name, kwargs),
+        lambda: load_chat_model(fully_specified_name, **kwargs),
+    )
+
+
+def get_token_counter(fully_specified_name: str) -> Callable[[str], int]:
+    """Return a shared token counter for a model, loading its tokenizer on first use."""
+    return token_counters.get_or_create(
+        fully_specified_name,
+        lambda: load_token_counter(fully_specified_name),
+    )
+
+
+def count_message_tokens(
+    messages: Sequence[BaseMessage], count_tokens: Callable[[str], int]
+) -> int:
+    """Count the tokens of chat messages, with a small per-message overhead."""
+    return sum(count_tokens(str(message.content)) + 4 for message in messages)
+
+
+def warm_up_models(configuration: Configuration) -> None:
+    """Load the models used by the graph ahead of the first request."""
+    get_embedding(configuration.embedding_model)
+    get_chat_model(configuration.response_model)
+
+
+def unload_model(fully_specified_name: str, **kwargs: Any) -> bool:
+    """Unload both the chat and embedding variants of a model, if loaded."""
+    key = model_key(fully_specified_name, kwargs)
+    unloaded_chat = chat_models.unload(key)
+    unloaded_embedding = embedding_models.unload(key)
+    return unloaded_chat or unloaded_embedding
+
+
+def normalize_query(query: str) -> str:
+    """Normalize a query for cache lookups: NFC, lowercase, collapsed whitespace."""
+    return " ".join(unicodedata.normalize("NFC", query).lower().split())
+
+
+class TTLCache[V]:
+    """Thread-safe, size-bounded LRU cache whose entries expire after `ttl` seconds.
+
+    Each entry records the cost (in seconds) of computing its value, so hits
+    also account for the latency they saved.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: float = 3600.0) -> None:
+        assert max_size > 0, "Cache size must be positive"
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+        self._entries: OrderedDict[Hashable, tuple[float, float, V]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> V | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                self._entries.pop(key, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            self.saved_seconds += entry[1]
+            return entry[2]
+
+    def put(self, key: Hashable, value: V, cost: float = 0.0) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, cost, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "saved_seconds": self.saved_seconds,
+            }
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
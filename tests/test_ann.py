@@ -0,0 +1,80 @@
+from pathlib import Path
+
+import numpy as np
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from numpy.typing import NDArray
+
+from src.components.ann import IVFIndex, normalize, recall_report
+from src.components.vectorstores import LocalVectorStore
+
+
+def _clustered(n_rows: int, seed: int = 0) -> NDArray[np.float32]:
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(32, 16))
+    vectors = centers[rng.integers(32, size=n_rows)] + rng.normal(0, 0.3, (n_rows, 16))
+    return normalize(vectors.astype(np.float32))
+
+
+def test_recall_against_exact_search(tmp_path: Path) -> None:
+    vectors = _clustered(3000)
+    store = LocalVectorStore(tmp_path / "store", DeterministicFakeEmbedding(size=16))
+    ids = [str(i) for i in range(len(vectors))]
+    store.add_vectors(vectors[:2000], ids[:2000], [{}] * 2000, ids[:2000])
+    ann_index = store.build_ann_index(nlist=32)
+    # Rows added after the build go through `IVFIndex.add`
+    for start in range(2000, 3000, 250):
+        end = start + 250
+        store.add_vectors(
+            vectors[start:end], ids[start:end], [{}] * 250, ids[start:end]
+        )
+    assert ann_index.indexed == 3000
+
+    rng = np.random.default_rng(1)
+    queries = normalize(
+        vectors[rng.choice(3000, 100, replace=False)]
+        + rng.normal(0, 0.05, (100, 16)).astype(np.float32)
+    )
+    report = {
+        int(row["nprobe"]): row["recall"]
+        for row in recall_report(store, queries, k=10, nprobes=(1, 4, 32))
+    }
+    assert report[32] == 1.0
+    assert report[4] >= 0.9
+    assert report[1] <= report[4]
+
+
+def test_save_appends_added_labels(tmp_path: Path) -> None:
+    vectors = _clustered(300)
+    path = tmp_path / "ivf.npz"
+    ann_index = IVFIndex.build(vectors[:200], nlist=8)
+    ann_index.save(path)
+    npz = path.read_bytes()
+    ann_index.add(vectors[200:250])
+    ann_index.save(path)
+    ann_index.add(vectors[250:])
+    ann_index.save(path)
+
+    assert path.read_bytes() == npz
+    assert (tmp_path / "ivf.labels").stat().st_size == 100 * 4
+    loaded = IVFIndex.load(path)
+    assert np.array_equal(loaded.labels, ann_index.labels)
+    assert np.array_equal(
+        loaded.candidates(vectors[0], 2), ann_index.candidates(vectors[0], 2)
+    )
+    # Labels past the rows a store committed are from an interrupted write
+    assert IVFIndex.load(path, max_rows=220).indexed == 220
+
+
+@pytest.mark.parametrize("nprobe", [1, 3, 8])
+def test_candidates_cover_added_rows(nprobe: int) -> None:
+    vectors = _clustered(300)
+    built = IVFIndex.build(vectors, nlist=8)
+    ann_index = IVFIndex(built.centroids, built.labels[:100])
+    ann_index.add(vectors[100:180])
+    ann_index.add(vectors[180:])
+
+    for query in vectors[:20]:
+        assert np.array_equal(
+            ann_index.candidates(query, nprobe), built.candidates(query, nprobe)
+        )
@@ -0,0 +1,49 @@
+from src.components.answer_cache import (
+    CachedAnswer,
+    SemanticAnswerCache,
+    get_answer_cache,
+)
+from src.configs import Configuration
+
+NAMESPACE = ("fake/embedding", "fake/chat", "", "-")
+
+
+def _answer(text: str, corpus_version: int = 1) -> CachedAnswer:
+    return CachedAnswer(
+        question=text, answer=text, corpus_version=corpus_version, namespace=NAMESPACE
+    )
+
+
+def test_lookup_matches_similar_questions_only() -> None:
+    cache = SemanticAnswerCache(threshold=0.95)
+    cache.add([1.0, 0.0], _answer("first"))
+
+    match = cache.lookup([0.99, 0.05], NAMESPACE, 1)
+    assert match is not None and match[0].answer == "first"
+    assert cache.lookup([0.0, 1.0], NAMESPACE, 1) is None
+    assert cache.lookup([1.0, 0.0], NAMESPACE, 2) is None
+    assert cache.lookup([1.0, 0.0], ("other",), 1) is None
+
+
+def test_least_recently_used_answer_is_replaced() -> None:
+    cache = SemanticAnswerCache(max_size=2)
+    cache.add([1.0, 0.0], _answer("x"))
+    cache.add([0.0, 1.0], _answer("y"))
+    assert cache.lookup([1.0, 0.0], NAMESPACE, 1) is not None
+    cache.add([-1.0, 0.0], _answer("z"))
+
+    assert cache.lookup([0.0, 1.0], NAMESPACE, 1) is None
+    assert cache.lookup([1.0, 0.0], NAMESPACE, 1) is not None
+
+
+def test_each_embedding_model_has_its_own_cache() -> None:
+    small = Configuration(embedding_model="fake/small")
+    large = Configuration(embedding_model="fake/large")
+    assert get_answer_cache(small) is get_answer_cache(Configuration(**vars(small)))
+    assert get_answer_cache(small) is not get_answer_cache(large)
+
+    # Models of different dimensions no longer share the embedding matrix
+    get_answer_cache(small).add([1.0, 0.0], _answer("small"))
+    get_answer_cache(large).add([1.0, 0.0, 0.0], _answer("large"))
+    match = get_answer_cache(large).lookup([1.0, 0.0, 0.0], NAMESPACE, 1)
+    assert match is not None and match[0].answer == "large"
@@ -0,0 +1,48 @@
+import sys
+from collections.abc import Iterator
+
+import pytest
+
+from benchmarks.fakes import FAKE_CHAT_MODEL, FAKE_EMBEDDING_MODEL
+from benchmarks.run import compare, parse_args, run_benchmark
+from src.utils import chat_models, embedding_models, model_key
+
+TINY_RUN = [
+    "--novels=1",
+    "--chapters=2",
+    "--chapter-words=90",
+    "--queries=2",
+    "--warmup=1",
+    "--chat-latency=0",
+    "--tokens-per-second=100000",
+    "--response-tokens=4",
+    "--dimension=8",
+    "--embedding-latency=0",
+    "--texts-per-second=100000",
+]
+
+
+@pytest.fixture(autouse=True)
+def unload_fakes() -> Iterator[None]:
+    yield
+    chat_models.unload(model_key(FAKE_CHAT_MODEL, {}))
+    embedding_models.unload(model_key(FAKE_EMBEDDING_MODEL, {}))
+
+
+def test_run_benchmark_on_a_tiny_corpus(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(sys, "argv", ["run", *TINY_RUN])
+
+    report = run_benchmark(parse_args())
+
+    assert report["ingest"]["chapters"] == 2
+    assert report["ingest"]["chunks"] > 0
+    query = report["query"]
+    assert query["total_ms"]["count"] == 2
+    assert query["ttft_ms"]["count"] == 2
+    assert query["output_tokens"]["p50"] == 4
+    assert "retrieve" in query["nodes_ms"]
+    assert report["configurable"]["local_store_dir"] == "<tmp>"
+
+    lines = compare(report, report)
+    assert "query.total_ms.p50" in "\n".join(lines)
+    assert all(line.endswith("(+0.0%)") for line in lines)
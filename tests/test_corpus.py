@@ -0,0 +1,60 @@
+from pathlib import Path
+
+import pytest
+
+from data.novel_scraper import ChapterPack
+from src.components.corpus import (
+    PackedChapters,
+    append_to_pack,
+    pack_novel_dir,
+    packed_chapters,
+)
+
+CHAPTERS = {1: "Chương một", 2: "", 10: "Chương mười\n有字"}
+
+
+def test_round_trip(tmp_path: Path) -> None:
+    assert append_to_pack(tmp_path, CHAPTERS.items()) == 3
+    with PackedChapters(tmp_path) as packed:
+        assert dict(packed) == CHAPTERS
+        assert packed.chapters() == [1, 2, 10]
+        assert packed.get(10) == CHAPTERS[10]
+        assert 3 not in packed
+        with pytest.raises(KeyError):
+            packed.get(3)
+    assert packed_chapters(tmp_path) == {1, 2, 10}
+
+
+def test_append_supersedes_packed_copies(tmp_path: Path) -> None:
+    append_to_pack(tmp_path, CHAPTERS.items())
+    assert append_to_pack(tmp_path, [(2, "Chương hai"), (3, "Chương ba")]) == 4
+    with PackedChapters(tmp_path) as packed:
+        assert packed.get(1) == CHAPTERS[1]
+        assert packed.get(2) == "Chương hai"
+        assert packed.chapters() == [1, 2, 3, 10]
+
+
+def test_reads_scraper_packs(tmp_path: Path) -> None:
+    pack = ChapterPack(tmp_path, save_every=2)
+    for chapter in [10, 1, 2]:
+        pack.write(chapter, CHAPTERS[chapter])
+    # Only the first two chapters are indexed until the index is saved
+    assert packed_chapters(tmp_path) == {1, 10}
+    pack.save_index()
+
+    with PackedChapters(tmp_path) as packed:
+        assert dict(packed) == CHAPTERS
+    append_to_pack(tmp_path, [(1, "Chương một, sửa")])
+    assert ChapterPack(tmp_path).read(1) == "Chương một, sửa"
+
+
+def test_pack_novel_dir(tmp_path: Path) -> None:
+    chapter_dir = tmp_path / "chapters"
+    chapter_dir.mkdir()
+    for chapter, text in CHAPTERS.items():
+        (chapter_dir / f"{chapter}.txt").write_text(text, encoding="utf-8")
+
+    assert pack_novel_dir(tmp_path, remove=True) == 3
+    assert not list(chapter_dir.iterdir())
+    with PackedChapters(tmp_path) as packed:
+        assert dict(packed) == CHAPTERS
@@ -0,0 +1,51 @@
+from typing import Any
+
+import pytest
+from langchain_core.documents import Document
+
+from src.components import document_loaders
+from src.components.document_loaders import DocumentManager, make_splitter
+from src.configs import Configuration
+
+
+def _manager(split_workers: int) -> DocumentManager:
+    return DocumentManager(
+        {
+            "configurable": {
+                "splitter_type": "delimiter",
+                "chunk_size": 20,
+                "chunk_overlap": 0,
+                "split_workers": split_workers,
+            }
+        }
+    )
+
+
+def test_splitter_is_built_on_first_serial_split(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    built: list[str] = []
+
+    def counting_make_splitter(configuration: Configuration) -> Any:
+        built.append(configuration.splitter_type)
+        return make_splitter(configuration)
+
+    monkeypatch.setattr(document_loaders, "make_splitter", counting_make_splitter)
+    manager = _manager(split_workers=4)
+    assert built == []
+
+    manager = _manager(split_workers=1)
+    doc = Document("first part\n\nsecond part", metadata={"Chương": 1})
+    assert [chunk.page_content for chunk in manager.split_document(doc)] == [
+        "first part",
+        "second part",
+    ]
+    manager.split_document(doc)
+    assert built == ["delimiter"]
+
+
+def test_unknown_splitter_type_is_reported() -> None:
+    configuration = Configuration()
+    configuration.splitter_type = "unknown"  # type: ignore[assignment]
+    with pytest.raises(ValueError, match="splitter_type.*semantic.*delimiter"):
+        make_splitter(configuration)
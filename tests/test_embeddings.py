@@ -0,0 +1,76 @@
+import time
+from pathlib import Path
+
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding, Embeddings
+
+from src.components import embeddings
+from src.components.embeddings import CachedEmbeddings, EmbeddingCache, text_hash
+
+
+class CountingEmbedding(DeterministicFakeEmbedding):
+    embedded: list[str] = []
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        self.embedded.extend(texts)
+        return super().embed_documents(texts)
+
+
+@pytest.fixture
+def model(monkeypatch: pytest.MonkeyPatch) -> CountingEmbedding:
+    model = CountingEmbedding(size=4, embedded=[])
+
+    def get_embedding(name: str) -> Embeddings:
+        return model
+
+    monkeypatch.setattr(embeddings, "get_embedding", get_embedding)
+    return model
+
+
+def test_only_missing_texts_reach_the_model(
+    tmp_path: Path, model: CountingEmbedding
+) -> None:
+    cache = EmbeddingCache(tmp_path / "cache.sqlite")
+    cached = CachedEmbeddings("fake/model", cache)
+
+    first = cached.embed_documents(["a", "b", "a"])
+    second = cached.embed_documents(["b", "c"])
+
+    assert model.embedded == ["a", "b", "c"]
+    assert first[0] == first[2] == pytest.approx(model.embed_query("a"))
+    assert second[0] == pytest.approx(first[1])
+    assert cache.stats()["hits"] == 1
+    # Repeated texts are looked up once
+    assert cache.stats()["misses"] == 3
+
+
+def test_entries_persist_and_are_keyed_by_model(
+    tmp_path: Path, model: CountingEmbedding
+) -> None:
+    path = tmp_path / "cache.sqlite"
+    cache = EmbeddingCache(path)
+    CachedEmbeddings("fake/model", cache).embed_documents(["a"])
+    cache.close()
+
+    reopened = EmbeddingCache(path)
+    CachedEmbeddings("fake/model", reopened).embed_documents(["a"])
+    CachedEmbeddings("fake/other", reopened).embed_documents(["a"])
+    assert model.embedded == ["a", "a"]
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path: Path) -> None:
+    cache = EmbeddingCache(tmp_path / "cache.sqlite", max_entries=10)
+    keys = [text_hash(str(i)) for i in range(10)]
+    for key in keys:
+        cache.put_many("m", {key: [0.0]})
+        time.sleep(0.001)
+    # Touch the oldest entry so it survives the eviction
+    assert cache.get_many("m", keys[:1])
+    cache.put_many("m", {text_hash("new"): [1.0]})
+
+    remaining = cache.get_many("m", [*keys, text_hash("new")])
+    # Evicted down to 90% of the size
+    assert len(remaining) == 9
+    assert keys[0] in remaining
+    assert text_hash("new") in remaining
+    assert keys[1] not in remaining
@@ -0,0 +1,194 @@
+import asyncio
+import threading
+import time
+from collections.abc import AsyncIterator, Iterator
+from pathlib import Path
+from typing import Any
+
+import pytest
+from langchain_core.documents import Document
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+from langchain_core.outputs import ChatGenerationChunk
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.memory import InMemorySaver
+
+from benchmarks.fakes import (
+    FAKE_CHAT_MODEL,
+    FAKE_EMBEDDING_MODEL,
+    FakeChatModel,
+    FakeEmbeddings,
+    register_fakes,
+)
+from src.components.summaries import conversation_summarizer
+from src.configs import Configuration
+from src.graph import graph
+from src.graph.state import State
+from src.utils import chat_models, embedding_models, model_key
+
+DOCUMENTS = [Document(page_content="speculated", id="1")]
+
+
+@pytest.fixture
+def chat_model() -> Iterator[FakeChatModel]:
+    chat_model = FakeChatModel(latency=0.05, router_tokens=0)
+    register_fakes(chat_model, FakeEmbeddings(dimension=8))
+    yield chat_model
+    chat_models.unload(model_key(FAKE_CHAT_MODEL, {}))
+    embedding_models.unload(model_key(FAKE_EMBEDDING_MODEL, {}))
+
+
+def _config(**configurable: Any) -> RunnableConfig:
+    return {
+        "configurable": {
+            "response_model": FAKE_CHAT_MODEL,
+            "embedding_model": FAKE_EMBEDDING_MODEL,
+            "fast_router": False,
+            "speculative_retrieval": True,
+            **configurable,
+        }
+    }
+
+
+def _state(query: str = "who is the hero?") -> State:
+    return {"messages": [HumanMessage(query)]}  # type: ignore[typeddict-item]
+
+
+class SlowRetrieval:
+    """Stands in for retrieval, finishing after the router answers."""
+
+    def __init__(self, error: Exception | None = None) -> None:
+        self.error = error
+        self.finished = threading.Event()
+
+    def __call__(self, query: str, config: RunnableConfig) -> list[Document]:
+        time.sleep(0.1)
+        self.finished.set()
+        if self.error is not None:
+            raise self.error
+        return DOCUMENTS
+
+    async def acall(self, query: str, config: RunnableConfig) -> list[Document]:
+        await asyncio.sleep(0.1)
+        self.finished.set()
+        if self.error is not None:
+            raise self.error
+        return DOCUMENTS
+
+
+def test_speculative_documents_are_used_for_retrieval_routes(
+    chat_model: FakeChatModel, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(graph, "_retrieve_documents", SlowRetrieval())
+    update = graph.analyze_and_route_query(_state(), config=_config())
+    assert update["router"]["type"] == "retrieve"
+    assert update["documents"] == DOCUMENTS
+    assert update["retrieved_for"] == "who is the hero?"
+
+
+@pytest.mark.parametrize("error", [None, RuntimeError("search failed")])
+def test_speculation_is_discarded_for_other_routes(
+    chat_model: FakeChatModel,
+    monkeypatch: pytest.MonkeyPatch,
+    error: Exception | None,
+) -> None:
+    chat_model.route = "general"
+    retrieval = SlowRetrieval(error)
+    monkeypatch.setattr(graph, "_retrieve_documents", retrieval)
+
+    update = graph.analyze_and_route_query(_state(), config=_config())
+    assert update == {"router": update["router"], "retrieved_for": ""}
+    assert update["router"]["type"] == "general"
+    # The search left running finishes in the background, errors dropped
+    assert retrieval.finished.wait(1.0)
+
+
+@pytest.mark.parametrize("error", [None, RuntimeError("search failed")])
+def test_async_speculation_is_discarded_for_other_routes(
+    chat_model: FakeChatModel,
+    monkeypatch: pytest.MonkeyPatch,
+    error: Exception | None,
+) -> None:
+    chat_model.route = "more-info"
+    retrieval = SlowRetrieval(error)
+    monkeypatch.setattr(graph, "_aretrieve_documents", retrieval.acall)
+
+    async def route() -> dict[str, Any]:
+        update = await graph.aanalyze_and_route_query(_state(), config=_config())
+        await asyncio.sleep(0.15)
+        return update
+
+    update = asyncio.run(route())
+    assert update == {"router": update["router"], "retrieved_for": ""}
+    # Unlike a search running in a thread, the task is cancelled
+    assert not retrieval.finished.is_set()
+
+
+class RecordingChatModel(FakeChatModel):
+    """Records whether each call went through the sync or the async API."""
+
+    calls: list[str] = []
+
+    def _stream(self, *args: Any, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        self.calls.append("sync")
+        return super()._stream(*args, **kwargs)
+
+    def _astream(self, *args: Any, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        self.calls.append("async")
+        return super()._astream(*args, **kwargs)
+
+
+@pytest.fixture
+def recording_model(tmp_path: Path) -> Iterator[RecordingChatModel]:
+    chat_model = RecordingChatModel(latency=0.0, tokens_per_second=1e6, calls=[])
+    register_fakes(chat_model, FakeEmbeddings(dimension=8))
+    yield chat_model
+    chat_models.unload(model_key(FAKE_CHAT_MODEL, {}))
+    embedding_models.unload(model_key(FAKE_EMBEDDING_MODEL, {}))
+
+
+@pytest.mark.parametrize("route", ["general", "more-info", "retrieve"])
+def test_async_nodes_match_sync_nodes(
+    recording_model: RecordingChatModel, tmp_path: Path, route: str
+) -> None:
+    recording_model.route = route  # type: ignore[assignment]
+    config = _config(
+        speculative_retrieval=False,
+        retriever_provider="local",
+        local_store_dir=str(tmp_path / "store"),
+        embedding_cache=False,
+        ingest_manifest_path=str(tmp_path / "manifest.json"),
+        answer_cache=False,
+    )
+
+    sync_state = graph.graph.invoke(_state(), config)
+    assert recording_model.calls == ["sync"]
+    recording_model.calls.clear()
+    async_state = asyncio.run(graph.graph.ainvoke(_state(), config))
+
+    # No node fell back to running its sync implementation in a thread
+    assert recording_model.calls == ["async"]
+    assert async_state["router"] == sync_state["router"]
+    assert isinstance(async_state["messages"][-1], AIMessage)
+    assert async_state["messages"][-1].content == sync_state["messages"][-1].content
+
+
+def test_background_summary_moves_into_the_checkpointed_state(
+    recording_model: RecordingChatModel,
+) -> None:
+    recording_model.route = "general"
+    checkpointed = graph.workflow.compile(checkpointer=InMemorySaver())
+    config = _config(speculative_retrieval=False, summary_token_budget=1)
+    config["configurable"]["thread_id"] = "thread"
+
+    checkpointed.invoke(_state("first question"), config)
+    checkpointed.invoke(_state("second question"), config)
+    conversation_summarizer.wait("thread")
+    assert conversation_summarizer.get("thread") is not None
+
+    state = checkpointed.invoke(_state("third question"), config)
+    assert state["summary"]
+    assert "first question" not in [m.content for m in state["messages"]]
+    # Held by the checkpointed state now, no longer by the summarizer
+    assert conversation_summarizer.get("thread") is None
+    messages = graph._summary_messages("", state["messages"], Configuration())
+    assert all(isinstance(m, BaseMessage) for m in messages)
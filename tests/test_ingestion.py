@@ -0,0 +1,136 @@
+import json
+from collections.abc import Iterator
+from pathlib import Path
+
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.runnables import RunnableConfig
+
+from src.components import ingestion
+from src.components.document_loaders import DocumentManager
+from src.components.ingestion import IngestPipeline, prefetch
+from src.components.manifest import IngestManifest, chapter_key, read_corpus_version
+from src.components.vectorstores import LocalVectorStore
+
+CONFIG: RunnableConfig = {
+    "configurable": {
+        "splitter_type": "delimiter",
+        "chunk_size": 24,
+        "chunk_overlap": 0,
+        "split_workers": 1,
+    }
+}
+
+
+class FailingEmbedding(DeterministicFakeEmbedding):
+    """Fails once `fail_after` batches have been embedded."""
+
+    fail_after: int | None = None
+    calls: int = 0
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        if self.fail_after is not None and self.calls >= self.fail_after:
+            raise RuntimeError("embedding failed")
+        self.calls += 1
+        return super().embed_documents(texts)
+
+
+def _write_novel(data_dir: Path, slug: str, chapters: dict[int, str]) -> None:
+    novel_dir = data_dir / slug
+    (novel_dir / "chapters").mkdir(parents=True, exist_ok=True)
+    (novel_dir / "metadata.json").write_text(json.dumps({"Tên truyện": slug}))
+    for chapter, text in chapters.items():
+        (novel_dir / "chapters" / f"{chapter}.txt").write_text(text)
+
+
+def _chapter(slug: str, chapter: int, parts: int = 3) -> str:
+    return "\n\n".join(f"{slug} {chapter} part {i} text" for i in range(parts))
+
+
+@pytest.fixture
+def data_dir(tmp_path: Path) -> Path:
+    data_dir = tmp_path / "data"
+    for slug in ("a", "b"):
+        _write_novel(data_dir, slug, {i: _chapter(slug, i) for i in (1, 2, 3)})
+    return data_dir
+
+
+def _pipeline(
+    tmp_path: Path, embedding: DeterministicFakeEmbedding | None = None
+) -> IngestPipeline:
+    embedding = embedding or DeterministicFakeEmbedding(size=8)
+    return IngestPipeline(
+        DocumentManager(CONFIG),
+        embedding,
+        LocalVectorStore(tmp_path / "store", embedding),
+        IngestManifest(tmp_path / "manifest.json"),
+        batch_size=2,
+        queue_size=1,
+    )
+
+
+def test_prefetch_keeps_order_and_reraises() -> None:
+    def items() -> Iterator[int]:
+        yield from range(5)
+        raise ValueError("producer failed")
+
+    seen = []
+    with pytest.raises(ValueError, match="producer failed"):
+        for item in prefetch(items(), maxsize=1):
+            seen.append(item)
+    assert seen == [0, 1, 2, 3, 4]
+
+
+def test_chunks_are_upserted_in_chapter_order(tmp_path: Path, data_dir: Path) -> None:
+    pipeline = _pipeline(tmp_path)
+    stats = pipeline.run(str(data_dir))
+
+    manifest = IngestManifest(tmp_path / "manifest.json")
+    keys = [chapter_key(slug, i) for slug in ("a", "b") for i in (1, 2, 3)]
+    ids = [id_ for key in keys for id_ in manifest.chunk_ids(key)]
+    assert stats.chapters == 6
+    assert stats.chunks == len(ids) > 6
+    store = LocalVectorStore(tmp_path / "store", pipeline.embedding_model)
+    docs = store.get_by_ids(ids)
+    assert [doc.id for doc in docs] == ids
+    assert docs[0].page_content.startswith("a 1 part 0")
+    assert read_corpus_version(tmp_path / "manifest.json") == 1
+
+
+def test_rerun_only_ingests_changes(tmp_path: Path, data_dir: Path) -> None:
+    _pipeline(tmp_path).run(str(data_dir))
+    old_ids = IngestManifest(tmp_path / "manifest.json").chunk_ids(chapter_key("a", 2))
+
+    _write_novel(data_dir, "a", {2: _chapter("a", 2, parts=1)})
+    (data_dir / "b" / "chapters" / "3.txt").unlink()
+    stats = _pipeline(tmp_path).run(str(data_dir))
+
+    manifest = IngestManifest(tmp_path / "manifest.json")
+    new_ids = manifest.chunk_ids(chapter_key("a", 2))
+    assert stats.chapters == 1
+    assert stats.chunks == len(new_ids)
+    assert chapter_key("b", 3) not in manifest.chapters
+    store = LocalVectorStore(tmp_path / "store", DeterministicFakeEmbedding(size=8))
+    assert store.get_by_ids(old_ids) == []
+    assert len(store.get_by_ids(new_ids)) == len(new_ids)
+    assert _pipeline(tmp_path).run(str(data_dir)).chapters == 0
+
+
+def test_failed_run_keeps_completed_chapters(
+    tmp_path: Path, data_dir: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    # Checkpoint after every batch
+    monkeypatch.setattr(ingestion, "_CHECKPOINT_SECONDS", 0.0)
+    embedding = FailingEmbedding(size=8, fail_after=4)
+    with pytest.raises(RuntimeError, match="embedding failed"):
+        _pipeline(tmp_path, embedding).run(str(data_dir))
+
+    manifest = IngestManifest(tmp_path / "manifest.json")
+    completed = len(manifest.chapters)
+    assert 0 < completed < 6
+    # The chapters saved after the failure are published
+    assert read_corpus_version(tmp_path / "manifest.json") == 1
+
+    stats = _pipeline(tmp_path).run(str(data_dir))
+    assert stats.chapters == 6 - completed
+    assert len(IngestManifest(tmp_path / "manifest.json").chapters) == 6
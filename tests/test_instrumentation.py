@@ -0,0 +1,117 @@
+import json
+from collections.abc import Iterator
+from pathlib import Path
+from uuid import uuid4
+
+import pytest
+from langchain_core.documents import Document
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, LLMResult
+
+from benchmarks.fakes import (
+    FAKE_CHAT_MODEL,
+    FAKE_EMBEDDING_MODEL,
+    FakeChatModel,
+    FakeEmbeddings,
+    register_fakes,
+)
+from src.components.instrumentation import CACHE_EVENT, TurnRecorder, instrument
+from src.configs import Configuration
+from src.graph import graph
+from src.utils import chat_models, embedding_models, model_key
+
+
+def test_turn_recorder_nests_spans_and_writes_a_trace(tmp_path: Path) -> None:
+    trace_path = tmp_path / "traces.jsonl"
+    recorder = TurnRecorder(str(trace_path), thread_id="thread")
+    turn, node, retriever, model = uuid4(), uuid4(), uuid4(), uuid4()
+    in_node = {"langgraph_node": "retrieve"}
+
+    recorder.on_chain_start(None, {}, run_id=turn, name="LangGraph")
+    recorder.on_chain_start(
+        None, {}, run_id=uuid4(), parent_run_id=turn, name="__start__"
+    )
+    recorder.on_chain_start(None, {}, run_id=node, parent_run_id=turn, name="retrieve")
+    recorder.on_retriever_start(
+        {}, "q", run_id=retriever, parent_run_id=node, metadata=in_node
+    )
+    recorder.on_retriever_end([Document("a"), Document("b")], run_id=retriever)
+    recorder.on_custom_event(
+        CACHE_EVENT, {"cache": "answer", "hit": False}, run_id=node
+    )
+    recorder.on_chat_model_start(
+        {},
+        [[HumanMessage("q")]],
+        run_id=model,
+        parent_run_id=node,
+        metadata={**in_node, "ls_model_name": "fake"},
+    )
+    recorder.on_llm_new_token("a", run_id=model)
+    message = AIMessage(
+        "answer",
+        usage_metadata={"input_tokens": 7, "output_tokens": 2, "total_tokens": 9},
+    )
+    recorder.on_llm_end(
+        LLMResult(generations=[[ChatGeneration(message=message)]]), run_id=model
+    )
+    recorder.on_chain_end({}, run_id=node)
+    recorder.on_chain_error(ValueError("boom"), run_id=turn)
+
+    summary = recorder.summary()
+    assert summary["total_ms"] > 0
+    assert [n["node"] for n in summary["nodes"]] == ["retrieve"]
+    (call,) = summary["model_calls"]
+    assert call["node"] == "retrieve" and call["model"] == "fake"
+    assert call["ttft_ms"] is not None
+    assert (call["prompt_tokens"], call["completion_tokens"]) == (7, 2)
+    assert summary["retrievals"][0]["chunks"] == 2
+    assert summary["cache"] == [{"cache": "answer", "result": "miss"}]
+
+    (line,) = trace_path.read_text(encoding="utf-8").splitlines()
+    trace = json.loads(line)
+    assert trace["trace_id"] == str(turn) and trace["thread_id"] == "thread"
+    spans = {span["name"]: span for span in trace["spans"]}
+    assert spans["LangGraph"]["error"] == "ValueError"
+    assert spans["retrieve"]["parent"] == "LangGraph"
+    assert spans["retriever"]["parent"] == "retrieve"
+    assert all(span["start_ms"] >= 0 for span in trace["spans"])
+
+
+@pytest.fixture
+def chat_model() -> Iterator[FakeChatModel]:
+    chat_model = FakeChatModel(latency=0.0, tokens_per_second=1e6, route="general")
+    register_fakes(chat_model, FakeEmbeddings(dimension=8))
+    yield chat_model
+    chat_models.unload(model_key(FAKE_CHAT_MODEL, {}))
+    embedding_models.unload(model_key(FAKE_EMBEDDING_MODEL, {}))
+
+
+def test_instrumented_graph_run_records_node_and_model_spans(
+    chat_model: FakeChatModel,
+) -> None:
+    configuration = Configuration(instrumentation=True)
+    config, recorder = instrument(
+        {
+            "configurable": {
+                "response_model": FAKE_CHAT_MODEL,
+                "embedding_model": FAKE_EMBEDDING_MODEL,
+                "fast_router": False,
+                "speculative_retrieval": False,
+            }
+        },
+        configuration,
+    )
+    assert recorder is not None
+    assert instrument(config, Configuration()) == (config, None)
+
+    graph.graph.invoke({"messages": [HumanMessage("who is the hero?")]}, config)
+
+    summary = recorder.summary()
+    nodes = [n["node"] for n in summary["nodes"]]
+    assert nodes[0] == "load_summary"
+    assert "respond_to_general_query" in nodes
+    assert summary["total_ms"] >= sum(n["ms"] for n in summary["nodes"])
+    # The fake router is not a chat model call, so only the response is one
+    (call,) = summary["model_calls"]
+    assert call["node"] == "respond_to_general_query"
+    assert call["completion_tokens"] == chat_model.response_tokens
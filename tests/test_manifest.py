@@ -0,0 +1,118 @@
+from pathlib import Path
+from typing import Any
+
+from langchain_core.documents import Document
+
+from src.components.manifest import (
+    IngestManifest,
+    chapter_key,
+    content_hash,
+    make_chunk_ids,
+    manifest_path,
+    read_corpus_version,
+)
+from src.configs import Configuration
+
+
+def _chapter(text: str, **metadata: object) -> Document:
+    return Document(page_content=text, metadata={"Chương": 1, **metadata})
+
+
+def test_content_hash_covers_text_and_metadata() -> None:
+    digest = content_hash(_chapter("text", title="A"))
+    assert digest == content_hash(_chapter("text", title="A"))
+    assert digest != content_hash(_chapter("text.", title="A"))
+    assert digest != content_hash(_chapter("text", title="B"))
+
+
+def test_chunk_ids_change_with_content() -> None:
+    old = make_chunk_ids("novel", 1, content_hash(_chapter("old")), 2)
+    new = make_chunk_ids("novel", 1, content_hash(_chapter("new")), 2)
+    assert len(set(old) | set(new)) == 4
+
+
+def test_change_detection(tmp_path: Path) -> None:
+    manifest = IngestManifest(tmp_path / "manifest.json")
+    key = chapter_key("novel", 1)
+    digest = content_hash(_chapter("text"))
+    assert not manifest.is_current(key, digest)
+
+    manifest.update(key, digest, ["id-0", "id-1"], source="journal-hash")
+    assert manifest.is_current(key, digest)
+    assert not manifest.is_current(key, content_hash(_chapter("edited")))
+    assert manifest.is_current_source(key, "journal-hash")
+    assert not manifest.is_current_source(key, "other")
+
+    assert manifest.remove(key) == ["id-0", "id-1"]
+    assert not manifest.is_current(key, digest)
+    assert manifest.remove(key) == []
+
+
+def test_save_and_reload(tmp_path: Path) -> None:
+    path = tmp_path / "manifest.json"
+    manifest = IngestManifest(path)
+    manifest.update(chapter_key("novel", 1), "digest", ["id-0"])
+    manifest.set_novel("novel", "Novel")
+    manifest.save()
+
+    reloaded = IngestManifest(path)
+    assert reloaded.is_current(chapter_key("novel", 1), "digest")
+    assert reloaded.chunk_ids(chapter_key("novel", 1)) == ["id-0"]
+    assert reloaded.novels == {"novel": "Novel"}
+
+    reloaded.remove(chapter_key("novel", 1))
+    reloaded.prune_novels()
+    assert reloaded.novels == {}
+
+
+def test_version_bumps_only_on_changes(tmp_path: Path) -> None:
+    path = tmp_path / "manifest.json"
+    manifest = IngestManifest(path)
+    manifest.save()
+    assert read_corpus_version(path) == 0
+
+    manifest.update(chapter_key("novel", 1), "digest", ["id-0"])
+    manifest.save()
+    manifest.save()
+    assert read_corpus_version(path) == 1
+    assert IngestManifest(path).version == 1
+
+
+def test_checkpoint_is_published_by_the_next_save(tmp_path: Path) -> None:
+    path = tmp_path / "manifest.json"
+    manifest = IngestManifest(path)
+    manifest.update(chapter_key("novel", 1), "digest", ["id-0"])
+    manifest.save(bump_version=False)
+    assert read_corpus_version(path) == 0
+    assert IngestManifest(path).is_current(chapter_key("novel", 1), "digest")
+
+    # The checkpoint survives a restart until a bumping save publishes it
+    resumed = IngestManifest(path)
+    resumed.save()
+    assert read_corpus_version(path) == 1
+    resumed.save()
+    assert read_corpus_version(path) == 1
+
+
+def test_manifest_path_is_keyed_by_store_and_config(tmp_path: Path) -> None:
+    base = str(tmp_path / "ingest_manifest.json")
+
+    def path(**kwargs: Any) -> Path:
+        return manifest_path(
+            Configuration(
+                ingest_manifest_path=base, retriever_provider="local", **kwargs
+            )
+        )
+
+    assert path() == path()
+    assert path().parent == tmp_path
+    assert path().name.startswith("ingest_manifest.")
+    variants = {
+        path(),
+        path(local_store_dir="other"),
+        path(embedding_model="openai/text-embedding-3-small"),
+        path(splitter_type="delimiter"),
+        path(chunk_size=500),
+        path(chunk_overlap=0),
+    }
+    assert len(variants) == 6
@@ -0,0 +1,204 @@
+import threading
+import time
+from collections import Counter
+from collections.abc import Iterator
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+from data.novel_scraper import CrawlJournal, NovelScraper, Page
+
+NOVEL_PAGE = """
+<h3 class="title">Truyện thử</h3>
+<div class="info">
+  <a itemprop="author">Tác giả</a>
+  <a itemprop="genre">Tiên hiệp</a>
+</div>
+<div class="desc-text">Giới thiệu</div>
+"""
+
+
+@dataclass
+class FakeSite:
+    """A novel site served locally: chapters listed in `failures` answer with
+    those status codes first, before their page.
+    """
+
+    url: str = ""
+    failures: dict[int, list[int]] = field(default_factory=dict)
+    requests: list[tuple[str, float]] = field(default_factory=list)
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def hits(self) -> Counter[str]:
+        with self.lock:
+            return Counter(path for path, _ in self.requests)
+
+    def chapter_times(self) -> list[float]:
+        with self.lock:
+            return sorted(t for path, t in self.requests if "chuong-" in path)
+
+    def respond(self, path: str) -> tuple[int, str]:
+        with self.lock:
+            self.requests.append((path, time.monotonic()))
+            if "chuong-" not in path:
+                return 200, NOVEL_PAGE
+            chapter = int(path.rsplit("-", 1)[-1])
+            failures = self.failures.get(chapter)
+            if failures:
+                return failures.pop(0), ""
+        return 200, f'<div class="chapter-c">Nội dung chương {chapter}</div>'
+
+
+ETAG = '"v1"'
+
+
+@pytest.fixture
+def site() -> Iterator[FakeSite]:
+    fake = FakeSite()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:  # noqa: N802
+            status, body = fake.respond(self.path)
+            if status == 200 and self.headers.get("If-None-Match") == ETAG:
+                status, body = 304, ""
+            data = body.encode("utf-8")
+            self.send_response(status)
+            if status == 503:
+                self.send_header("Retry-After", "0")
+            if status in (200, 304):
+                self.send_header("ETag", ETAG)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format: str, *args: object) -> None:
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    fake.url = f"http://127.0.0.1:{server.server_address[1]}/truyen-thu/"
+    yield fake
+    server.shutdown()
+    server.server_close()
+
+
+def _scraper(site: FakeSite, save_dir: Path, **kwargs: float | bool) -> NovelScraper:
+    return NovelScraper(
+        site.url,
+        str(save_dir),
+        delay=0,
+        backoff=0.01,
+        **kwargs,  # type: ignore[arg-type]
+    )
+
+
+def test_async_scrape_retries_transient_errors(site: FakeSite, tmp_path: Path) -> None:
+    site.failures = {2: [503, 503], 3: [404], 4: [503, 503, 503]}
+    scraper = _scraper(site, tmp_path, rate=1000, max_retries=2)
+
+    failed = scraper.scrape_chapters_async(1, 4)
+
+    # 404 is not retried; chapter 4 is still unavailable after 2 retries
+    assert failed == [3, 4]
+    hits = site.hits()
+    assert [hits[f"/truyen-thu/chuong-{c}"] for c in (1, 2, 3, 4)] == [1, 3, 1, 3]
+    assert dict(scraper.iter_chapters(1, 4)) == {
+        1: "Nội dung chương 1",
+        2: "Nội dung chương 2",
+    }
+
+
+def test_async_scrape_keeps_to_the_host_rate(site: FakeSite, tmp_path: Path) -> None:
+    scraper = _scraper(site, tmp_path, rate=20, burst=1, concurrency=4)
+
+    assert scraper.scrape_chapters_async(1, 5) == []
+
+    times = site.chapter_times()
+    # 5 requests at 20 per second with no burst: 4 waits of 50ms
+    assert times[-1] - times[0] >= 0.18
+
+
+def test_scrape_chapters_resumes_from_the_journal(
+    site: FakeSite, tmp_path: Path
+) -> None:
+    site.failures = {3: [404]}
+    assert _scraper(site, tmp_path).scrape_chapters(1, 3) == [3]
+    site.requests.clear()
+
+    scraper = _scraper(site, tmp_path, resume=True)
+    assert scraper.scrape_chapters(1, 3) == []
+
+    # Neither the metadata nor completed chapters are fetched again
+    assert list(site.hits()) == ["/truyen-thu/chuong-3"]
+    assert [c for c, _ in scraper.iter_chapters(1, 3)] == [1, 2, 3]
+
+
+def test_deprecated_scrape_multiple_chapters_returns_contents(
+    site: FakeSite, tmp_path: Path
+) -> None:
+    site.failures = {2: [404]}
+    _scraper(site, tmp_path).scrape_chapters(1, 1)
+    scraper = _scraper(site, tmp_path, resume=True)
+
+    with pytest.deprecated_call():
+        contents = scraper.scrape_multiple_chapters(1, 3)
+    # Chapter 1 is read back from the earlier run, chapter 2 failed
+    assert contents == ["Nội dung chương 1", None, "Nội dung chương 3"]
+
+    with pytest.deprecated_call():
+        contents = scraper.scrape_multiple_chapters_async(1, 2)
+    assert contents == ["Nội dung chương 1", "Nội dung chương 2"]
+
+
+def test_journal_ignores_a_truncated_last_event(tmp_path: Path) -> None:
+    journal = CrawlJournal(tmp_path / "journal.jsonl")
+    journal.record_pending([1, 2])
+    journal.record_completed(1, "text", Page("<html>", etag=ETAG))
+    journal.close()
+    with open(tmp_path / "journal.jsonl", "a", encoding="utf-8") as fp:
+        fp.write('{"chapter": 2, "stat')
+
+    journal = CrawlJournal(tmp_path / "journal.jsonl")
+    assert journal.status(1) == "completed"
+    assert journal.status(2) == "pending"
+    assert journal.validators(1)["etag"] == ETAG  # type: ignore[index]
+    journal.close()
+
+
+def test_journal_compaction_keeps_latest_and_completed_events(tmp_path: Path) -> None:
+    path = tmp_path / "journal.jsonl"
+    journal = CrawlJournal(path)
+    journal.record_pending([1, 2])
+    journal.record_completed(1, "old", Page("<html>", etag='"v0"'))
+    journal.record_completed(1, "new", Page("<html>", etag=ETAG))
+    journal.record_completed(2, "text", Page("<html>"))
+    journal.record_failed(2, "fetch failed")
+    journal.compact()
+    journal.close()
+
+    assert len(path.read_text(encoding="utf-8").splitlines()) == 3
+    journal = CrawlJournal(path)
+    assert journal.validators(1)["etag"] == ETAG  # type: ignore[index]
+    assert journal.status(2) == "failed"
+    # A failed refetch keeps the validators of the saved copy
+    assert journal.validators(2) is not None
+    journal.close()
+
+
+def test_rescrape_revalidates_saved_chapters(site: FakeSite, tmp_path: Path) -> None:
+    _scraper(site, tmp_path).scrape_chapters(1, 2)
+    (tmp_path / "truyen-thu" / "chapters" / "1.txt").write_text(
+        "saved", encoding="utf-8"
+    )
+
+    scraper = _scraper(site, tmp_path)
+    # Not resuming: both chapters are requested, and come back unchanged
+    with pytest.deprecated_call():
+        contents = scraper.scrape_multiple_chapters(1, 2)
+    assert contents == ["saved", "Nội dung chương 2"]
+    assert site.hits()["/truyen-thu/chuong-1"] == 2
+    assert scraper.journal.status(1) == "completed"
@@ -0,0 +1,98 @@
+import threading
+import time
+from typing import Any
+
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+
+from src.components import rerankers
+from src.components.rerankers import CrossEncoderReranker
+
+
+class FakeCrossEncoder:
+    """Scores a pair by the number in its text, after `latency` seconds."""
+
+    def __init__(self, latency: float = 0.0) -> None:
+        self.latency = latency
+        self.batches: list[list[str]] = []
+        self.lock = threading.Lock()
+
+    def predict(self, pairs: list[tuple[str, str]], **kwargs: Any) -> Any:
+        with self.lock:
+            self.batches.append([text for _, text in pairs])
+        time.sleep(self.latency)
+        return np.array([float(text.split()[-1]) for _, text in pairs])
+
+
+@pytest.fixture
+def loads(monkeypatch: pytest.MonkeyPatch) -> list[FakeCrossEncoder]:
+    loaded: list[FakeCrossEncoder] = []
+
+    def load(model_name: str, max_length: int) -> FakeCrossEncoder:
+        loaded.append(FakeCrossEncoder())
+        return loaded[-1]
+
+    monkeypatch.setattr(rerankers, "load_cross_encoder", load)
+    return loaded
+
+
+def _documents(*lines: str) -> list[Document]:
+    return [Document(line) for line in lines]
+
+
+def test_rerank_scores_length_buckets_and_orders_by_score(
+    loads: list[FakeCrossEncoder],
+) -> None:
+    reranker = CrossEncoderReranker("fake", batch_size=2, timeout=5.0)
+    documents = _documents("a 1", "a a a a 4", "a a 3", "a a a 2", "a a a a a 5")
+
+    ranked = reranker.rerank("query", documents, top_n=3)
+
+    assert [d.page_content for d in ranked] == ["a a a a a 5", "a a a a 4", "a a 3"]
+    (model,) = loads
+    # Each batch holds neighbours in length order
+    assert sorted(model.batches) == [
+        ["a 1", "a a 3"],
+        ["a a a 2", "a a a a 4"],
+        ["a a a a a 5"],
+    ]
+
+
+def test_reranker_holds_its_model(loads: list[FakeCrossEncoder]) -> None:
+    reranker = CrossEncoderReranker("fake", batch_size=1, timeout=5.0)
+    reranker.rerank("query", _documents("a 1", "a 2"), top_n=2)
+    rerankers.cross_encoders.clear()
+    reranker.rerank("query", _documents("a 1", "a 2"), top_n=2)
+
+    assert len(loads) == 1
+    assert len(loads[0].batches) == 4
+
+
+def test_rerank_timeout_keeps_retrieval_order_and_drops_queued_batches(
+    loads: list[FakeCrossEncoder],
+) -> None:
+    reranker = CrossEncoderReranker("fake", batch_size=1, timeout=0.05, max_workers=1)
+    reranker.model.latency = 0.2
+    documents = _documents("a 1", "a a 2", "a a a 3")
+
+    ranked = reranker.rerank("query", documents, top_n=2)
+
+    assert ranked == documents[:2]
+    assert reranker.stats()["timeouts"] == 1
+    time.sleep(0.3)
+    # Only the batch running at the timeout was scored
+    assert len(loads[0].batches) == 1
+    # Its queue slots were all given back
+    assert reranker.score("query", documents) is not None
+
+
+def test_rerank_falls_back_when_the_queue_is_full(
+    loads: list[FakeCrossEncoder],
+) -> None:
+    reranker = CrossEncoderReranker("fake", batch_size=1, timeout=5.0, max_pending=2)
+    documents = _documents("a 1", "a a 2", "a a a 3")
+
+    assert reranker.rerank("query", documents, top_n=3) == documents
+    assert reranker.stats()["overloads"] == 1
+    assert loads == []
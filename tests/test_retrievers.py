@@ -0,0 +1,169 @@
+import asyncio
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any
+
+import pytest
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding, Embeddings
+from langchain_core.vectorstores import InMemoryVectorStore, VectorStore
+
+from src.components import retrievers
+from src.components.retrievers import (
+    CachedVectorStoreRetriever,
+    PineconePool,
+    RetrievalCache,
+    fetch_documents,
+    reciprocal_rank_fusion,
+    upsert_vectors,
+)
+
+
+def _docs(*texts: str) -> list[Document]:
+    return [Document(page_content=text) for text in texts]
+
+
+def test_reciprocal_rank_fusion_sums_reciprocal_ranks() -> None:
+    fused = reciprocal_rank_fusion([_docs("a", "b", "c"), _docs("c", "b", "d")], k=1)
+    # b: 1/3 + 1/3, c: 1/4 + 1/2, a: 1/2, d: 1/4
+    assert [doc.page_content for doc in fused] == ["c", "b", "a", "d"]
+
+
+def test_reciprocal_rank_fusion_keeps_first_copy() -> None:
+    first = Document(page_content="a", metadata={"source": "vector"})
+    second = Document(page_content="a", metadata={"source": "lexical"})
+    fused = reciprocal_rank_fusion([[first], [second]])
+    assert fused == [first]
+
+
+def test_reciprocal_rank_fusion_of_nothing() -> None:
+    assert reciprocal_rank_fusion([]) == []
+    assert reciprocal_rank_fusion([[], []]) == []
+
+
+class FakePineconeIndex:
+    def __init__(self) -> None:
+        self.vectors: dict[str, SimpleNamespace] = {}
+
+    def upsert(self, vectors: list[dict[str, Any]]) -> None:
+        for vector in vectors:
+            self.vectors[vector["id"]] = SimpleNamespace(
+                values=vector["values"], metadata=vector["metadata"]
+            )
+
+    def fetch(self, ids: list[str]) -> SimpleNamespace:
+        return SimpleNamespace(
+            vectors={id_: self.vectors[id_] for id_ in ids if id_ in self.vectors}
+        )
+
+
+class FakePinecone:
+    def __init__(self, *index_names: str) -> None:
+        self.indexes = {name: FakePineconeIndex() for name in index_names}
+        self.created: list[tuple[str, int]] = []
+
+    def list_indexes(self) -> SimpleNamespace:
+        return SimpleNamespace(names=lambda: list(self.indexes))
+
+    def create_index(self, name: str, dimension: int, spec: Any) -> None:
+        self.created.append((name, dimension))
+        self.indexes[name] = FakePineconeIndex()
+
+    def Index(self, name: str) -> FakePineconeIndex:  # noqa: N802
+        return self.indexes[name]
+
+
+@pytest.fixture
+def pinecone(monkeypatch: pytest.MonkeyPatch) -> FakePinecone:
+    client = FakePinecone("existing")
+
+    def vectorstore_factory(index: Any, embedding: Embeddings) -> VectorStore:
+        return InMemoryVectorStore(embedding)
+
+    pool = PineconePool(
+        client_factory=lambda: client,
+        vectorstore_factory=vectorstore_factory,
+        spec_factory=object,
+    )
+    monkeypatch.setattr(retrievers, "pinecone_pool", pool)
+    return client
+
+
+def test_pinecone_pool_creates_missing_index_once(pinecone: FakePinecone) -> None:
+    pool = retrievers.pinecone_pool
+    embedding = DeterministicFakeEmbedding(size=3)
+    store = pool.get_vectorstore("new", "fake/model", embedding)
+
+    assert pool.get_vectorstore("new", "fake/model", embedding) is store
+    pool.get_vectorstore("existing", "fake/model", embedding)
+    assert pinecone.created == [("new", 3)]
+
+
+def test_pinecone_vectors_round_trip_through_pooled_index(
+    pinecone: FakePinecone,
+) -> None:
+    store = retrievers.pinecone_pool.get_vectorstore(
+        "existing", "fake/model", DeterministicFakeEmbedding(size=3)
+    )
+    upsert_vectors(
+        store,
+        ["a", "b"],
+        ["first", "second"],
+        [{"Chương": 1}, {"Chương": 2}],
+        [[1.0, 0.0, 0.0], [0.0, 1.0, 0.0]],
+    )
+
+    assert pinecone.indexes["existing"].vectors["a"].metadata == {
+        "Chương": 1,
+        "text": "first",
+    }
+    docs = fetch_documents(store, ["b", "missing", "a"])
+    assert [(doc.id, doc.page_content, doc.metadata) for doc in docs] == [
+        ("b", "second", {"Chương": 2}),
+        ("a", "first", {"Chương": 1}),
+    ]
+
+
+class PineconeShapedStore(InMemoryVectorStore):
+    """Only searches by vector through the scored variant, like Pinecone."""
+
+    searches: int = 0
+
+    def similarity_search_by_vector(
+        self, embedding: list[float], k: int = 4, **kwargs: Any
+    ) -> list[Document]:
+        raise NotImplementedError
+
+    async def asimilarity_search_by_vector(
+        self, embedding: list[float], k: int = 4, **kwargs: Any
+    ) -> list[Document]:
+        raise NotImplementedError
+
+    def similarity_search_by_vector_with_score(
+        self, embedding: list[float], k: int = 4, **kwargs: Any
+    ) -> list[tuple[Document, float]]:
+        self.searches += 1
+        return self.similarity_search_with_score_by_vector(embedding, k, **kwargs)
+
+
+def test_cached_retriever_searches_by_vector_with_score(tmp_path: Path) -> None:
+    store = PineconeShapedStore(DeterministicFakeEmbedding(size=3))
+    store.add_texts(["first", "second", "third"])
+    retriever = CachedVectorStoreRetriever(
+        vectorstore=store,
+        search_kwargs={"k": 2},
+        cache=RetrievalCache(),
+        namespace=("pinecone", "index", "fake/model"),
+        manifest_path=str(tmp_path / "manifest.json"),
+    )
+
+    docs = retriever.invoke("second")
+    assert [doc.page_content for doc in docs][0] == "second"
+    assert len(docs) == 2
+    assert retriever.invoke("second") == docs
+    assert store.searches == 1
+
+    async_docs = asyncio.run(retriever.ainvoke("third"))
+    assert async_docs[0].page_content == "third"
+    assert asyncio.run(retriever.ainvoke("third")) == async_docs
+    assert store.searches == 2
@@ -0,0 +1,47 @@
+import pytest
+
+from src.components.routers import CentroidRouter
+
+EXAMPLES = {
+    "general": ["hello"],
+    "retrieve": ["chapter"],
+    "more-info": ["unclear"],
+}
+
+VECTORS = {
+    "hello": [1.0, 0.0, 0.0],
+    "chapter": [0.0, 1.0, 0.0],
+    "unclear": [0.0, 0.0, 1.0],
+}
+
+
+def _router(min_similarity: float = 0.5, min_margin: float = 0.1) -> CentroidRouter:
+    return CentroidRouter(EXAMPLES, VECTORS.__getitem__, min_similarity, min_margin)
+
+
+def test_confident_queries_take_the_fast_path() -> None:
+    router = _router()
+    route = router.classify([0.1, 0.9, 0.0])
+    assert route is not None and route["type"] == "retrieve"
+    assert router.stats()["fast_path"] == 1
+
+
+@pytest.mark.parametrize(
+    "embedding",
+    [[0.3, 0.2, 0.0], [0.7, 0.65, 0.0]],
+    ids=["low similarity", "low margin"],
+)
+def test_ambiguous_queries_fall_back(embedding: list[float]) -> None:
+    router = _router(min_similarity=0.85, min_margin=0.1)
+    assert router.classify(embedding) is None
+    stats = router.stats()
+    assert stats["llm_fallbacks"] == 1
+    assert stats["avoided_share"] == 0.0
+
+
+def test_thresholds_bound_the_fast_path() -> None:
+    embedding = [0.8, 0.6, 0.0]
+    # Similarity 0.8 to "general", margin 0.2 over "retrieve"
+    assert _router(min_similarity=0.75, min_margin=0.15).classify(embedding)
+    assert _router(min_similarity=0.85, min_margin=0.15).classify(embedding) is None
+    assert _router(min_similarity=0.75, min_margin=0.25).classify(embedding) is None
@@ -0,0 +1,42 @@
+import pytest
+
+from src.components.scopes import QueryScope, parse_scope
+
+TITLES = ["Đấu Phá Thương Khung", "Đấu La Đại Lục", "Đấu La"]
+
+
+@pytest.mark.parametrize(
+    ("query", "expected"),
+    [
+        ("Tiêu Viêm là ai?", QueryScope()),
+        ("Chương 12 kể về gì?", QueryScope(None, 12, 12)),
+        ("tóm tắt chương 3-5", QueryScope(None, 3, 5)),
+        ("chương 3 đến chương 7", QueryScope(None, 3, 7)),
+        ("chapter 9 to 4", QueryScope(None, 4, 9)),
+        ("chương 30", QueryScope(None, 30, 30)),
+    ],
+)
+def test_parse_chapter_range(query: str, expected: QueryScope) -> None:
+    assert parse_scope(query, []) == expected
+
+
+def test_parse_novel_ignores_case_diacritics_and_punctuation() -> None:
+    scope = parse_scope("Trong dau pha thuong khung, chương 3?", TITLES)
+    assert scope == QueryScope("Đấu Phá Thương Khung", 3, 3)
+
+
+def test_parse_novel_prefers_longest_title() -> None:
+    assert parse_scope("Đấu La Đại Lục hay không", TITLES).novel == "Đấu La Đại Lục"
+    assert parse_scope("Đấu La hay không", TITLES).novel == "Đấu La"
+
+
+def test_parse_novel_matches_whole_words() -> None:
+    assert parse_scope("đấu lao", TITLES).novel is None
+
+
+def test_scope_filter() -> None:
+    assert QueryScope().to_filter() == {}
+    assert QueryScope("Đấu La", 3, 5).to_filter() == {
+        "Tên truyện": {"$eq": "Đấu La"},
+        "Chương": {"$gte": 3, "$lte": 5},
+    }
@@ -0,0 +1,56 @@
+import asyncio
+import queue
+import time
+from typing import Any
+
+import pytest
+
+from ui.components.streaming import DONE, render_stream
+
+
+def _producer(chunks: list[str], gap: float = 0.0, tokens: int | None = None) -> Any:
+    async def produce(out: "queue.SimpleQueue[Any]") -> int | None:
+        for chunk in chunks:
+            if gap:
+                await asyncio.sleep(gap)
+            out.put((time.perf_counter(), chunk))
+        out.put(DONE)
+        return tokens
+
+    return produce
+
+
+def test_render_stream_coalesces_fast_chunks_into_frames() -> None:
+    chunks = [f"{i} " for i in range(200)]
+    frames: list[str] = []
+
+    text, stats = render_stream(_producer(chunks, gap=0.0005), frames.append, 20)
+
+    assert text == "".join(chunks)
+    assert stats.tokens == 200
+    # Far fewer frames than chunks, each a growing prefix of the answer
+    assert stats.frames == len(frames) < 50
+    assert all(frame.endswith("▌") for frame in frames)
+    assert all(text.startswith(frame[:-1]) for frame in frames)
+    assert stats.ttft is not None and stats.duration >= stats.ttft
+
+
+def test_render_stream_draws_slow_chunks_as_they_arrive() -> None:
+    frames: list[str] = []
+
+    text, stats = render_stream(_producer(["a", "b", "c"], gap=0.1), frames.append, 20)
+
+    assert text == "abc"
+    assert frames == ["a▌", "ab▌", "abc▌"]
+    assert stats.tokens_per_second is not None
+
+
+def test_render_stream_uses_reported_tokens_and_reraises_errors() -> None:
+    _, stats = render_stream(_producer(["a", "b"], tokens=7), lambda _: None, 0)
+    assert stats.tokens == 7
+
+    async def fail(out: "queue.SimpleQueue[Any]") -> int | None:
+        raise RuntimeError("model failed")
+
+    with pytest.raises(RuntimeError, match="model failed"):
+        render_stream(fail, lambda _: None, 20)
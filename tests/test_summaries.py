@@ -0,0 +1,77 @@
+import threading
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+
+from src.components.summaries import ConversationSummarizer, select_evicted
+
+
+def _messages(n: int) -> list[BaseMessage]:
+    return [
+        (HumanMessage if i % 2 == 0 else AIMessage)(f"message {i}", id=str(i))
+        for i in range(n)
+    ]
+
+
+def _count_words(text: str) -> int:
+    return len(text.split())
+
+
+def test_select_evicted_keeps_the_latest_messages() -> None:
+    messages = _messages(6)
+    assert select_evicted(messages, 1000, _count_words) == []
+    evicted = select_evicted(messages, 1, _count_words)
+    assert evicted == messages[:4]
+
+
+def _summarize(summary: str, messages: list[BaseMessage]) -> str:
+    return " ".join([summary, *(str(m.content) for m in messages)]).strip()
+
+
+def test_summary_is_taken_once_by_the_next_turn() -> None:
+    summarizer = ConversationSummarizer()
+    messages = _messages(4)
+    assert summarizer.schedule("thread", "", messages[:2], _summarize)
+    summarizer.wait("thread")
+
+    taken = summarizer.take("thread")
+    assert taken is not None
+    assert taken.summary == "message 0 message 1"
+    assert taken.folded_ids == {"0", "1"}
+    # The summary now lives in the graph state
+    assert summarizer.take("thread") is None
+
+    summarizer.schedule("thread", taken.summary, messages[2:], _summarize)
+    summarizer.wait("thread")
+    taken = summarizer.take("thread")
+    assert taken is not None
+    assert taken.summary == "message 0 message 1 message 2 message 3"
+    assert taken.folded_ids == {"2", "3"}
+
+
+def test_nothing_is_taken_while_a_job_runs() -> None:
+    summarizer = ConversationSummarizer()
+    release = threading.Event()
+
+    def slow_summarize(summary: str, messages: list[BaseMessage]) -> str:
+        release.wait(1.0)
+        return _summarize(summary, messages)
+
+    messages = _messages(2)
+    assert summarizer.schedule("thread", "", messages, slow_summarize)
+    assert not summarizer.schedule("thread", "", messages, slow_summarize)
+    assert summarizer.take("thread") is None
+    release.set()
+    summarizer.wait("thread")
+    assert summarizer.take("thread") is not None
+
+
+def test_failed_jobs_leave_nothing_behind() -> None:
+    summarizer = ConversationSummarizer()
+
+    def fail(summary: str, messages: list[BaseMessage]) -> str:
+        raise RuntimeError("model down")
+
+    summarizer.schedule("thread", "", _messages(2), fail)
+    summarizer.wait("thread")
+    assert not summarizer.is_running("thread")
+    assert summarizer.take("thread") is None
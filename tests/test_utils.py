@@ -0,0 +1,81 @@
+import pytest
+from langchain_core.documents import Document
+
+from src.utils import CHAPTER_KEY, TITLE_KEY, ModelRegistry, format_docs
+
+
+def test_registry_builds_each_key_once() -> None:
+    registry = ModelRegistry()
+    built: list[str] = []
+
+    def factory() -> str:
+        built.append("model")
+        return "model"
+
+    assert registry.get_or_create("a", factory) == "model"
+    assert registry.get_or_create("a", factory) == "model"
+    assert built == ["model"]
+
+
+def test_registry_closes_evicted_and_unloaded_models() -> None:
+    closed: list[str] = []
+    registry = ModelRegistry(max_size=2, close=closed.append)
+    for key in ("a", "b", "c"):
+        registry.get_or_create(key, key.strip)
+
+    assert closed == ["a"]
+    assert registry.keys() == ["b", "c"]
+    assert registry.unload("b")
+    assert not registry.unload("b")
+    registry.clear()
+    assert closed == ["a", "b", "c"]
+
+
+def test_registry_releases_key_lock_when_factory_raises() -> None:
+    registry = ModelRegistry()
+
+    def factory() -> str:
+        raise RuntimeError("load failed")
+
+    with pytest.raises(RuntimeError):
+        registry.get_or_create("a", factory)
+
+    assert not registry._key_locks
+    assert "a" not in registry
+    assert registry.get_or_create("a", lambda: "model") == "model"
+    assert not registry._key_locks
+
+
+def _chunk(title: str, chapter: int, text: str) -> Document:
+    return Document(text, metadata={TITLE_KEY: title, CHAPTER_KEY: chapter})
+
+
+def _count_words(text: str) -> int:
+    return len(text.split())
+
+
+def test_format_docs_writes_each_novel_header_once() -> None:
+    context = format_docs(
+        [_chunk("A", 1, "first"), _chunk("B", 1, "other"), _chunk("A", 2, "second")]
+    )
+
+    assert context.count(f"{TITLE_KEY}: A") == 1
+    assert context.index("first") < context.index("second") < context.index("other")
+    assert f"[{CHAPTER_KEY} 2]\nsecond" in context
+
+
+def test_format_docs_packs_chunks_within_the_token_budget() -> None:
+    documents = [
+        _chunk("A", 1, "one two three"),
+        _chunk("A", 2, "far too many words for what is left"),
+        _chunk("A", 3, "four"),
+        _chunk("B", 1, "five"),
+    ]
+    # Header of A: 3 words; chunks add 2 for their chapter tag
+    context = format_docs(documents, max_tokens=14, count_tokens=_count_words)
+
+    assert "three" in context and "four" in context
+    assert "too many" not in context
+    # B's chunk fits on its own but not with its header
+    assert f"{TITLE_KEY}: B" not in context
+    assert format_docs(documents, max_tokens=0, count_tokens=_count_words) == ""
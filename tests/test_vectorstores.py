@@ -0,0 +1,186 @@
+import json
+import os
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from src.components.vectorstores import LocalVectorStore
+
+EMBEDDING = DeterministicFakeEmbedding(size=3)
+
+
+def _store(path: Path) -> LocalVectorStore:
+    return LocalVectorStore(path, EMBEDDING, partition_key="novel", range_key="chapter")
+
+
+def _add(
+    store: LocalVectorStore, rows: dict[str, tuple[list[float], str, int]]
+) -> None:
+    metadatas: list[dict[str, Any]] = [
+        {"novel": novel, "chapter": chapter} for _, novel, chapter in rows.values()
+    ]
+    store.add_vectors(
+        np.array([vector for vector, _, _ in rows.values()], dtype=np.float32),
+        list(rows),
+        metadatas,
+        list(rows),
+    )
+
+
+def _search(store: LocalVectorStore, vector: list[float], **kwargs: Any) -> list[str]:
+    return [
+        doc.page_content
+        for doc in store.similarity_search_by_vector(vector, k=10, **kwargs)
+    ]
+
+
+@pytest.fixture
+def store(tmp_path: Path) -> LocalVectorStore:
+    store = _store(tmp_path / "store")
+    _add(
+        store,
+        {
+            "a1": ([1.0, 0.0, 0.0], "a", 1),
+            "a2": ([0.9, 0.1, 0.0], "a", 2),
+            "a3": ([0.0, 1.0, 0.0], "a", 3),
+            "b1": ([0.8, 0.0, 0.2], "b", 1),
+        },
+    )
+    return store
+
+
+def test_add_and_search(store: LocalVectorStore) -> None:
+    assert store.count == 4
+    assert _search(store, [1.0, 0.0, 0.0]) == ["a1", "a2", "b1", "a3"]
+    docs = store.get_by_ids(["b1"])
+    assert [doc.metadata for doc in docs] == [{"novel": "b", "chapter": 1}]
+
+
+def test_add_replaces_rows_with_the_same_id(store: LocalVectorStore) -> None:
+    _add(store, {"a1": ([0.0, 0.0, 1.0], "a", 1)})
+    assert len(store.get_by_ids(["a1"])) == 1
+    assert _search(store, [0.0, 0.0, 1.0])[0] == "a1"
+
+
+def test_delete(store: LocalVectorStore) -> None:
+    store.delete(["a1", "missing"])
+    assert store.get_by_ids(["a1"]) == []
+    assert "a1" not in _search(store, [1.0, 0.0, 0.0])
+
+
+@pytest.mark.parametrize(
+    ("search_filter", "expected"),
+    [
+        ({"novel": "a"}, ["a1", "a2", "a3"]),
+        ({"novel": {"$in": ["b", "c"]}}, ["b1"]),
+        ({"chapter": {"$gte": 2}}, ["a2", "a3"]),
+        ({"novel": {"$eq": "a"}, "chapter": {"$gte": 1, "$lte": 2}}, ["a1", "a2"]),
+        ({"novel": "c"}, []),
+    ],
+)
+def test_filter(
+    store: LocalVectorStore, search_filter: dict[str, Any], expected: list[str]
+) -> None:
+    assert _search(store, [1.0, 0.0, 0.0], filter=search_filter) == expected
+
+
+def test_filter_rejects_unindexed_keys(store: LocalVectorStore) -> None:
+    with pytest.raises(ValueError):
+        store.similarity_search_by_vector([1.0, 0.0, 0.0], filter={"other": 1})
+
+
+def test_compact(store: LocalVectorStore, tmp_path: Path) -> None:
+    store.delete(["a2"])
+    _add(store, {"a3": ([0.0, 0.9, 0.1], "a", 3)})
+    before = _search(store, [1.0, 0.0, 0.0])
+    store.compact()
+
+    assert store.count == 3
+    assert _search(store, [1.0, 0.0, 0.0]) == before
+    assert _search(store, [1.0, 0.0, 0.0], filter={"novel": "a"}) == ["a1", "a3"]
+    assert not (tmp_path / "store" / "compacted").exists()
+
+    reopened = _store(tmp_path / "store")
+    assert reopened.count == 3
+    assert _search(reopened, [1.0, 0.0, 0.0]) == before
+
+
+def test_compact_everything_deleted(store: LocalVectorStore, tmp_path: Path) -> None:
+    store.delete()
+    store.compact()
+    assert store.count == 0
+    assert _search(store, [1.0, 0.0, 0.0]) == []
+    assert _store(tmp_path / "store").count == 0
+
+
+def test_reload_sees_writes_of_another_instance(
+    store: LocalVectorStore, tmp_path: Path
+) -> None:
+    other = _store(tmp_path / "store")
+    _add(other, {"c1": ([0.0, 0.0, 1.0], "c", 1)})
+    other.delete(["a1"])
+    assert _search(store, [0.0, 0.0, 1.0])[0] == "c1"
+    assert store.get_by_ids(["a1"]) == []
+
+
+def test_interrupted_compaction_is_finished_on_load(
+    store: LocalVectorStore, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    store.delete(["a2"])
+    before = _search(store, [1.0, 0.0, 0.0])
+    replace = os.replace
+    moved: list[str] = []
+
+    def crash_after_first_move(src: Any, dst: Any) -> None:
+        if Path(src).parent.name == "compacted":
+            if moved:
+                raise OSError("interrupted")
+            moved.append(Path(src).name)
+        replace(src, dst)
+
+    monkeypatch.setattr(os, "replace", crash_after_first_move)
+    with pytest.raises(OSError):
+        store.compact()
+    monkeypatch.setattr(os, "replace", replace)
+
+    reopened = _store(tmp_path / "store")
+    assert reopened.count == 3
+    assert _search(reopened, [1.0, 0.0, 0.0]) == before
+    assert not (tmp_path / "store" / "compacted").exists()
+
+
+def test_writes_append_to_the_id_log(store: LocalVectorStore, tmp_path: Path) -> None:
+    ids_path = tmp_path / "store" / "ids.jsonl"
+    inode = ids_path.stat().st_ino
+    _add(store, {"a1": ([0.0, 0.0, 1.0], "a", 1)})
+    store.delete(["b1"])
+
+    assert ids_path.stat().st_ino == inode
+    reopened = _store(tmp_path / "store")
+    assert reopened.count == 5
+    assert _search(reopened, [1.0, 0.0, 0.0]) == ["a2", "a3", "a1"]
+
+
+def test_store_with_an_id_list_is_migrated(
+    store: LocalVectorStore, tmp_path: Path
+) -> None:
+    # Stores used to keep every id in ids.json, rewritten on each commit
+    path = tmp_path / "store"
+    store.delete(["a2"])
+    index = json.loads((path / "index.json").read_text())
+    del index["ids_size"], index["deleted"]
+    (path / "index.json").write_text(json.dumps(index))
+    (path / "ids.json").write_text(json.dumps(["a1", None, "a3", "b1"]))
+    (path / "ids.jsonl").unlink()
+    (path / "deleted.bin").unlink()
+
+    legacy = _store(path)
+    assert _search(legacy, [1.0, 0.0, 0.0]) == ["a1", "b1", "a3"]
+    _add(legacy, {"c1": ([0.0, 0.0, 1.0], "c", 1)})
+    legacy.delete(["a1"])
+
+    reopened = _store(path)
+    assert sorted(_search(reopened, [1.0, 0.0, 0.0])) == ["a3", "b1", "c1"]
@@ -1,16 +1,51 @@
 import asyncio
+import queue
 import time
-from collections.abc import Callable
+import uuid
+from functools import partial
+from typing import Any
 
 import streamlit as st
-from langchain_core.messages import AIMessage, HumanMessage
-
-from src.graph.graph import graph as chat
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+from langchain_core.runnables import RunnableConfig
+from langgraph.graph.state import CompiledStateGraph
+
+from src.components.instrumentation import instrument
+from src.configs import Configuration
+from src.graph.graph import acompile_checkpointed
+from ui.components.streaming import DONE, get_event_loop, render_stream
+
+
+@st.cache_resource
+def get_chat_graph() -> CompiledStateGraph:
+    """The graph with its thread checkpointer, opened once on the shared loop."""
+    configuration = Configuration.from_runnable_config()
+    return asyncio.run_coroutine_threadsafe(
+        acompile_checkpointed(configuration.checkpoint_path), get_event_loop()
+    ).result()
+
+
+def _load_conversation(thread_id: str) -> list[BaseMessage]:
+    """Messages of a thread still kept verbatim by its last checkpoint."""
+    config: RunnableConfig = {"configurable": {"thread_id": thread_id}}
+    snapshot = asyncio.run_coroutine_threadsafe(
+        get_chat_graph().aget_state(config), get_event_loop()
+    ).result()
+    return [
+        message
+        for message in snapshot.values.get("messages", [])
+        if isinstance(message, HumanMessage | AIMessage) and message.content
+    ]
 
 
 def init_chat_state() -> None:
+    if "thread_id" not in st.session_state:
+        # Kept in the URL, so reloading the page resumes the conversation
+        thread_id = st.query_params.get("thread") or str(uuid.uuid4())
+        st.query_params["thread"] = thread_id
+        st.session_state.thread_id = thread_id
     if "conversation" not in st.session_state:
-        st.session_state.conversation = []
+        st.session_state.conversation = _load_conversation(st.session_state.thread_id)
     if "is_responding" not in st.session_state:
         st.session_state.is_responding = False
 
@@ -26,39 +61,76 @@ def handle_user_input() -> None:
     user_query = st.chat_input(disabled=st.session_state.is_responding)
 
     if user_query:
-        st.session_state.conversation.append(HumanMessage(content=user_query))
+        # Stable ids let the graph drop messages folded into the summary
+        st.session_state.conversation.append(
+            HumanMessage(content=user_query, id=str(uuid.uuid4()))
+        )
         st.session_state.is_responding = True
         st.rerun()
 
 
 def handle_ai_response() -> None:
     if st.session_state.is_responding and st.session_state.conversation:
+        config: RunnableConfig = {
+            "configurable": {"thread_id": st.session_state.thread_id}
+        }
+        configuration = Configuration.from_runnable_config(config)
+        config, recorder = instrument(config, configuration)
+
         with st.chat_message("assistant"):
             response_placeholder = st.empty()
 
             def update_ui(text: str) -> None:
                 response_placeholder.markdown(text)
 
-            full_response = asyncio.run(_stream_response(update_ui))
+            # The checkpointer holds the rest of the conversation
+            full_response, stats = render_stream(
+                partial(
+                    _stream_response,
+                    get_chat_graph(),
+                    st.session_state.conversation[-1],
+                    config,
+                ),
+                update_ui,
+                configuration.stream_max_fps,
+            )
 
             # Update final response without cursor
             response_placeholder.markdown(full_response)
 
-        st.session_state.conversation.append(AIMessage(content=full_response))
+        st.session_state.last_stream = stats
+        if recorder is not None:
+            st.session_state.last_turn = recorder.summary()
+        st.session_state.conversation.append(
+            AIMessage(content=full_response, id=str(uuid.uuid4()))
+        )
         st.session_state.is_responding = False
         st.rerun()
 
 
-async def _stream_response(update_ui: Callable[[str], None]) -> str:
-    full_response: str = ""
-    async for event in chat.astream_events(
-        {"messages": st.session_state.conversation},
-        version="v2",
-        include_names=["respond"],
-    ):
-        if event["event"] == "on_chat_model_stream":
-            chunk = event["data"]["chunk"].content
-            full_response += chunk
-            update_ui(full_response + "▌")
-            time.sleep(0.03)
-    return full_response
+async def _stream_response(
+    chat: CompiledStateGraph,
+    message: BaseMessage,
+    config: RunnableConfig,
+    chunks: "queue.SimpleQueue[Any]",
+) -> int | None:
+    """Put the chunks of the answer into `chunks` as they are generated and
+    return the number of output tokens, if the model reported it.
+    """
+    output_tokens = None
+    try:
+        async for event in chat.astream_events(
+            {"messages": [message]},
+            config,
+            version="v2",
+            include_names=["respond"],
+        ):
+            if event["event"] == "on_chat_model_stream":
+                chunks.put((time.perf_counter(), event["data"]["chunk"].content))
+            elif event["event"] == "on_chat_model_end":
+                usage = getattr(event["data"]["output"], "usage_metadata", None)
+                if usage:
+                    output_tokens = usage["output_tokens"]
+    finally:
+        chunks.put(DONE)
+    return output_tokens
@@ -1,9 +1,21 @@
+import uuid
+from typing import Any
+
 import streamlit as st
 
+from src.components.instrumentation import metrics
+from ui.components.streaming import StreamStats
+
 
 def render_sidebar() -> None:
     with st.sidebar:
         render_new_chat()
+        if "last_stream" in st.session_state:
+            render_debug_panel(
+                st.session_state.last_stream,
+                st.session_state.get("last_turn"),
+                include_divider=True,
+            )
 
 
 def render_new_chat(include_divider: bool = False) -> None:
@@ -13,5 +25,78 @@ def render_new_chat(include_divider: bool = False) -> None:
     st.header("💭 **New Chat**")
     if st.button("Start New Chat", type="primary", use_container_width=True, icon="💭"):
         st.session_state.conversation = []
+        st.session_state.thread_id = str(uuid.uuid4())
+        st.query_params["thread"] = st.session_state.thread_id
         st.session_state.is_responding = False
+        st.session_state.pop("last_stream", None)
+        st.session_state.pop("last_turn", None)
         st.rerun()
+
+
+def render_debug_panel(
+    stream: StreamStats,
+    turn: dict[str, Any] | None = None,
+    include_divider: bool = False,
+) -> None:
+    """Show the streaming speed of the last answer and, when instrumentation
+    is on, where the time of the last turn went as recorded by `TurnRecorder`.
+    """
+    if include_divider:
+        st.divider()
+
+    with st.expander("🔎 Debug", expanded=False):
+        ttft, speed = st.columns(2)
+        ttft.metric(
+            "First token",
+            f"{stream.ttft * 1000:.0f} ms" if stream.ttft is not None else "-",
+        )
+        tokens_per_second = stream.tokens_per_second
+        speed.metric(
+            "Tokens/s",
+            f"{tokens_per_second:.1f}" if tokens_per_second is not None else "-",
+        )
+        st.caption(
+            f"{stream.tokens} tokens in {stream.duration:.2f} s, "
+            f"drawn in {stream.frames} frames"
+        )
+        if turn is None:
+            return
+
+        st.metric("Last turn", f"{turn['total_ms']:.0f} ms")
+        if turn["nodes"]:
+            st.caption("Nodes")
+            st.dataframe(
+                [{"node": n["node"], "ms": round(n["ms"], 1)} for n in turn["nodes"]],
+                hide_index=True,
+                use_container_width=True,
+            )
+        if turn["model_calls"]:
+            st.caption("Model calls")
+            st.dataframe(
+                [
+                    {
+                        "node": call["node"],
+                        "model": call["model"],
+                        "ms": round(call["ms"], 1),
+                        "ttft ms": (
+                            round(call["ttft_ms"], 1)
+                            if call["ttft_ms"] is not None
+                            else None
+                        ),
+                        "prompt": call["prompt_tokens"],
+                        "completion": call["completion_tokens"],
+                    }
+                    for call in turn["model_calls"]
+                ],
+                hide_index=True,
+                use_container_width=True,
+            )
+        for retrieval in turn["retrievals"]:
+            st.write(
+                f"Retrieved {retrieval['chunks']} chunks in "
+                f"{retrieval['ms']:.0f} ms ({retrieval['node']})"
+            )
+        for lookup in turn["cache"]:
+            st.write(f"Cache {lookup['cache']}: {lookup['result']}")
+        if st.checkbox("Show process metrics"):
+            st.code(metrics.render(), language="text")
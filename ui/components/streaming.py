@@ -0,0 +1,96 @@
+import asyncio
+import queue
+import threading
+import time
+from collections.abc import Callable, Coroutine
+from dataclasses import dataclass
+from typing import Any
+
+import streamlit as st
+
+# Put by producers once a stream has no more chunks
+DONE = object()
+
+
+@st.cache_resource
+def get_event_loop() -> asyncio.AbstractEventLoop:
+    """Event loop shared by all sessions of the server process.
+
+    It runs in a daemon thread for the lifetime of the process, so async
+    clients cached with the models stay bound to a live loop across reruns.
+    """
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, name="chat-loop", daemon=True).start()
+    return loop
+
+
+@dataclass
+class StreamStats:
+    """Timings of a streamed answer, in seconds from the start of the turn."""
+
+    ttft: float | None = None
+    duration: float = 0.0
+    tokens: int = 0
+    frames: int = 0
+
+    @property
+    def tokens_per_second(self) -> float | None:
+        if self.ttft is None or self.tokens < 2 or self.duration <= self.ttft:
+            return None
+        # The first token is what the TTFT waited for
+        return (self.tokens - 1) / (self.duration - self.ttft)
+
+
+def render_stream(
+    produce: Callable[["queue.SimpleQueue[Any]"], Coroutine[Any, Any, int | None]],
+    update_ui: Callable[[str], None],
+    max_fps: float,
+) -> tuple[str, StreamStats]:
+    """Run `produce` on the shared event loop and draw the text it streams.
+
+    `produce` puts `(perf_counter(), text)` chunks into the queue it is given,
+    then `DONE`, and returns the number of generated tokens if the model
+    reported it. Chunks arriving within one frame are drawn together, so
+    `update_ui` is called at most `max_fps` times per second however fast the
+    model generates. Exceptions raised by `produce` are re-raised here.
+    """
+    chunks: queue.SimpleQueue[Any] = queue.SimpleQueue()
+    stats = StreamStats()
+    interval = 1 / max_fps if max_fps > 0 else 0.0
+    start = time.perf_counter()
+    future = asyncio.run_coroutine_threadsafe(produce(chunks), get_event_loop())
+    try:
+        text = ""
+        pending: list[str] = []
+        next_frame = start
+        while True:
+            # Block until a chunk arrives, or until the next frame is due
+            # when there is text left to draw
+            timeout = max(0.0, next_frame - time.perf_counter()) if pending else None
+            try:
+                item = chunks.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+            if item is DONE:
+                break
+            if item is not None:
+                received, chunk = item
+                if stats.ttft is None:
+                    stats.ttft = received - start
+                stats.tokens += 1
+                stats.duration = received - start
+                pending.append(chunk)
+            now = time.perf_counter()
+            if pending and now >= next_frame:
+                text += "".join(pending)
+                pending.clear()
+                update_ui(text + "▌")
+                stats.frames += 1
+                next_frame = now + interval
+        tokens = future.result()
+    finally:
+        # Stop generating if the script was stopped, e.g. by a rerun
+        future.cancel()
+    if tokens is not None:
+        stats.tokens = tokens
+    return text + "".join(pending), stats